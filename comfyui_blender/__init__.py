@@ -26,6 +26,7 @@ from .operators import (
     prepare_glb_file,
     prepare_obj_file,
     project_material,
+    refresh_models,
     reload_outputs,
     rename_workflow,
     render_custom_compositor,
@@ -108,6 +109,7 @@ def register():
     prepare_glb_file.register()
     prepare_obj_file.register()
     project_material.register()
+    refresh_models.register()
     reload_outputs.register()
     rename_workflow.register()
     render_custom_compositor.register()
@@ -176,6 +178,7 @@ def unregister():
     prepare_glb_file.unregister()
     prepare_obj_file.unregister()
     project_material.unregister()
+    refresh_models.unregister()
     reload_outputs.unregister()
     rename_workflow.unregister()
     render_custom_compositor.unregister()
@@ -0,0 +1,91 @@
+"""Functions to run a workflow for every frame of an animation."""
+import logging
+
+import bpy
+
+from .scheduler import get_scheduler_progress, start_scheduler, stop_scheduler
+
+log = logging.getLogger("comfyui_blender")
+
+
+ANIMATION_SCHEDULER = "Animation"  # Name of the scheduler queueing the frames, it is also used in error messages
+
+
+def get_animation_frames(scene, frame_list=""):
+    """Return the frames of an animation, either from a frame list "1-10,15" or from the frame range of the scene."""
+
+    frame_list = frame_list.strip()
+    if not frame_list:
+        return list(range(scene.frame_start, scene.frame_end + 1, scene.frame_step))
+
+    frames = []
+    for item in frame_list.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            # Ranges are inclusive and may start with a negative frame, for instance -5-5
+            start, separator, stop = item[1:].partition("-")
+            if separator:
+                start, stop = int(item[0] + start), int(stop)
+                if stop < start:
+                    raise ValueError("range is empty")
+                frames.extend(range(start, stop + 1))
+            else:
+                frames.append(int(item))
+        except ValueError as e:
+            raise Exception(f"Invalid frame list {frame_list}: {e}")
+
+    # Remove duplicated frames and keep them in order
+    frames = list(dict.fromkeys(frames))
+    if not frames:
+        raise Exception("Frame list is empty.")
+    return frames
+
+
+def get_animation_progress():
+    """Return the number of frames queued and the total number of frames, or None if no animation is running."""
+
+    return get_scheduler_progress(ANIMATION_SCHEDULER)
+
+
+def sort_output(outputs_collection, index):
+    """Move an output of an animation after the outputs of the same animation with a lower or equal frame."""
+
+    output = outputs_collection[index]
+    if not output.batch_id:
+        return
+    target = index
+    while target > 0:
+        previous = outputs_collection[target - 1]
+        if previous.batch_id != output.batch_id or previous.frame <= output.frame:
+            break
+        target -= 1
+    if target != index:
+        outputs_collection.move(index, target)
+
+
+def start_animation(frames, run_frame, max_prompts):
+    """Start queueing the frames of an animation, run_frame(frame, batch_id) queues the prompts of a frame.
+    The scene is set to each frame before it is queued and the current frame is restored once all frames are queued."""
+
+    scene = bpy.context.scene
+    original_frame = scene.frame_current
+
+    def queue_frame(frame, batch_id):
+        scene.frame_set(frame)
+        run_frame(frame, batch_id)
+
+    def restore_frame(cancelled):
+        try:
+            scene.frame_set(original_frame)
+        except ReferenceError:
+            pass
+
+    start_scheduler(ANIMATION_SCHEDULER, frames, queue_frame, max_prompts, lambda frame: f"frame {frame}", restore_frame)
+
+
+def stop_animation():
+    """Stop queueing the frames of the animation and restore the current frame of the scene."""
+
+    stop_scheduler(ANIMATION_SCHEDULER)
@@ -0,0 +1,65 @@
+"""Functions to run a workflow for every camera of a collection."""
+import logging
+
+import bpy
+
+from .scheduler import get_scheduler_progress, start_scheduler, stop_scheduler
+
+log = logging.getLogger("comfyui_blender")
+
+
+CAMERAS_SCHEDULER = "Cameras"  # Name of the scheduler queueing the cameras, it is also used in error messages
+
+
+def get_collection_cameras(collection):
+    """Return the camera objects of a collection and its children sorted by name."""
+
+    if collection is None:
+        raise Exception("Select a collection of cameras.")
+    cameras = sorted((obj for obj in collection.all_objects if obj.type == "CAMERA"), key=lambda obj: obj.name)
+    if not cameras:
+        raise Exception(f"No camera in the collection {collection.name}.")
+    return cameras
+
+
+def get_cameras_progress():
+    """Return the number of cameras queued and the total number of cameras, or None if no cameras are queued."""
+
+    return get_scheduler_progress(CAMERAS_SCHEDULER)
+
+
+def start_cameras(cameras, run_camera, max_prompts):
+    """Start queueing the views of cameras, run_camera(camera_name, batch_id) queues the prompts of a view.
+    The active camera of the scene is set before each view is queued and restored once all views are queued."""
+
+    scene = bpy.context.scene
+    original_camera = scene.camera.name if scene.camera else ""
+
+    # The scene setup and the compositor groups are reused, only the active camera changes between two views
+    def queue_camera(camera_name, batch_id):
+        camera = bpy.data.objects.get(camera_name)
+        if camera is None:
+            raise Exception(f"Camera {camera_name} does not exist anymore.")
+        scene.camera = camera
+        run_camera(camera_name, batch_id)
+
+    def restore_camera(cancelled):
+        try:
+            scene.camera = bpy.data.objects.get(original_camera) if original_camera else None
+        except ReferenceError:
+            pass
+
+    start_scheduler(
+        CAMERAS_SCHEDULER,
+        [camera.name for camera in cameras],
+        queue_camera,
+        max_prompts,
+        lambda camera_name: f"camera {camera_name}",
+        restore_camera
+    )
+
+
+def stop_cameras():
+    """Stop queueing cameras and restore the active camera of the scene."""
+
+    stop_scheduler(CAMERAS_SCHEDULER)
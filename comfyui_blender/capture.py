@@ -0,0 +1,143 @@
+"""Functions to upload renders as workflow inputs."""
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import bpy
+
+from .utils import add_custom_headers, get_inputs_folder, get_server_url, upload_file
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Maximum number of uploads running while the next inputs are rendered
+UPLOAD_MAX_WORKERS = 4
+
+
+def get_compositor_group(name, build_function, signature=""):
+    """Return the compositor group with this name, it is created once per blend file and reused by the next renders.
+    The nodes are built with build_function(tree) when the group is created or when its signature changes."""
+
+    tree = bpy.data.node_groups.get(name)
+    if tree is None:
+        tree = bpy.data.node_groups.new(name=name, type="CompositorNodeTree")
+        tree.use_fake_user = True  # Keep the group in the blend file while no scene uses it
+    if not tree.nodes or tree.get("comfyui_signature") != signature:
+        tree.nodes.clear()
+        build_function(tree)
+        tree["comfyui_signature"] = signature
+    return tree
+
+
+def render_inputs(context, renders, temp_folder, frame=None):
+    """Render the inputs one after the other while the previous renders are uploaded in worker threads.
+    Renders is a list of tuples (workflow properties, render function), each render function is called with the list of
+    folders of the workflow properties and returns the list of rendered files, so a single render can capture several inputs.
+    When a frame is provided, the rendered files are uploaded with frame indexed names.
+    Return the list of input file paths, an exception is raised if any render or upload fails."""
+
+    # Build upload requests on the main thread, add-on preferences should not be accessed from worker threads
+    url = get_server_url("/upload/image")
+    headers = add_custom_headers()
+    inputs_folder = get_inputs_folder()
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS) as executor:
+        futures = []
+        try:
+            for workflow_properties, render_function in renders:
+                # Render each input in its own folder so the next render does not overwrite the file being uploaded
+                render_folders = [os.path.join(temp_folder, workflow_property) for workflow_property in workflow_properties]
+                for render_folder in render_folders:
+                    os.makedirs(render_folder, exist_ok=True)
+                temp_filepaths = render_function(context, render_folders)
+
+                for workflow_property, temp_filepath in zip(workflow_properties, temp_filepaths):
+                    # Add frame number to the file name, for instance blender_render_0001.png
+                    if frame is not None:
+                        name, extension = os.path.splitext(temp_filepath)
+                        frame_filepath = f"{name}_{frame:04d}{extension}"
+                        os.replace(temp_filepath, frame_filepath)
+                        temp_filepath = frame_filepath
+
+                    future = executor.submit(upload_input, temp_filepath, inputs_folder, url, headers)
+                    futures.append((workflow_property, temp_filepath, future))
+        except Exception:
+            # Cancel uploads which are not started yet, uploads in flight are awaited before the error is raised
+            for _, temp_filepath, future in futures:
+                if future.cancel() and os.path.exists(temp_filepath):
+                    os.remove(temp_filepath)
+            raise
+
+        # Update workflow inputs in the order of the renders once the uploads return
+        input_filepaths = []
+        for workflow_property, _, future in futures:
+            input_filepath = future.result()
+            set_input_image(context, workflow_property, input_filepath)
+            input_filepaths.append(input_filepath)
+    return input_filepaths
+
+
+def set_input_image(context, workflow_property, input_filepath):
+    """Replace the image of a workflow input with a file of the inputs folder."""
+
+    # Delete the previous input image from Blender's data
+    current_workflow = context.scene.current_workflow
+    previous_image = getattr(current_workflow, workflow_property)
+    if previous_image:
+        bpy.data.images.remove(previous_image)
+
+    # Load image in the data block
+    image = bpy.data.images.load(input_filepath, check_existing=True)
+
+    # Update the workflow property with the image from the data block
+    setattr(current_workflow, workflow_property, image)
+
+
+def upload_input(temp_filepath, inputs_folder, url=None, headers=None):
+    """Upload a rendered file to the ComfyUI server and move it to the inputs folder.
+    This can run in worker threads when the url and headers are provided. The rendered file is deleted if it fails."""
+
+    try:
+        # Upload file on ComfyUI server
+        try:
+            response = upload_file(temp_filepath, type="image", url=url, headers=headers)
+        except Exception as e:
+            raise Exception(f"Failed to upload file to ComfyUI server: {url or get_server_url()}. {e}")
+
+        if response.status_code != 200:
+            raise Exception(f"Failed to upload file: {response.status_code} - {response.text}")
+
+        # Build input file paths
+        input_subfolder = response.json()["subfolder"]
+        input_filename = response.json()["name"]
+        input_filepath = os.path.join(inputs_folder, input_subfolder, input_filename)
+
+        # Create the input subfolder if it doesn't exist
+        os.makedirs(os.path.join(inputs_folder, input_subfolder), exist_ok=True)
+
+        try:
+            # Move the file to the inputs folder, this does not copy the data when both folders are on the same disk
+            if os.path.abspath(temp_filepath) == os.path.abspath(input_filepath):
+                log.info(f"Input file is already in the inputs folder: {input_filepath}")
+            else:
+                shutil.move(temp_filepath, input_filepath)
+                log.info(f"Input file moved to: {input_filepath}")
+        except Exception as e:
+            raise Exception(f"Failed to move input file: {e}")
+
+    except Exception:
+        # Remove temporary file
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+        raise
+
+    return input_filepath
+
+
+def upload_render(context, workflow_property, temp_filepath):
+    """Upload a rendered file and set it as the image of a workflow input."""
+
+    input_filepath = upload_input(temp_filepath, get_inputs_folder())
+    set_input_image(context, workflow_property, input_filepath)
+    return input_filepath
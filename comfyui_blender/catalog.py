@@ -0,0 +1,149 @@
+"""Functions to manage the cache of model lists queried from the ComfyUI server."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bpy
+import requests
+
+from .utils import add_custom_headers, get_server_url
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Lists of models which can be queried from the ComfyUI server
+# The key is the model type used throughout the add-on
+MODEL_TYPES = {
+    "checkpoints": {"route": "/models/checkpoints", "label": "checkpoints", "label_singular": "checkpoint"},
+    "diffusion_models": {"route": "/models/diffusion_models", "label": "diffusion models", "label_singular": "diffusion model"},
+    "loras": {"route": "/models/loras", "label": "LoRAs", "label_singular": "LoRA"},
+    "samplers": {"route": "/blender/samplers", "label": "samplers", "label_singular": "sampler"}
+}
+
+# Model type required by each input node
+INPUT_MODEL_TYPES = {
+    "BlenderInputLoadCheckpoint": "checkpoints",
+    "BlenderInputLoadDiffusionModel": "diffusion_models",
+    "BlenderInputLoadLora": "loras",
+    "BlenderInputSampler": "samplers"
+}
+
+# Global variables to manage the catalog of models
+# Each entry of the catalog is a dictionary with the keys: items, error, url, timestamp
+# The version is incremented every time the content of the catalog changes
+CATALOG = {}
+CATALOG_LOCK = threading.Lock()
+CATALOG_VERSION = 0
+PENDING_MODEL_TYPES = set()  # Model types being fetched in a background thread
+
+
+def clear_catalog():
+    """Remove all the lists of models from the catalog."""
+
+    global CATALOG_VERSION
+    with CATALOG_LOCK:
+        if CATALOG:
+            CATALOG.clear()
+            CATALOG_VERSION += 1
+
+
+def fetch_catalog(model_types, force=False, callback=None):
+    """Fetch the lists of models which are missing or expired in the catalog in a background thread.
+    The callback is scheduled on the main thread if the content of the catalog changed."""
+
+    # Get model types which need to be fetched and are not already being fetched
+    addon_prefs = bpy.context.preferences.addons["comfyui_blender"].preferences
+    expired_types = get_expired_model_types(model_types, addon_prefs.model_cache_ttl, force)
+    with CATALOG_LOCK:
+        expired_types = [model_type for model_type in expired_types if model_type not in PENDING_MODEL_TYPES]
+        PENDING_MODEL_TYPES.update(expired_types)
+    if not expired_types:
+        return False
+
+    # Build requests on the main thread, add-on preferences should not be accessed from worker threads
+    headers = {"Content-Type": "application/json"}
+    headers = add_custom_headers(headers)
+    urls = {model_type: get_server_url(MODEL_TYPES[model_type]["route"]) for model_type in expired_types}
+    catalog_version = CATALOG_VERSION
+
+    def fetch():
+        """Send requests concurrently and update the catalog."""
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(expired_types)) as executor:
+                entries = executor.map(lambda model_type: fetch_model_list(model_type, urls[model_type], headers), expired_types)
+                update_catalog(dict(zip(expired_types, entries)))
+        finally:
+            with CATALOG_LOCK:
+                PENDING_MODEL_TYPES.difference_update(expired_types)
+
+        # Schedule callback on main thread
+        if callback and CATALOG_VERSION != catalog_version:
+            bpy.app.timers.register(callback, first_interval=0.0)
+
+    threading.Thread(target=fetch, daemon=True).start()
+    return True
+
+
+def fetch_model_list(model_type, url, headers):
+    """Get a list of models from the ComfyUI server and return it as a catalog entry."""
+
+    label = MODEL_TYPES[model_type]["label"]
+    entry = {"items": None, "error": None, "url": url, "timestamp": time.monotonic()}
+    try:
+        response = requests.get(url, headers=headers, timeout=10)
+    except Exception as e:
+        entry["error"] = f"Failed to get list of {label} from ComfyUI server: {url}. {e}"
+        log.exception(entry["error"])
+        return entry
+
+    if response.status_code != 200:
+        entry["error"] = f"Failed to get list of {label} from ComfyUI server: {url}."
+        log.error(entry["error"])
+        return entry
+
+    entry["items"] = response.json()
+    log.debug(f"Fetched {len(entry['items'])} {label} from ComfyUI server: {url}")
+    return entry
+
+
+def get_expired_model_types(model_types, ttl, force=False):
+    """Return the model types which are missing or expired in the catalog."""
+
+    now = time.monotonic()
+    expired_types = []
+    with CATALOG_LOCK:
+        for model_type in sorted(set(model_types)):
+            entry = CATALOG.get(model_type)
+            if force or entry is None or now - entry["timestamp"] > ttl:
+                expired_types.append(model_type)
+    return expired_types
+
+
+def get_model_list(model_type):
+    """Return the catalog entry of a model type or None if it has not been fetched yet."""
+
+    with CATALOG_LOCK:
+        return CATALOG.get(model_type)
+
+
+def get_workflow_model_types(inputs):
+    """Return the model types required by the inputs of a workflow."""
+
+    return {INPUT_MODEL_TYPES[node["class_type"]] for node in inputs.values() if node["class_type"] in INPUT_MODEL_TYPES}
+
+
+def update_catalog(entries):
+    """Store entries in the catalog and increment its version if any list of models changed."""
+
+    global CATALOG_VERSION
+    with CATALOG_LOCK:
+        changed = False
+        for model_type, entry in entries.items():
+            previous_entry = CATALOG.get(model_type)
+            if previous_entry is None or previous_entry["items"] != entry["items"] or previous_entry["error"] != entry["error"]:
+                changed = True
+            CATALOG[model_type] = entry
+        if changed:
+            CATALOG_VERSION += 1
@@ -1,5 +1,4 @@
 """Functions to manage the WebSocket connection to the ComfyUI server."""
-import ast
 import json
 import logging
 import os
@@ -8,6 +7,13 @@ import threading
 import bpy
 from ._vendor import websocket
 
+from .animation import sort_output
+from .catalog import clear_catalog
+from .crop import composite_crop
+from .prompts import add_prompt_output, get_prompt, get_prompt_output_classes, remove_prompt_record
+from .results import save_result
+from .submission import close_session
+from .tiles import add_tile_output, fail_tile, finish_tile
 from .utils import (
     add_custom_headers,
     download_file,
@@ -52,6 +58,7 @@ def connect():
         # Update connection status
         # And force refresh of the current workflow to reload inputs that need to query the ComfyUI server
         # For instance Load Checkpoint, Load Diffusion Model, Load LoRA...
+        # The lists of models are fetched in the background and the inputs are updated when they are received
         addon_prefs.connection_status = True
         if addon_prefs.workflow:
             addon_prefs.workflow = addon_prefs.workflow
@@ -83,6 +90,11 @@ def disconnect():
         WS_CONNECTION = None
         log.debug(f"WebSocket connection closed")
 
+    # Clear the lists of models, they will be queried again on the next connection
+    # And close pooled connections used to send prompts
+    clear_catalog()
+    close_session()
+
     # Update connection status and force refresh of the workflow panel
     addon_prefs = bpy.context.preferences.addons["comfyui_blender"].preferences
     addon_prefs.connection_status = False
@@ -134,8 +146,6 @@ def listen():
                     # Reset progress bar to 0 when execution starts
                     if message["type"] == "execution_start":
                         prompts_collection[data["prompt_id"]].status = message["type"]
-                        workflow = ast.literal_eval(prompts_collection[data["prompt_id"]].workflow)
-                        prompts_collection[data["prompt_id"]].total_nb_nodes = len(workflow)
                         addon_prefs.progress_value = 0.0
 
                     # Update cached nodes
@@ -155,12 +165,13 @@ def listen():
 
                         # Get outputs from the workflow
                         key = data["node"]
-                        outputs = ast.literal_eval(prompts_collection[data["prompt_id"]].outputs)
+                        outputs = get_prompt_output_classes(prompts_collection, data["prompt_id"])
 
                         # Check class type to retrieve 3D outputs
                         if key in outputs and outputs[key]["class_type"] == "BlenderOutputDownload3D":
                             for output in data["output"]["3d"]:
                                 filename, filepath = download_file(output["filename"], output["subfolder"], output.get("type", "output"))
+                                add_prompt_output(data["prompt_id"], os.path.join(output["subfolder"], filename), "3d")
 
                                 # Schedule adding 3D model to outputs collection on main thread
                                 def add_3d_output(output=output, filename=filename):
@@ -183,6 +194,7 @@ def listen():
                         elif key in outputs and outputs[key]["class_type"] == "BlenderOutputSaveGlb":
                             for output in data["output"]["3d"]:
                                 filename, filepath = download_file(output["filename"], output["subfolder"], output.get("type", "output"))
+                                add_prompt_output(data["prompt_id"], os.path.join(output["subfolder"], filename), "3d")
 
                                 # Schedule adding 3D model to outputs collection on main thread
                                 def add_3d_output(output=output, filename=filename):
@@ -203,11 +215,30 @@ def listen():
 
                         # Check class type to retrieve image outputs
                         elif key in outputs and outputs[key]["class_type"] == "BlenderOutputSaveImage":
-                            for output in data["output"]["images"]:
+                            # Frames of an animation are kept in order in the outputs collection
+                            batch_id = prompts_collection[data["prompt_id"]].batch_id
+                            frame = prompts_collection[data["prompt_id"]].frame
+                            crop = prompts_collection[data["prompt_id"]].crop
+                            camera = prompts_collection[data["prompt_id"]].camera
+                            for i, output in enumerate(data["output"]["images"]):
                                 filename, filepath = download_file(output["filename"], output["subfolder"], output.get("type", "output"))
+                                add_prompt_output(data["prompt_id"], os.path.join(output["subfolder"], filename), "image")
 
                                 # Schedule adding output to collection on main thread
-                                def add_image_output(output=output, filename=filename, filepath=filepath):
+                                def add_image_output(output=output, filename=filename, filepath=filepath, batch_id=batch_id, frame=frame, crop=crop, camera=camera, output_key=f"{key}:{i}"):
+                                    # Blend the output of a tile into the image of its batch instead of listing it
+                                    # Each image of each output node is blended into its own image
+                                    if crop and "tiles" in json.loads(crop):
+                                        add_tile_output(filepath, json.loads(crop), output_key)
+                                        return None
+
+                                    # Composite the output of a crop back into the full image
+                                    if crop:
+                                        try:
+                                            composite_crop(filepath, json.loads(crop))
+                                        except Exception as e:
+                                            log.error(f"Failed to composite output into the full image: {e}")
+
                                     # Load image into Blender file to get the name
                                     image_object = bpy.data.images.load(filepath)
                                     image_object.preview_ensure()
@@ -217,6 +248,10 @@ def listen():
                                     image.name = image_object.name
                                     image.filepath = os.path.join(output["subfolder"], filename)
                                     image.type = "image"
+                                    image.batch_id = batch_id
+                                    image.frame = frame
+                                    image.camera = camera
+                                    sort_output(outputs_collection, len(outputs_collection) - 1)
 
                                     # Open the last image automatically if the option is enabled
                                     if addon_prefs.open_last_image_automatically:
@@ -234,13 +269,13 @@ def listen():
                     
                         # Check class type to retrieve text outputs
                         elif key in outputs and outputs[key]["class_type"] == "BlenderOutputString":
-                            metadata = outputs[key].get("_meta", {})
-                            filename = metadata.get("title", "string") + ".txt"
+                            filename = (outputs[key].get("title") or "string") + ".txt"
                             outputs_folder = get_outputs_folder()
                             for output in data["output"]["text"]:
                                 filename, filepath = get_filepath(filename, outputs_folder)
                                 with open(filepath, "w") as file:
                                     file.write(output)
+                                add_prompt_output(data["prompt_id"], filename, "text")
 
                                 # Schedule adding output to collection on main thread
                                 def add_text_output(filename=filename, filepath=filepath):
@@ -266,7 +301,8 @@ def listen():
                     # Raise error message from ComfyUI server
                     elif message["type"] == "execution_error":
                         # Reset progress and remove prompt from the collection when execution fails
-                        prompts_collection.remove(prompts_collection.find(data["prompt_id"]))
+                        schedule_tile_end(prompts_collection, data["prompt_id"], fail_tile)
+                        remove_prompt_record(prompts_collection, data["prompt_id"])
                         addon_prefs.progress_value = 0.0
                         error_message = data.get("exception_message", "Unknown error")
                         error_message = f"Execution error from ComfyUI server: {error_message}"
@@ -283,12 +319,18 @@ def listen():
 
                     # Reset progress and remove prompt from the collection when execution is interrupted
                     elif message["type"] == "execution_interrupted":
-                        prompts_collection.remove(prompts_collection.find(data["prompt_id"]))
+                        schedule_tile_end(prompts_collection, data["prompt_id"], fail_tile)
+                        remove_prompt_record(prompts_collection, data["prompt_id"])
                         addon_prefs.progress_value = 0.0
 
                     # Remove prompt from the collection when execution completes
                     elif message["type"] == "execution_success":
-                        prompts_collection.remove(prompts_collection.find(data["prompt_id"]))
+                        # Store outputs in the result cache so the same prompt can reuse them
+                        prompt = get_prompt(data["prompt_id"])
+                        if prompt and prompt["cache_key"] and prompt["results"]:
+                            save_result(prompt["cache_key"], prompt["results"])
+                        schedule_tile_end(prompts_collection, data["prompt_id"], finish_tile)
+                        remove_prompt_record(prompts_collection, data["prompt_id"])
                         addon_prefs.progress_value = 1.0
 
                     # Update progress bar
@@ -307,3 +349,11 @@ def listen():
 
                         # Update progress value
                         addon_prefs.progress_value = workflow_progress / 100.0
+
+
+def schedule_tile_end(prompts_collection, prompt_id, end_tile):
+    """Schedule end_tile(crop) on the main thread if the prompt runs a tile, this is called from the listener thread."""
+
+    crop = prompts_collection[prompt_id].crop if prompt_id in prompts_collection.keys() else ""
+    if crop and "tiles" in json.loads(crop):
+        bpy.app.timers.register(lambda crop=json.loads(crop): end_tile(crop), first_interval=0.0)
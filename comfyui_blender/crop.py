@@ -0,0 +1,88 @@
+"""Functions to send the masked region of an image as a crop and composite the outputs back into the full image."""
+import json
+import logging
+import os
+
+import bpy
+import numpy as np
+
+from .utils import get_image_pixels, save_image_pixels
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Sizes of the crops are rounded to a multiple of this number of pixels, diffusion models work on 8 pixel latents
+CROP_ALIGNMENT = 8
+
+# Input nodes which can receive a crop of an image
+CROP_INPUT_TYPES = ("BlenderInputLoadImage", "BlenderInputLoadMask")
+
+
+def composite_crop(filepath, crop):
+    """Paste the image of a file into the base image of a crop at its offset and overwrite the file with the result.
+    The image is scaled to the size of the crop if the workflow changed its resolution."""
+
+    x, y = crop["offset"]
+    width, height = crop["size"]
+    base = bpy.data.images.load(crop["base"], check_existing=False)
+    output = bpy.data.images.load(filepath, check_existing=False)
+    try:
+        if tuple(output.size) != (width, height):
+            output.scale(width, height)
+        pixels = get_image_pixels(base)
+        pixels[y:y + height, x:x + width, :3] = get_image_pixels(output)[:, :, :3]
+        pixels[:, :, 3] = 1.0
+    finally:
+        bpy.data.images.remove(output)
+        bpy.data.images.remove(base)
+    save_image_pixels(pixels, filepath)
+    log.info(f"Output composited into the full image: {filepath}")
+
+
+def get_crop_metadata(image, pixels, bounds, temp_folder):
+    """Return the metadata of a crop of an image, stored on the input image to composite the outputs back.
+    The base image composited with the outputs is the file of the image, the mask brush only changes the alpha channel.
+    Images without file are saved in the temporary folder."""
+
+    x, y, width, height = bounds
+    base_filepath = bpy.path.abspath(image.filepath, library=image.library) if image.source == "FILE" else ""
+    if not base_filepath or not os.path.isfile(base_filepath):
+        base_filepath = os.path.join(temp_folder, f"crop_base_{bpy.path.clean_name(image.name)}.png")
+        save_image_pixels(pixels, base_filepath)
+    return {"offset": [x, y], "size": [width, height], "base": base_filepath}
+
+
+def get_mask_bounds(pixels, padding=0):
+    """Return the bounds (x, y, width, height) of the masked pixels of an image, with a padding, or None if nothing is masked.
+    Masked pixels are the ones painted with the mask brush, which lowers their alpha. Coordinates start from the bottom left."""
+
+    masked = pixels[:, :, 3] < 1.0
+    rows = np.flatnonzero(masked.any(axis=1))
+    if not rows.size:
+        return None
+    columns = np.flatnonzero(masked.any(axis=0))
+    image_height, image_width = masked.shape
+
+    # Pad the bounds and grow them to a multiple of the alignment without leaving the image
+    bounds = []
+    for start, stop, size in ((columns[0], columns[-1] + 1, image_width), (rows[0], rows[-1] + 1, image_height)):
+        start = max(0, start - padding)
+        stop = min(size, stop + padding)
+        length = min(size, -(-(stop - start) // CROP_ALIGNMENT) * CROP_ALIGNMENT)
+        start = min(start, size - length)
+        bounds.append((int(start), int(length)))
+    (x, width), (y, height) = bounds
+    return x, y, width, height
+
+
+def get_workflow_crop(context, inputs):
+    """Return the crop of the first image or mask input of the workflow sent as a crop, as a JSON string."""
+
+    current_workflow = context.scene.current_workflow
+    for key, node in inputs.items():
+        if node["class_type"] not in CROP_INPUT_TYPES:
+            continue
+        image = getattr(current_workflow, f"node_{key}", None)
+        if image and "comfyui_crop" in image:
+            return json.dumps(image["comfyui_crop"].to_dict())
+    return ""
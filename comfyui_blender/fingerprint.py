@@ -0,0 +1,146 @@
+"""Functions to fingerprint the scene and skip scheduled renders when nothing changed since the last upload."""
+import hashlib
+import logging
+import uuid
+
+import bpy
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Global variables to track changes of the scene
+# The session id changes when a blend file is loaded, so fingerprints of another file or session never match
+SESSION_ID = str(uuid.uuid4())
+SCENE_UPDATES = 0  # Number of depsgraph updates changing the geometry, transforms, materials or lights of the scene
+OBJECT_VISIBILITY = {}  # Visibility flags of the objects at their last update, to tell visibility changes from selection changes
+
+# Data blocks whose updates do not change the renders, the scene settings used by renders are in the fingerprint
+IGNORED_UPDATE_TYPES = (bpy.types.Scene, bpy.types.Screen, bpy.types.Text, bpy.types.WindowManager, bpy.types.WorkSpace)
+
+# Render types whose output only depends on the scene seen from the camera
+FINGERPRINT_RENDER_TYPES = ("render_depth_map", "render_lineart", "render_view")
+
+
+def get_render_fingerprint(context, render_type):
+    """Return the fingerprint of the scene for a render type, or an empty string if the render cannot be reused."""
+
+    if render_type not in FINGERPRINT_RENDER_TYPES:
+        return ""
+
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+    scene = context.scene
+    render = scene.render
+    values = [
+        SESSION_ID,
+        SCENE_UPDATES,
+        render_type,
+        scene.name,
+        scene.frame_current,
+        render.engine,
+        render.resolution_x,
+        render.resolution_y,
+        render.resolution_percentage,
+        addon_prefs.depth_backend,
+        addon_prefs.depth_max_vertices
+    ]
+
+    # Render and color management settings, updates of the scene are ignored so they are compared here
+    # Updates of the world data block are counted, only the world used by the scene is compared
+    view_settings = scene.view_settings
+    cycles = getattr(scene, "cycles", None)
+    eevee = getattr(scene, "eevee", None)
+    values.extend([
+        render.film_transparent,
+        render.filter_size,
+        view_settings.view_transform,
+        view_settings.look,
+        view_settings.exposure,
+        view_settings.gamma,
+        view_settings.use_curve_mapping,
+        scene.display_settings.display_device,
+        scene.sequencer_colorspace_settings.name,
+        getattr(cycles, "samples", None),
+        getattr(cycles, "use_denoising", None),
+        getattr(eevee, "taa_render_samples", None),
+        scene.world.name if scene.world else ""
+    ])
+
+    # Camera matrix and lens
+    camera = scene.camera
+    if camera:
+        cam_data = camera.data
+        values.extend([
+            camera.name,
+            [tuple(row) for row in camera.matrix_world],
+            cam_data.type,
+            cam_data.lens,
+            cam_data.ortho_scale,
+            cam_data.sensor_width,
+            cam_data.shift_x,
+            cam_data.shift_y,
+            cam_data.clip_start,
+            cam_data.clip_end
+        ])
+
+    # Render visibility of the collections, in the scene and in the view layer
+    for collection in scene.collection.children_recursive:
+        if not collection.name.startswith("."):
+            values.append((collection.name, collection.hide_render))
+    layer_collections = list(context.view_layer.layer_collection.children)
+    while layer_collections:
+        layer_collection = layer_collections.pop()
+        layer_collections.extend(layer_collection.children)
+        if not layer_collection.name.startswith("."):
+            values.append((layer_collection.name, layer_collection.exclude, layer_collection.holdout, layer_collection.indirect_only))
+
+    # Visibility and transforms of the objects, this also catches changes which do not trigger depsgraph updates
+    # Objects hidden in the viewport are still rendered, so the render visibility is compared for all objects
+    for obj in scene.objects:
+        if not obj.name.startswith("."):
+            values.append((obj.name, get_object_visibility(obj)))
+            if not obj.hide_render:
+                values.append((obj.name, [tuple(row) for row in obj.matrix_world]))
+
+    return hashlib.sha256(repr(values).encode("utf-8")).hexdigest()
+
+
+def get_object_visibility(obj):
+    """Return the visibility flags of an object which change the renders."""
+
+    return obj.hide_render, obj.hide_viewport, obj.hide_get(), obj.visible_get()
+
+
+def record_depsgraph_updates(depsgraph):
+    """Count the depsgraph updates which change the renders, this is called after each depsgraph update."""
+
+    global SCENE_UPDATES
+    for update in depsgraph.updates:
+        data_block = update.id.original
+
+        # Ignore internal data blocks of the add-on, their name starts with a dot
+        if data_block.name.startswith(".") or isinstance(data_block, IGNORED_UPDATE_TYPES):
+            continue
+
+        # Ignore input images loaded after scheduled renders
+        if isinstance(data_block, bpy.types.Image) and "comfyui_fingerprint" in data_block:
+            continue
+
+        # Ignore selection changes of objects, visibility changes are counted
+        if isinstance(data_block, bpy.types.Object) and not (update.is_updated_transform or update.is_updated_geometry):
+            visibility = get_object_visibility(data_block)
+            if OBJECT_VISIBILITY.get(data_block.name, visibility) == visibility:
+                OBJECT_VISIBILITY[data_block.name] = visibility
+                continue
+            OBJECT_VISIBILITY[data_block.name] = visibility
+
+        SCENE_UPDATES += 1
+        return
+
+
+def reset_scene_updates():
+    """Start a new session of updates, this is called when a blend file is loaded."""
+
+    global SESSION_ID, SCENE_UPDATES
+    SESSION_ID = str(uuid.uuid4())
+    SCENE_UPDATES = 0
+    OBJECT_VISIBILITY.clear()
@@ -5,11 +5,23 @@ import bpy
 from bpy.app.handlers import persistent
 
 from .connection import disconnect
+from .fingerprint import record_depsgraph_updates, reset_scene_updates
+from .scheduler import stop_schedulers
 from .settings import update_use_blend_file_location
+from .tiles import stop_tiles
+from .workers import stop_worker_renders
 
 log = logging.getLogger("comfyui_blender")
 
 
+@persistent
+def depsgraph_update_post_handler(scene, depsgraph):
+    """Called after the depsgraph is updated"""
+
+    # Track changes of the scene to reuse scheduled renders when nothing changed
+    record_depsgraph_updates(depsgraph)
+
+
 @persistent
 def load_pre_handler(scene, depsgraph):
     """Called before a blend file is loaded"""
@@ -17,6 +29,14 @@ def load_pre_handler(scene, depsgraph):
     # Ensure previous connection is closed and listening thread is stopped
     disconnect()
 
+    # Terminate the background renders, their timer does not survive the loading of the file
+    stop_worker_renders()
+
+    # Stop queueing animations, cameras and tiles, their timer does not survive the loading of the file either
+    # The frame, the camera or the tiled input of the scene being closed is restored, tiles in flight are discarded
+    stop_schedulers()
+    stop_tiles()
+
 
 @persistent
 def load_post_handler(scene, depsgraph):
@@ -25,11 +45,15 @@ def load_post_handler(scene, depsgraph):
     addon_prefs = bpy.context.preferences.addons["comfyui_blender"].preferences
     project_settings = bpy.context.scene.comfyui_project_settings
 
+    # Fingerprints of scheduled renders do not match in a new file
+    reset_scene_updates()
+
     # Update the base folder according to the .blend file location
     if bpy.data.filepath and project_settings.use_blend_file_location:
         update_use_blend_file_location(project_settings, bpy.context)
 
     # Force the update of the workflow property to refresh the input panel
+    # This does not wait for the ComfyUI server, lists of models are fetched in the background
     if addon_prefs.workflow:
         addon_prefs.workflow = addon_prefs.workflow
 
@@ -47,6 +71,7 @@ def save_post_handler(scene, depsgraph):
 def register():
     """Register handlers."""
 
+    bpy.app.handlers.depsgraph_update_post.append(depsgraph_update_post_handler)
     bpy.app.handlers.load_pre.append(load_pre_handler)
     bpy.app.handlers.load_post.append(load_post_handler)
     bpy.app.handlers.save_post.append(save_post_handler)
@@ -55,6 +80,9 @@ def register():
 def unregister():
     """Unregister handlers."""
 
+    if depsgraph_update_post_handler in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(depsgraph_update_post_handler)
+
     if disconnect in bpy.app.handlers.load_pre:
         bpy.app.handlers.load_pre.remove(load_pre_handler)
 
@@ -23,6 +23,11 @@ class ComfyBlenderConnectionMenu(bpy.types.Menu):
         row.enabled = addon_prefs.connection_status == True
         row.operator("comfy.disconnect_from_server", text="Disconnect", icon="INTERNET_OFFLINE")
 
+        # Refresh lists of models
+        row = layout.row()
+        row.enabled = addon_prefs.connection_status == True
+        row.operator("comfy.refresh_models", text="Refresh Models", icon="FILE_REFRESH")
+
 
 def register():
     """Register the panel."""
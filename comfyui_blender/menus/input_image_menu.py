@@ -23,7 +23,8 @@ class ComfyBlenderInputImageMenu(bpy.types.Menu):
         layout.label(text="Custom Compositors", icon="NODE_COMPOSITING")
 
         # Check if there are any compositor node trees
-        compositors = [compositor for compositor in bpy.data.node_groups if compositor.type == "COMPOSITING"]
+        # Compositors whose name starts with a dot are used internally by the renders of the add-on
+        compositors = [compositor for compositor in bpy.data.node_groups if compositor.type == "COMPOSITING" and not compositor.name.startswith(".")]
         if not compositors:
             layout.label(text="No custom compositor found")
         else:
@@ -4,7 +4,13 @@ import requests
 
 import bpy
 
+from ..animation import stop_animation
+from ..cameras import stop_cameras
+from ..prompts import remove_prompt
+from ..submission import clear_submissions
+from ..tiles import stop_tiles
 from ..utils import add_custom_headers, get_server_url
+from ..workers import stop_worker_renders
 
 log = logging.getLogger("comfyui_blender")
 
@@ -41,10 +47,24 @@ class ComfyBlenderOperatorStopWorkflow(bpy.types.Operator):
             bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
             return {'CANCELLED'}
 
+        # Stop queueing the frames of the animation and the cameras
+        stop_animation()
+        stop_cameras()
+
+        # Terminate the background renders, their workflow is not queued
+        stop_worker_renders()
+
+        # Stop queueing tiles, the tiles received so far are discarded
+        stop_tiles()
+
+        # Remove prompts waiting to be sent from the submission queue
+        cleared_prompt_ids = set(clear_submissions())
+
         # Get indices of prompts to remove and remove them in reverse order
         prompts_collection = addon_prefs.prompts_collection
-        prompt_indices = [i for i, workflow in enumerate(prompts_collection) if workflow.status == "pending"]
+        prompt_indices = [i for i, workflow in enumerate(prompts_collection) if workflow.status == "pending" or workflow.name in cleared_prompt_ids]
         for i in reversed(prompt_indices):
+            remove_prompt(prompts_collection[i].name)
             prompts_collection.remove(i)
 
         self.report({'INFO'}, "Request to stop workflow execution sent to ComfyUI server.")
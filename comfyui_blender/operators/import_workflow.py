@@ -3,11 +3,12 @@ import json
 import logging
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 import bpy
 
 from ..utils import contains_non_latin, get_filepath, get_workflows_folder
-from ..workflow import check_workflow_file_exists, extract_workflow_from_metadata
+from ..workflow import extract_workflow_from_metadata, get_workflow_hash, get_workflows_hashes
 
 log = logging.getLogger("comfyui_blender")
 
@@ -55,17 +56,31 @@ class ComfyBlenderOperatorImportWorkflow(bpy.types.Operator):
             self.report({'ERROR'}, "No file selected.")
             return {'CANCELLED'}
 
-        # Loop over the files paths to import each of them
+        # Extract and hash workflows from the files concurrently
+        # Files are read in worker threads, Blender data is only updated on the main thread
+        with ThreadPoolExecutor(max_workers=min(8, max(1, len(selected_files)))) as executor:
+            results = list(executor.map(self.process_file, selected_files))
+
+        # Get hashes of existing workflows once for the whole import
         workflows_folder = get_workflows_folder()
+        workflows_hashes = get_workflows_hashes(workflows_folder)
+
+        # Save new workflows in the workflows folder
         import_failures = 0
-        for path in selected_files:
+        last_workflow_filename = None
+        for path, workflow_data, workflow_hash, error_message in results:
             try:
-                # Import workflow
-                workflow_filename = self.process_single_file(workflows_folder, path)
+                if error_message:
+                    raise Exception(error_message)
 
-                # Set current workflow to last imported workflow
-                addon_prefs = context.preferences.addons["comfyui_blender"].preferences
-                addon_prefs.workflow = workflow_filename
+                # Check if a workflow with the same data already exists, including workflows imported in this batch
+                workflow_filename = workflows_hashes.get(workflow_hash)
+                if workflow_filename:
+                    self.report({'INFO'}, f"Workflow already exists: {workflow_filename}")
+                else:
+                    workflow_filename = self.save_workflow(workflows_folder, path, workflow_data)
+                    workflows_hashes[workflow_hash] = workflow_filename
+                last_workflow_filename = workflow_filename
             except Exception as e:
                 error_message = str(e)
                 log.error(error_message)
@@ -73,6 +88,12 @@ class ComfyBlenderOperatorImportWorkflow(bpy.types.Operator):
                 import_failures += 1
                 continue
 
+        # Set current workflow to last imported workflow
+        # This registers the workflow class once for the whole import
+        if last_workflow_filename:
+            addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+            addon_prefs.workflow = last_workflow_filename
+
         # Clear selected files for the next run
         self.files.clear()
         return {'CANCELLED'} if import_failures > 0 else {'FINISHED'}
@@ -86,68 +107,64 @@ class ComfyBlenderOperatorImportWorkflow(bpy.types.Operator):
 
         context.window_manager.fileselect_add(self)
         return {'RUNNING_MODAL'}
-    
-    def process_single_file(self, workflows_folder, path):
-        """Process file to import workflow."""
 
-        # Import workflow from JSON file
-        if path.lower().endswith(".json"):
-            with open(path, "r", encoding="utf-8") as file:
-                new_workflow_data = json.load(file)
-
-            # Check if a workflow with the same data already exists
-            workflow_filename = check_workflow_file_exists(new_workflow_data, workflows_folder)
-
-            # Get target file name and path if workflow does not exist
-            if not workflow_filename:
-                workflow_filename = os.path.basename(path)
-                workflow_filename, workflow_path = get_filepath(workflow_filename, workflows_folder)
-                try:
-                    # Copy the file to the workflows folder
-                    shutil.copy(path, workflow_path)
-                    self.report({'INFO'}, f"Workflow copied to: {workflow_path}")
-                    return workflow_filename
-                except shutil.SameFileError as e:
-                    self.report({'INFO'}, f"Workflow is already in the inputs folder: {workflow_path}")
-                except Exception as e:
-                    error_message = f"Failed to copy workflow file {path}: {e}"
-                    raise Exception(error_message)
-            else:
-                self.report({'INFO'}, f"Workflow already exists: {workflow_filename}")
-                return workflow_filename
-
-        # Import workflow from output files
-        elif path.lower().endswith((".glb", ".png")):
-            # Extract workflow from the metadata of the file
-            new_workflow_data = extract_workflow_from_metadata(path)
-            if not new_workflow_data:
-                error_message = f"No workflow found in the metadata of the file {path}."
-                raise Exception(error_message)
+    @staticmethod
+    def process_file(path):
+        """Extract and hash the workflow of a file, this is called from worker threads."""
+
+        try:
+            # Import workflow from JSON file
+            if path.lower().endswith(".json"):
+                with open(path, "r", encoding="utf-8") as file:
+                    workflow_data = json.load(file)
+
+            # Import workflow from output files
+            elif path.lower().endswith((".glb", ".png")):
+                # Extract workflow from the metadata of the file
+                workflow_data = extract_workflow_from_metadata(path)
+                if not workflow_data:
+                    error_message = f"No workflow found in the metadata of the file {path}."
+                    return path, None, None, error_message
 
-            # Check if a workflow with the same data already exists
-            workflow_filename = check_workflow_file_exists(new_workflow_data, workflows_folder)
-
-            # Get target file name and path if workflow does not exist
-            if not workflow_filename:
-                workflow_filename = os.path.basename(path)
-                workflow_filename = os.path.splitext(workflow_filename)[0] + ".json"
-                workflow_filename, workflow_path = get_filepath(workflow_filename, workflows_folder)
-                try:
-                    # Save the file to the workflow folder
-                    with open(workflow_path, "w", encoding="utf-8") as file:
-                        json.dump(new_workflow_data, file, indent=2, ensure_ascii=False)
-                    self.report({'INFO'}, f"Workflow saved to: {workflow_path}")
-                    return workflow_filename
-                except Exception as e:
-                    error_message = f"Failed to save workflow from {path}: {e}"
-                    raise Exception(error_message)
             else:
-                self.report({'INFO'}, f"Workflow already exists: {workflow_filename}")
-                return workflow_filename
+                error_message = f"Selected file extension is not supported: {path}"
+                return path, None, None, error_message
 
+        except Exception as e:
+            error_message = f"Failed to read workflow from {path}: {e}"
+            return path, None, None, error_message
+
+        return path, workflow_data, get_workflow_hash(workflow_data), None
+
+    def save_workflow(self, workflows_folder, path, workflow_data):
+        """Save a new workflow in the workflows folder and return its file name."""
+
+        # Copy JSON file to the workflows folder
+        if path.lower().endswith(".json"):
+            workflow_filename = os.path.basename(path)
+            workflow_filename, workflow_path = get_filepath(workflow_filename, workflows_folder)
+            try:
+                shutil.copy(path, workflow_path)
+                self.report({'INFO'}, f"Workflow copied to: {workflow_path}")
+            except shutil.SameFileError as e:
+                self.report({'INFO'}, f"Workflow is already in the inputs folder: {workflow_path}")
+            except Exception as e:
+                error_message = f"Failed to copy workflow file {path}: {e}"
+                raise Exception(error_message)
+
+        # Save workflow extracted from output file to the workflows folder
         else:
-            error_message = f"Selected file extension is not supported: {path}"
-            raise Exception(error_message)
+            workflow_filename = os.path.basename(path)
+            workflow_filename = os.path.splitext(workflow_filename)[0] + ".json"
+            workflow_filename, workflow_path = get_filepath(workflow_filename, workflows_folder)
+            try:
+                with open(workflow_path, "w", encoding="utf-8") as file:
+                    json.dump(workflow_data, file, indent=2, ensure_ascii=False)
+                self.report({'INFO'}, f"Workflow saved to: {workflow_path}")
+            except Exception as e:
+                error_message = f"Failed to save workflow from {path}: {e}"
+                raise Exception(error_message)
+        return workflow_filename
 
 
 def register():
@@ -1,11 +1,160 @@
 """Operator to project an image as material on a mesh."""
 import logging
 import math
+import os
 
 import bpy
+from mathutils import Vector
+
+from ..utils import get_outputs_folder
 
 log = logging.getLogger("comfyui_blender")
 
+MAX_UV_LAYERS = 8  # Maximum number of UV maps of a mesh in Blender
+
+
+def build_blend_material(material, projections, sharpness):
+    """Build the nodes of a material blending the images projected from several cameras.
+    Each image is weighted by how much the surface faces its camera, pixels outside of the view of a camera are ignored.
+    Return the UV map nodes of the cameras."""
+
+    nodes = material.node_tree.nodes
+    links = material.node_tree.links
+    geometry_node = nodes.new(type="ShaderNodeNewGeometry")
+    geometry_node.location = (-1200, 300)
+
+    uv_nodes = {}
+    color_sum = None
+    weight_sum = None
+    for i, (camera, image) in enumerate(projections):
+        y = -i * 400
+
+        # Sample the image with the UV map projected from the camera
+        uv_node = nodes.new(type="ShaderNodeUVMap")
+        uv_node.location = (-1200, y)
+        uv_nodes[camera.name] = uv_node
+        image_node = nodes.new(type="ShaderNodeTexImage")
+        image_node.image = image
+        image_node.extension = "CLIP"  # Alpha is 0 outside of the view of the camera
+        image_node.location = (-1000, y)
+        links.new(uv_node.outputs["UV"], image_node.inputs["Vector"])
+
+        # Direction from the surface to the camera, orthographic cameras look along their Z axis
+        direction_node = nodes.new(type="ShaderNodeVectorMath")
+        direction_node.operation = "SUBTRACT"
+        direction_node.location = (-1000, y - 250)
+        if camera.data.type == "ORTHO":
+            direction_node.inputs[0].default_value = camera.matrix_world.to_quaternion() @ Vector((0, 0, 1))
+        else:
+            direction_node.inputs[0].default_value = camera.matrix_world.translation
+            links.new(geometry_node.outputs["Position"], direction_node.inputs[1])
+        normalize_node = nodes.new(type="ShaderNodeVectorMath")
+        normalize_node.operation = "NORMALIZE"
+        normalize_node.location = (-800, y - 250)
+        links.new(direction_node.outputs["Vector"], normalize_node.inputs[0])
+
+        # Weight = max(0, N.V) ^ sharpness * alpha
+        facing_node = nodes.new(type="ShaderNodeVectorMath")
+        facing_node.operation = "DOT_PRODUCT"
+        facing_node.location = (-600, y - 250)
+        links.new(normalize_node.outputs["Vector"], facing_node.inputs[0])
+        links.new(geometry_node.outputs["Normal"], facing_node.inputs[1])
+        clamp_node = nodes.new(type="ShaderNodeMath")
+        clamp_node.operation = "MAXIMUM"
+        clamp_node.inputs[1].default_value = 0.0
+        clamp_node.location = (-400, y - 250)
+        links.new(facing_node.outputs["Value"], clamp_node.inputs[0])
+        power_node = nodes.new(type="ShaderNodeMath")
+        power_node.operation = "POWER"
+        power_node.inputs[1].default_value = sharpness
+        power_node.location = (-200, y - 250)
+        links.new(clamp_node.outputs[0], power_node.inputs[0])
+        weight_node = nodes.new(type="ShaderNodeMath")
+        weight_node.operation = "MULTIPLY"
+        weight_node.location = (0, y - 250)
+        links.new(power_node.outputs[0], weight_node.inputs[0])
+        links.new(image_node.outputs["Alpha"], weight_node.inputs[1])
+
+        # Accumulate the weighted colors and the weights
+        scale_node = nodes.new(type="ShaderNodeVectorMath")
+        scale_node.operation = "SCALE"
+        scale_node.location = (200, y)
+        links.new(image_node.outputs["Color"], scale_node.inputs[0])
+        links.new(weight_node.outputs[0], scale_node.inputs["Scale"])
+        if color_sum is None:
+            color_sum = scale_node.outputs["Vector"]
+            weight_sum = weight_node.outputs[0]
+            continue
+        color_node = nodes.new(type="ShaderNodeVectorMath")
+        color_node.operation = "ADD"
+        color_node.location = (400, y)
+        links.new(color_sum, color_node.inputs[0])
+        links.new(scale_node.outputs["Vector"], color_node.inputs[1])
+        color_sum = color_node.outputs["Vector"]
+        sum_node = nodes.new(type="ShaderNodeMath")
+        sum_node.operation = "ADD"
+        sum_node.location = (400, y - 250)
+        links.new(weight_sum, sum_node.inputs[0])
+        links.new(weight_node.outputs[0], sum_node.inputs[1])
+        weight_sum = sum_node.outputs[0]
+
+    # Normalize the sum of the colors by the sum of the weights
+    safe_node = nodes.new(type="ShaderNodeMath")
+    safe_node.operation = "MAXIMUM"
+    safe_node.inputs[1].default_value = 1e-4
+    safe_node.location = (600, -250)
+    links.new(weight_sum, safe_node.inputs[0])
+    inverse_node = nodes.new(type="ShaderNodeMath")
+    inverse_node.operation = "DIVIDE"
+    inverse_node.inputs[0].default_value = 1.0
+    inverse_node.location = (800, -250)
+    links.new(safe_node.outputs[0], inverse_node.inputs[1])
+    normalize_node = nodes.new(type="ShaderNodeVectorMath")
+    normalize_node.operation = "SCALE"
+    normalize_node.location = (1000, 0)
+    links.new(color_sum, normalize_node.inputs[0])
+    links.new(inverse_node.outputs[0], normalize_node.inputs["Scale"])
+    output_node = nodes.new(type="ShaderNodeOutputMaterial")
+    output_node.location = (1200, 0)
+    links.new(normalize_node.outputs["Vector"], output_node.inputs[0])
+    return uv_nodes
+
+
+def get_camera_projections(context, name):
+    """Return the cameras and images of the outputs generated for cameras in the same batch as an image output.
+    Return None if the output was not generated for a camera."""
+
+    outputs_collection = context.scene.comfyui_project_settings.outputs_collection
+    output = next((output for output in outputs_collection if output.name == name), None)
+    if output is None or not output.camera:
+        return None
+
+    # Keep the first image of each camera, the output itself is used for its camera
+    batch_outputs = [output]
+    if output.batch_id:
+        batch_outputs += [o for o in outputs_collection if o.batch_id == output.batch_id and o.camera and o.type == "image"]
+    projections = {}
+    for batch_output in batch_outputs:
+        camera = bpy.data.objects.get(batch_output.camera)
+        if batch_output.camera in projections or camera is None or camera.type != "CAMERA":
+            continue
+        image = bpy.data.images.get(batch_output.name)
+        if image is None:
+            filepath = os.path.join(get_outputs_folder(), batch_output.filepath)
+            if not os.path.isfile(filepath):
+                continue
+            image = bpy.data.images.load(filepath, check_existing=True)
+        projections[batch_output.camera] = (camera, image)
+    return list(projections.values()) or None
+
+
+def get_uv_map_name(camera, nb_projections):
+    """Return the name of the UV map projected from a camera."""
+
+    if nb_projections == 1:
+        return "UVMap.Projection"
+    return f"UVMap.Projection.{camera.name}"[:63]
+
 
 class ComfyBlenderOperatorProjectMaterial(bpy.types.Operator):
     """Operator to project an image as material on a mesh."""
@@ -15,6 +164,12 @@ class ComfyBlenderOperatorProjectMaterial(bpy.types.Operator):
     bl_description = "Project the image on the selected mesh."
 
     name: bpy.props.StringProperty(name="Name")
+    sharpness: bpy.props.FloatProperty(
+        name="Sharpness",
+        description="Exponent of the weights blending the images of several cameras, higher values favor the camera facing the surface.",
+        default=4.0,
+        min=0.0
+    )
 
     def execute(self, context):
         """Execute the operator."""
@@ -27,13 +182,26 @@ class ComfyBlenderOperatorProjectMaterial(bpy.types.Operator):
             bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
             return {'CANCELLED'}
 
-        # Check if the scene has a camera
-        camera = context.scene.camera
-        if not camera:
-            error_message = f"The scene should have at least one camera."
-            log.error(error_message)
-            bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-            return {'CANCELLED'}
+        # Outputs generated for the cameras of a collection are projected from their cameras and blended together
+        image = bpy.data.images.get(self.name)
+        projections = get_camera_projections(context, self.name)
+        if not projections:
+            # Check if the scene has a camera
+            camera = context.scene.camera
+            if not camera:
+                error_message = f"The scene should have at least one camera."
+                log.error(error_message)
+                bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+                return {'CANCELLED'}
+            projections = [(camera, image)]
+
+        # Check the meshes have enough free UV maps for the projections
+        for obj in selected_meshes:
+            if len(obj.data.uv_layers) + len(projections) > MAX_UV_LAYERS:
+                error_message = f"The mesh {obj.name} does not have enough free UV maps to project {len(projections)} image(s)."
+                log.error(error_message)
+                bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+                return {'CANCELLED'}
 
         # Create new geometry nodes to manage the projection
         # geometry_nodes = bpy.data.node_groups.new(name="Projection Geometry Nodes", type="GeometryNodeTree")
@@ -62,23 +230,26 @@ class ComfyBlenderOperatorProjectMaterial(bpy.types.Operator):
         links = material.node_tree.links
         nodes.clear()  # Clear default nodes
 
-        # Create shader nodes
-        uv_node = nodes.new(type="ShaderNodeUVMap")
-        image_node = nodes.new(type="ShaderNodeTexImage")
-        output_node = nodes.new(type="ShaderNodeOutputMaterial")
+        if len(projections) > 1:
+            uv_nodes = build_blend_material(material, projections, self.sharpness)
+        else:
+            # Create shader nodes
+            uv_node = nodes.new(type="ShaderNodeUVMap")
+            image_node = nodes.new(type="ShaderNodeTexImage")
+            output_node = nodes.new(type="ShaderNodeOutputMaterial")
 
-        # Position shader nodes
-        uv_node.location = (-200, 0)
-        image_node.location = (0, 0)
-        output_node.location = (300, 0)
+            # Position shader nodes
+            uv_node.location = (-200, 0)
+            image_node.location = (0, 0)
+            output_node.location = (300, 0)
 
-        # Link shader nodes
-        links.new(uv_node.outputs[0], image_node.inputs[0])  # From output socket Color to input socket Surface
-        links.new(image_node.outputs[0], output_node.inputs[0])  # From output socket Color to input socket Surface
+            # Link shader nodes
+            links.new(uv_node.outputs[0], image_node.inputs[0])  # From output socket Color to input socket Surface
+            links.new(image_node.outputs[0], output_node.inputs[0])  # From output socket Color to input socket Surface
 
-        # Get image and assign it to the shader texture node
-        image = bpy.data.images.get(self.name)
-        image_node.image = image
+            # Assign the image to the shader texture node
+            image_node.image = projections[0][1]
+            uv_nodes = {projections[0][0].name: uv_node}
 
         # Loop on each selected mesh
         for obj in selected_meshes:
@@ -95,31 +266,33 @@ class ComfyBlenderOperatorProjectMaterial(bpy.types.Operator):
             # Assign material to the mesh
             obj.data.materials[0] = material if obj.data.materials else obj.data.materials.append(material)
 
-            # Create new UV map for the projection
-            uv_map = obj.data.uv_layers.new(name="UVMap.Projection")
-            uv_map.active_render = True
-
-            # Assign UV map to the shader UV node
-            uv_node.uv_map = uv_map.name
-
-            # Add modifier to apply the geometry nodes
-            # modifier = obj.modifiers.new(name="Projected Geometry Nodes", type="NODES")
-            # modifier.node_group = geometry_nodes
-
-            # Add modifier to project the texture
-            modifier = obj.modifiers.new(name="Modifier.Projection", type="UV_PROJECT")
-            modifier.uv_layer = uv_map.name
-            modifier.projector_count = 1
-            modifier.projectors[0].object = camera
-
-            # Set aspect ratio based on image dimensions
-            width, height = image.size
-            gcd = math.gcd(width, height)  # Greatest common divisor
-            modifier.aspect_x = width // gcd
-            modifier.aspect_y = height // gcd
-
-            # Apply the modifier
-            bpy.ops.object.modifier_apply(modifier=modifier.name)
+            # Project a UV map from each camera
+            for camera, image in projections:
+                # Create new UV map for the projection
+                uv_map = obj.data.uv_layers.new(name=get_uv_map_name(camera, len(projections)))
+                uv_map.active_render = True
+
+                # Assign UV map to the shader UV node
+                uv_nodes[camera.name].uv_map = uv_map.name
+
+                # Add modifier to apply the geometry nodes
+                # modifier = obj.modifiers.new(name="Projected Geometry Nodes", type="NODES")
+                # modifier.node_group = geometry_nodes
+
+                # Add modifier to project the texture
+                modifier = obj.modifiers.new(name="Modifier.Projection", type="UV_PROJECT")
+                modifier.uv_layer = uv_map.name
+                modifier.projector_count = 1
+                modifier.projectors[0].object = camera
+
+                # Set aspect ratio based on image dimensions
+                width, height = image.size
+                gcd = math.gcd(width, height)  # Greatest common divisor
+                modifier.aspect_x = width // gcd
+                modifier.aspect_y = height // gcd
+
+                # Apply the modifier
+                bpy.ops.object.modifier_apply(modifier=modifier.name)
 
         return {'FINISHED'}
 
@@ -0,0 +1,47 @@
+"""Operator to refresh the lists of models from the ComfyUI server."""
+import logging
+
+import bpy
+
+from ..catalog import MODEL_TYPES, fetch_catalog
+from ..workflow import refresh_workflow_class
+
+log = logging.getLogger("comfyui_blender")
+
+
+class ComfyBlenderOperatorRefreshModels(bpy.types.Operator):
+    """Operator to refresh the lists of models from the ComfyUI server."""
+
+    bl_idname = "comfy.refresh_models"
+    bl_label = "Refresh Models"
+    bl_description = "Query the lists of models from the ComfyUI server again."
+
+    def execute(self, context):
+        """Execute the operator."""
+
+        # Get add-on preferences
+        addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+        if not addon_prefs.connection_status:
+            error_message = "Connect to the ComfyUI server to refresh the lists of models."
+            log.error(error_message)
+            bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+            return {'CANCELLED'}
+
+        # Fetch all lists of models in the background, ignoring the cache duration
+        # The current workflow is refreshed when the lists of models are received
+        fetch_catalog(MODEL_TYPES.keys(), force=True, callback=refresh_workflow_class)
+
+        self.report({'INFO'}, "Refreshing lists of models from ComfyUI server...")
+        return {'FINISHED'}
+
+
+def register():
+    """Register the operator."""
+
+    bpy.utils.register_class(ComfyBlenderOperatorRefreshModels)
+
+
+def unregister():
+    """Unregister the operator."""
+
+    bpy.utils.unregister_class(ComfyBlenderOperatorRefreshModels)
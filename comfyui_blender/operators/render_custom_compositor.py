@@ -1,11 +1,11 @@
 """Operator to render from the camera view using custom compositors."""
 import logging
 import os
-import shutil
 
 import bpy
 
-from ..utils import get_inputs_folder, get_temp_folder, upload_file
+from ..capture import upload_render
+from ..utils import get_temp_folder
 
 log = logging.getLogger("comfyui_blender")
 
@@ -20,19 +20,6 @@ class ComfyBlenderOperatorRenderDepthMap(bpy.types.Operator):
     compositor_name: bpy.props.StringProperty(name="Compositor Name")
     workflow_property: bpy.props.StringProperty(name="Workflow Property")
 
-    def reset_scene(self, context, **kwargs):
-        """Reset the scene to its initial state."""
-
-        # Restore original render settings
-        scene = context.scene
-        scene.render.filepath = kwargs["original_filepath"]
-
-        # Remove temporary files
-        if os.path.exists(kwargs["extra_filepath"]):
-            os.remove(kwargs["extra_filepath"])
-        if os.path.exists(kwargs["temp_filepath"]):
-            os.remove(kwargs["temp_filepath"])
-
     def execute(self, context):
         """Execute the operator."""
 
@@ -45,15 +32,6 @@ class ComfyBlenderOperatorRenderDepthMap(bpy.types.Operator):
 
         # Build temp file paths
         temp_folder = get_temp_folder()
-        extra_filepath = os.path.join(temp_folder, "tmp.png")  # Extraneous file generated by Blender renderer
-
-        # Initialize scene reset settings
-        reset_params = {}
-        reset_params["extra_filepath"] = extra_filepath
-        reset_params["original_filepath"] = scene.render.filepath
-
-        # Set up the scene for rendering
-        scene.render.filepath = extra_filepath
 
         # Get the file output node
         tree = bpy.data.node_groups[self.compositor_name]
@@ -111,71 +89,29 @@ class ComfyBlenderOperatorRenderDepthMap(bpy.types.Operator):
 
         # Render the scene
         output_file_node.directory = temp_folder
-        scene.compositing_node_group = tree
-        bpy.ops.render.render(write_still=True)
-
-        # Get the rendered file path
-        temp_filename = output_file_node.file_name + file_output_items[0].name + extension
-        temp_filepath = os.path.join(temp_folder, temp_filename)
-        reset_params["temp_filepath"] = temp_filepath  # Add the temp filepath to the reset param to delete it later
-
-        # Upload file on ComfyUI server
+        original_compositing_node_group = scene.compositing_node_group
         try:
-            response = upload_file(temp_filepath, type="image")
-        except Exception as e:
-            # Reset the scene to initial state
-            # self.reset_scene(context, **reset_params)
-            addon_prefs = context.preferences.addons["comfyui_blender"].preferences
-            error_message = f"Failed to upload file to ComfyUI server: {addon_prefs.server_address}. {e}"
-            log.exception(error_message)
-            bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-            return {'CANCELLED'}
+            scene.compositing_node_group = tree
+            bpy.ops.render.render(write_still=False)  # Only the file output node writes a file
 
-        if response.status_code != 200:
+        finally:
             # Reset the scene to initial state
-            # self.reset_scene(context, **reset_params)
-            error_message = f"Failed to upload file: {response.status_code} - {response.text}"
-            log.error(error_message)
-            bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-            return {'CANCELLED'}
-
-        # Delete the previous input image from Blender's data
-        current_workflow = scene.current_workflow
-        previous_image = getattr(current_workflow, self.workflow_property)
-        if previous_image:
-            bpy.data.images.remove(previous_image)
-
-        # Build input file paths
-        inputs_folder = get_inputs_folder()
-        input_subfolder = response.json()["subfolder"]
-        input_filename = response.json()["name"]
-        input_filepath = os.path.join(inputs_folder, input_subfolder, input_filename)
+            scene.compositing_node_group = original_compositing_node_group
 
-        # Create the input subfolder if it doesn't exist
-        os.makedirs(os.path.join(inputs_folder, input_subfolder), exist_ok=True)
+        # Get the rendered file path
+        temp_filename = output_file_node.file_name + file_output_items[0].name + extension
+        temp_filepath = os.path.join(temp_folder, temp_filename)
 
+        # Upload file on ComfyUI server and move it to the inputs folder
         try:
-            # Copy the file to the inputs folder
-            shutil.copy(temp_filepath, input_filepath)
-            self.report({'INFO'}, f"Input file copied to: {input_filepath}")
-        except shutil.SameFileError as e:
-            self.report({'INFO'}, f"Input file is already in the inputs folder: {input_filepath}")
+            input_filepath = upload_render(context, self.workflow_property, temp_filepath)
         except Exception as e:
-            # Reset the scene to initial state
-            # self.reset_scene(context, **reset_params)
-            error_message = f"Failed to copy input file: {e}"
+            error_message = str(e)
             log.exception(error_message)
             bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
             return {'CANCELLED'}
 
-        # Load image in the data block
-        image = bpy.data.images.load(input_filepath, check_existing=True)
-
-        # Update the workflow property with the image from the data block
-        setattr(current_workflow, self.workflow_property, image)
-
-        # Reset the scene to initial state
-        # self.reset_scene(context, **reset_params)
+        self.report({'INFO'}, f"Input file copied to: {input_filepath}")
         return {'FINISHED'}
 
 
@@ -1,15 +1,317 @@
 """Operator to render a depth map."""
 import logging
 import os
-import shutil
 from math import tan
 
 import bpy
+import numpy as np
+from mathutils.bvhtree import BVHTree
 
-from ..utils import get_inputs_folder, get_temp_folder, upload_file
+from ..capture import get_compositor_group, upload_render
+from ..utils import encode_png, get_temp_folder
 
 log = logging.getLogger("comfyui_blender")
 
+COMPOSITOR_NAME = ".ComfyUI Depth Map"  # Names starting with a dot are hidden from the compositors menu
+TEMP_FILENAME = "blender_depth_map"
+DEPTH_TILE_ROWS = 64  # Number of rows of rays generated at once by the ray cast backend
+
+
+def build_depth_map_compositor(tree):
+    """Build the nodes of the compositor group writing the depth pass to a file."""
+
+    # Create nodes
+    rlayers_node = tree.nodes.new(type="CompositorNodeRLayers")
+    map_range_node = tree.nodes.new(type="ShaderNodeMapRange")
+    map_range_node.name = "Map Range"
+    map_range_node.inputs[3].default_value = 1 # To Min
+    map_range_node.inputs[4].default_value = 0 # To Max
+    output_file_node = tree.nodes.new(type="CompositorNodeOutputFile")
+    output_file_node.name = "File Output"
+    output_file_node.file_name = ""  # Filename will be set by the file output item
+    output_file_node.format.media_type = "IMAGE"
+    output_file_node.format.color_mode = "RGB"
+    output_file_node.format.file_format = "PNG"
+    output_file_node.format.compression = 0
+    output_file_node.file_output_items.new("FLOAT", TEMP_FILENAME)  # Create input socket blender_depth_map
+
+    # Link nodes
+    tree.links.new(rlayers_node.outputs[2], map_range_node.inputs[0])  # From output socket Depth to input socket Value
+    tree.links.new(map_range_node.outputs[0], output_file_node.inputs[0])  # From output socket Value to input socket blender_depth_map
+
+
+def get_camera_coordinates(coords, obj_matrix, cam_matrix_inv):
+    """Return the world coordinates and camera space coordinates of an array of local coordinates."""
+
+    world_coords = coords @ obj_matrix[:3, :3].T + obj_matrix[:3, 3]
+    cam_coords = world_coords @ cam_matrix_inv[:3, :3].T + cam_matrix_inv[:3, 3]
+    return world_coords, cam_coords
+
+
+def get_depth_range(context):
+    """Return the distances of the closest and furthest vertices in the camera frustum.
+    Objects are culled with their bounding box and vertices are sampled from the evaluated meshes."""
+
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+
+    # Get camera info
+    scene = context.scene
+    cam_location = np.array(scene.camera.matrix_world.translation, dtype=np.float32)
+    cam_matrix_inv = np.array(scene.camera.matrix_world.inverted(), dtype=np.float32)
+    cam_data = scene.camera.data
+    aspect_ratio = scene.render.resolution_x / scene.render.resolution_y
+    min_distance = float('inf')
+    max_distance = 0.0
+    if cam_data.type not in ("PERSP", "ORTHO"):
+        return cam_data.clip_start, cam_data.clip_end
+
+    # Cull objects outside the camera frustum
+    # The evaluated mesh of each object is read directly, without copying it with to_mesh
+    visible_meshes = [(obj_eval.data, obj_matrix) for obj_eval, obj_matrix in get_visible_objects(context)]
+    nb_vertices = sum(len(mesh.vertices) for mesh, _ in visible_meshes)
+
+    # Sample vertices with a stride when the scene has more vertices than the limit
+    stride = 1
+    if addon_prefs.depth_max_vertices and nb_vertices > addon_prefs.depth_max_vertices:
+        stride = -(-nb_vertices // addon_prefs.depth_max_vertices)
+        log.debug(f"Sampling 1 vertex out of {stride} to compute the depth range.")
+
+    for mesh, obj_matrix in visible_meshes:
+        nb_mesh_vertices = len(mesh.vertices)
+        if nb_mesh_vertices == 0:
+            continue
+        # Read all vertex coordinates at once, then keep one vertex out of stride
+        coords = np.empty(nb_mesh_vertices * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", coords)
+        coords = coords.reshape(-1, 3)[::stride]
+
+        # Check if vertices are in camera frustum
+        world_coords, cam_coords = get_camera_coordinates(coords, obj_matrix, cam_matrix_inv)
+        mask = get_frustum_mask(cam_coords, cam_data, aspect_ratio).all(axis=1)
+        if not mask.any():
+            continue
+
+        # Get distances of the vertices in the frustum
+        distances = np.linalg.norm(world_coords[mask] - cam_location, axis=1)
+        min_distance = min(min_distance, float(distances.min()))
+        max_distance = max(max_distance, float(distances.max()))
+
+    # Handle case where no vertices are in frustum
+    if min_distance == float("inf"):
+        min_distance = cam_data.clip_start
+        max_distance = cam_data.clip_end
+
+    return min_distance, max_distance
+
+
+def get_frustum_mask(cam_coords, cam_data, aspect_ratio):
+    """Return a mask of the camera space coordinates inside each plane of the camera frustum, one column per plane."""
+
+    # Z value should be negative (in front of camera) and within clipping distances
+    z_dist = -cam_coords[:, 2]
+    if cam_data.type == "PERSP":
+        h_bound = z_dist * tan(cam_data.angle / 2)
+    else:
+        h_bound = np.full(len(cam_coords), cam_data.ortho_scale / 2, dtype=np.float32)
+    v_bound = h_bound / aspect_ratio
+    return np.stack((
+        (z_dist > 0) & (z_dist >= cam_data.clip_start),
+        z_dist <= cam_data.clip_end,
+        cam_coords[:, 0] <= h_bound,
+        cam_coords[:, 0] >= -h_bound,
+        cam_coords[:, 1] <= v_bound,
+        cam_coords[:, 1] >= -v_bound
+    ), axis=1)
+
+
+def get_scene_bvhtree(context):
+    """Return a BVH tree in world space of the evaluated meshes visible from the camera, or None if there are none."""
+
+    vertices = []
+    triangles = []
+    offset = 0
+    for obj_eval, obj_matrix in get_visible_objects(context):
+        mesh = obj_eval.to_mesh()
+        try:
+            # Read all vertex coordinates and triangles at once
+            mesh.calc_loop_triangles()
+            nb_mesh_vertices = len(mesh.vertices)
+            nb_triangles = len(mesh.loop_triangles)
+            if nb_triangles == 0:
+                continue
+            coords = np.empty(nb_mesh_vertices * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", coords)
+            mesh_triangles = np.empty(nb_triangles * 3, dtype=np.int32)
+            mesh.loop_triangles.foreach_get("vertices", mesh_triangles)
+        finally:
+            obj_eval.to_mesh_clear()
+
+        # Merge all meshes in world space so each ray is cast once
+        coords = coords.reshape(nb_mesh_vertices, 3)
+        vertices.append(coords @ obj_matrix[:3, :3].T + obj_matrix[:3, 3])
+        triangles.append(mesh_triangles.reshape(nb_triangles, 3) + offset)
+        offset += nb_mesh_vertices
+
+    if not vertices:
+        return None
+    return BVHTree.FromPolygons(np.concatenate(vertices).tolist(), np.concatenate(triangles).tolist())
+
+
+def get_visible_objects(context):
+    """Return the evaluated mesh objects and their world matrices whose bounding box intersects the camera frustum."""
+
+    scene = context.scene
+    cam_matrix_inv = np.array(scene.camera.matrix_world.inverted(), dtype=np.float32)
+    cam_data = scene.camera.data
+    aspect_ratio = scene.render.resolution_x / scene.render.resolution_y
+
+    # Flush the edits of meshes in edit mode, the evaluated meshes would have the geometry before the edits
+    for obj in scene.objects:
+        if obj.type == "MESH" and obj.mode == "EDIT":
+            obj.update_from_editmode()
+
+    # Evaluate objects with their modifiers and geometry nodes
+    depsgraph = context.evaluated_depsgraph_get()
+
+    # Cull objects whose bounding box is entirely outside one of the planes of the camera frustum
+    visible_objects = []
+    for obj in scene.objects:
+        if obj.type == "MESH" and obj.visible_get():
+            obj_eval = obj.evaluated_get(depsgraph)
+            obj_matrix = np.array(obj_eval.matrix_world, dtype=np.float32)
+            bound_box = np.array([corner[:] for corner in obj_eval.bound_box], dtype=np.float32)
+            _, cam_corners = get_camera_coordinates(bound_box, obj_matrix, cam_matrix_inv)
+            if get_frustum_mask(cam_corners, cam_data, aspect_ratio).any(axis=0).all():
+                visible_objects.append((obj_eval, obj_matrix))
+    return visible_objects
+
+
+def render_depth_map(context, temp_folder):
+    """Render a depth map from the camera to a file of the temp folder and return its path."""
+
+    scene = context.scene
+    if not scene.camera:
+        raise Exception("No camera found")
+
+    # Cast rays instead of rendering the scene if the ray cast backend is selected
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+    if addon_prefs.depth_backend == "raycast":
+        return render_depth_raycast(context, temp_folder)
+
+    # Build temp file paths
+    temp_filepath = os.path.join(temp_folder, f"{TEMP_FILENAME}.png")
+
+    # Save original render settings
+    original_file_format = scene.render.image_settings.file_format
+    original_color_mode = scene.render.image_settings.color_mode
+    original_color_depth = scene.render.image_settings.color_depth
+    original_compression = scene.render.image_settings.compression
+    original_display_device = scene.display_settings.display_device
+    original_view_transform = scene.view_settings.view_transform
+
+    # Set up the scene for rendering
+    scene.render.image_settings.file_format = "PNG"
+    scene.render.image_settings.color_mode = "RGBA"
+    scene.render.image_settings.color_depth = "16"
+    scene.render.image_settings.compression = 0
+    scene.display_settings.display_device = "Display P3"
+    scene.view_settings.view_transform = "Raw"
+
+    # Enable Z pass
+    scene.view_layers["ViewLayer"].use_pass_z = True
+
+    # Get the compositor group, it is only built on the first render
+    tree = get_compositor_group(COMPOSITOR_NAME, build_depth_map_compositor)
+    tree.nodes["File Output"].directory = temp_folder
+    map_range_node = tree.nodes["Map Range"]
+    original_compositing_node_group = scene.compositing_node_group
+
+    try:
+        # Get closest and furthest vertices in the camera frustum
+        min_distance, max_distance = get_depth_range(context)
+
+        # Update Map Range node
+        map_range_node.inputs[1].default_value = min_distance  # From Min
+        map_range_node.inputs[2].default_value = max_distance  # From Max
+
+        # Render the scene
+        scene.compositing_node_group = tree
+        bpy.ops.render.render(write_still=False)  # Only the file output nodes write files
+
+    finally:
+        # Reset the scene to initial state
+        scene.compositing_node_group = original_compositing_node_group
+        scene.render.image_settings.file_format = original_file_format
+        scene.render.image_settings.color_mode = original_color_mode
+        scene.render.image_settings.color_depth = original_color_depth
+        scene.render.image_settings.compression = original_compression
+        scene.display_settings.display_device = original_display_device
+        scene.view_settings.view_transform = original_view_transform
+
+    return temp_filepath
+
+
+def render_depth_raycast(context, temp_folder):
+    """Cast a grid of camera rays against the evaluated meshes and write a 16-bit depth map to a file of the temp folder.
+    Return the path of the file, near surfaces are white and far surfaces or empty pixels are black."""
+
+    scene = context.scene
+    cam_data = scene.camera.data
+    if cam_data.type not in ("PERSP", "ORTHO"):
+        raise Exception(f"Camera type {cam_data.type} is not supported by the ray cast depth backend.")
+    temp_filepath = os.path.join(temp_folder, f"{TEMP_FILENAME}.png")
+
+    # Get resolution of the render
+    width = max(1, int(scene.render.resolution_x * scene.render.resolution_percentage / 100))
+    height = max(1, int(scene.render.resolution_y * scene.render.resolution_percentage / 100))
+    depth = np.zeros((height, width), dtype=np.float32)
+
+    tree = get_scene_bvhtree(context)
+    if tree:
+        # Get the corners of the camera frame in camera space: top right, bottom right, bottom left, top left
+        cam_matrix = np.array(scene.camera.matrix_world, dtype=np.float32)
+        _, bottom_right, bottom_left, top_left = [np.array(corner[:], dtype=np.float32) for corner in cam_data.view_frame(scene=scene)]
+        max_distance = cam_data.clip_end - cam_data.clip_start
+        u = (np.arange(width, dtype=np.float32) + 0.5) / width
+
+        # Generate the rays of a tile of rows at once to bound memory usage
+        for row_start in range(0, height, DEPTH_TILE_ROWS):
+            row_end = min(row_start + DEPTH_TILE_ROWS, height)
+            v = 1 - (np.arange(row_start, row_end, dtype=np.float32) + 0.5) / height
+            points = bottom_left + u[np.newaxis, :, np.newaxis] * (bottom_right - bottom_left) + v[:, np.newaxis, np.newaxis] * (top_left - bottom_left)
+            points = points.reshape(-1, 3)
+
+            # Rays start from the camera location in perspective and from the camera plane in orthographic
+            if cam_data.type == "PERSP":
+                directions = points @ cam_matrix[:3, :3].T
+                origins = np.broadcast_to(cam_matrix[:3, 3], directions.shape)
+            else:
+                points[:, 2] = 0
+                origins = points @ cam_matrix[:3, :3].T + cam_matrix[:3, 3]
+                directions = np.broadcast_to(-cam_matrix[:3, 2], origins.shape)
+            directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+            origins = origins + directions * cam_data.clip_start
+
+            # Store the distance of the first hit of each ray
+            tile = depth[row_start:row_end].reshape(-1)
+            for i, (origin, direction) in enumerate(zip(origins.tolist(), directions.tolist())):
+                location, _, _, distance = tree.ray_cast(origin, direction, max_distance)
+                if location is not None:
+                    tile[i] = distance + cam_data.clip_start
+
+    # Normalize distances between the closest and furthest hits
+    pixels = np.zeros((height, width), dtype=np.uint16)
+    hits = depth > 0
+    if hits.any():
+        min_distance = depth[hits].min()
+        max_distance = depth[hits].max()
+        scale = max(max_distance - min_distance, 1e-6)
+        pixels[hits] = np.round((max_distance - depth[hits]) / scale * 65535).astype(np.uint16)
+
+    with open(temp_filepath, "wb") as file:
+        file.write(encode_png(pixels))
+    return temp_filepath
+
 
 class ComfyBlenderOperatorRenderDepthMap(bpy.types.Operator):
     """Operator to render a depth map."""
@@ -19,31 +321,10 @@ class ComfyBlenderOperatorRenderDepthMap(bpy.types.Operator):
     bl_description = "Render a depth map from the camera and upload it to the ComfyUI server."
 
     workflow_property: bpy.props.StringProperty(name="Workflow Property")
-    temp_filename = "blender_depth_map"
-
-    def reset_scene(self, context, **kwargs):
-        """Reset the scene to its initial state."""
-
-        # Restore original render settings
-        scene = context.scene
-        scene.render.filepath = kwargs["original_filepath"]
-        scene.render.image_settings.file_format = kwargs["original_file_format"]
-        scene.render.image_settings.color_mode = kwargs["original_color_mode"]
-        scene.render.image_settings.color_depth = kwargs["original_color_depth"]
-        scene.render.image_settings.compression = kwargs["original_compression"]
-        scene.display_settings.display_device = kwargs["original_display_device"]
-        scene.view_settings.view_transform = kwargs["original_view_transform"]
-
-        # Remove temporary files
-        if os.path.exists(kwargs["extra_filepath"]):
-            os.remove(kwargs["extra_filepath"])
-        if os.path.exists(kwargs["temp_filepath"]):
-            os.remove(kwargs["temp_filepath"])
 
     def execute(self, context):
         """Execute the operator."""
 
-        scene = context.scene
         addon_prefs = context.preferences.addons["comfyui_blender"].preferences
 
         # Check if render on run mode is enabled
@@ -68,203 +349,16 @@ class ComfyBlenderOperatorRenderDepthMap(bpy.types.Operator):
             return {'FINISHED'}
 
         # Otherwise, execute immediately
-        return self._render_scene(context)
-
-    def _render_scene(self, context):
-        """Internal method to render the scene."""
-
-        scene = context.scene
-        if not scene.camera:
-            error_message = "No camera found"
-            log.error(error_message)
-            bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-            return {'CANCELLED'}
-
-        # Build temp file paths
-        temp_folder = get_temp_folder()
-        extra_filepath = os.path.join(temp_folder, "tmp.png")  # Extraneous file generated by Blender renderer
-
-        # Initialize scene reset settings
-        reset_params = {}
-        reset_params["extra_filepath"] = extra_filepath
-        reset_params["original_filepath"] = scene.render.filepath
-        reset_params["original_file_format"] = scene.render.image_settings.file_format
-        reset_params["original_color_mode"] = scene.render.image_settings.color_mode
-        reset_params["original_color_depth"] = scene.render.image_settings.color_depth
-        reset_params["original_compression"] = scene.render.image_settings.compression
-        reset_params["original_display_device"] = scene.display_settings.display_device
-        reset_params["original_view_transform"] = scene.view_settings.view_transform
-
-        # Set up the scene for rendering
-        scene.render.filepath = extra_filepath
-        scene.render.image_settings.file_format = "PNG"
-        scene.render.image_settings.color_mode = "RGBA"
-        scene.render.image_settings.color_depth = "16"
-        scene.render.image_settings.compression = 0
-        scene.display_settings.display_device = "Display P3"
-        scene.view_settings.view_transform = "Raw"
-
-        # Enable Z pass
-        scene.view_layers["ViewLayer"].use_pass_z = True
-
-        # Create a new node tree for compositing
-        bpy.ops.node.new_compositing_node_group(name="CompositorDepthMap")
-        tree = bpy.data.node_groups["CompositorDepthMap"]
-        tree.nodes.clear()
-
-        # Create nodes
-        rlayers_node = tree.nodes.new(type="CompositorNodeRLayers")
-        map_range_node = tree.nodes.new(type="ShaderNodeMapRange")
-        output_file_node = tree.nodes.new(type="CompositorNodeOutputFile")
-        output_file_node.directory = temp_folder
-        output_file_node.file_name = ""  # Filename will be set by the file output item
-        output_file_node.format.media_type = "IMAGE"
-        output_file_node.format.color_mode = "RGB"
-        output_file_node.format.file_format = "PNG"
-        output_file_node.format.compression = 0
-        output_file_node.file_output_items.new("FLOAT", self.temp_filename)  # Create input socket blender_depth_map
-
-        # Link nodes
-        tree.links.new(rlayers_node.outputs[2], map_range_node.inputs[0])  # From output socket Depth to input socket Value
-        tree.links.new(map_range_node.outputs[0], output_file_node.inputs[0])  # From output socket Value to input socket blender_depth_map
-
-        # Get camera info to get closest and furthest vertices in the camera frustum
-        cam_location = scene.camera.matrix_world.translation
-        cam_matrix = scene.camera.matrix_world
-        cam_data = scene.camera.data
-        aspect_ratio = scene.render.resolution_x / scene.render.resolution_y
-        min_distance = float('inf')
-        max_distance = 0.0
-
-        for obj in scene.objects:
-            if obj.type == "MESH" and obj.visible_get():
-                # Switch to object mode to ensure mesh data is available
-                if obj.mode == "EDIT":
-                    bpy.context.view_layer.objects.active = obj
-                    bpy.ops.object.mode_set(mode="OBJECT")
-
-                for vertex in obj.data.vertices:
-                    # Convert vertex to world coordinates
-                    world_coord = obj.matrix_world @ vertex.co
-
-                    # Convert world coordinates to camera space coordinates
-                    cam_space = cam_matrix.inverted() @ world_coord.to_4d()
-
-                    # Check if vertex is in camera frustum
-                    # Z value should be negative (in front of camera)
-                    if cam_space.z >= 0:
-                        continue
-
-                    # Convert to normalized device coordinates
-                    # Get camera projection parameters
-                    if cam_data.type == "PERSP":
-                        # Calculate frustum bounds
-                        z_dist = -cam_space.z
-                        if z_dist < cam_data.clip_start or z_dist > cam_data.clip_end:
-                            continue
-
-                        # Calculate horizontal and vertical bounds
-                        tan_half_fov = tan(cam_data.angle / 2)
-                        h_bound = z_dist * tan_half_fov
-                        v_bound = h_bound / aspect_ratio
-
-                        # Check if vertex is within frustum bounds
-                        if (abs(cam_space.x) <= h_bound and abs(cam_space.y) <= v_bound):
-                            distance = (cam_location - world_coord.xyz).length
-                            min_distance = min(min_distance, distance)
-                            max_distance = max(max_distance, distance)
-
-                    # For orthographic camera
-                    elif cam_data.type == "ORTHO":
-                        ortho_scale = cam_data.ortho_scale
-                        h_bound = ortho_scale / 2
-                        v_bound = h_bound / aspect_ratio
-                        z_dist = -cam_space.z
-
-                        if (z_dist >= cam_data.clip_start and z_dist <= cam_data.clip_end and
-                            abs(cam_space.x) <= h_bound and abs(cam_space.y) <= v_bound):
-                            distance = (cam_location - world_coord.xyz).length
-                            min_distance = min(min_distance, distance)
-                            max_distance = max(max_distance, distance)
-
-        # Handle case where no vertices are in frustum
-        if min_distance == float("inf"):
-            min_distance = cam_data.clip_start
-            max_distance = cam_data.clip_end
-
-        # Update Map Range node
-        map_range_node.inputs[1].default_value = min_distance  # From Min
-        map_range_node.inputs[2].default_value = max_distance  # From Max
-        map_range_node.inputs[3].default_value = 1 # To Min
-        map_range_node.inputs[4].default_value = 0 # To Max
-
-        # Render the scene
-        scene.compositing_node_group = tree
-        bpy.ops.render.render(write_still=True)
-        bpy.data.node_groups.remove(tree)
-
-        # Get the rendered filename and path based on current frame
-        temp_filename = f"{self.temp_filename}.png"
-        temp_filepath = os.path.join(temp_folder, temp_filename)
-        reset_params["temp_filepath"] = temp_filepath  # Add the temp filepath to the reset param to delete it later
-
-        # Upload file on ComfyUI server
-        try:
-            response = upload_file(temp_filepath, type="image")
-        except Exception as e:
-            # Reset the scene to initial state
-            self.reset_scene(context, **reset_params)
-            addon_prefs = context.preferences.addons["comfyui_blender"].preferences
-            error_message = f"Failed to upload file to ComfyUI server: {addon_prefs.server_address}. {e}"
-            log.exception(error_message)
-            bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-            return {'CANCELLED'}
-
-        if response.status_code != 200:
-            # Reset the scene to initial state
-            self.reset_scene(context, **reset_params)
-            error_message = f"Failed to upload file: {response.status_code} - {response.text}"
-            log.error(error_message)
-            bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-            return {'CANCELLED'}
-
-        # Delete the previous input image from Blender's data
-        current_workflow = scene.current_workflow
-        previous_image = getattr(current_workflow, self.workflow_property)
-        if previous_image:
-            bpy.data.images.remove(previous_image)
-
-        # Build input file paths
-        inputs_folder = get_inputs_folder()
-        input_subfolder = response.json()["subfolder"]
-        input_filename = response.json()["name"]
-        input_filepath = os.path.join(inputs_folder, input_subfolder, input_filename)
-
-        # Create the input subfolder if it doesn't exist
-        os.makedirs(os.path.join(inputs_folder, input_subfolder), exist_ok=True)
-
         try:
-            # Copy the file to the inputs folder
-            shutil.copy(temp_filepath, input_filepath)
-            self.report({'INFO'}, f"Input file copied to: {input_filepath}")
-        except shutil.SameFileError as e:
-            self.report({'INFO'}, f"Input file is already in the inputs folder: {input_filepath}")
+            temp_filepath = render_depth_map(context, get_temp_folder())
+            input_filepath = upload_render(context, self.workflow_property, temp_filepath)
         except Exception as e:
-            # Reset the scene to initial state
-            self.reset_scene(context, **reset_params)
-            error_message = f"Failed to copy input file: {e}"
+            error_message = str(e)
             log.exception(error_message)
             bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
             return {'CANCELLED'}
 
-        # Load image in the data block
-        image = bpy.data.images.load(input_filepath, check_existing=True)
-
-        # Update the workflow property with the image from the data block
-        setattr(current_workflow, self.workflow_property, image)
-
-        # Reset the scene to initial state
-        self.reset_scene(context, **reset_params)
+        self.report({'INFO'}, f"Input file copied to: {input_filepath}")
         return {'FINISHED'}
 
 
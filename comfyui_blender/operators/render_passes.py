@@ -0,0 +1,117 @@
+"""Functions to capture several render passes from the camera with a single render."""
+import logging
+import os
+
+import bpy
+
+from ..capture import get_compositor_group
+from .render_depth_map import TEMP_FILENAME as DEPTH_MAP_FILENAME, get_depth_range
+from .render_view import TEMP_FILENAME as VIEW_FILENAME
+
+log = logging.getLogger("comfyui_blender")
+
+
+COMPOSITOR_NAME = ".ComfyUI Passes"  # Names starting with a dot are hidden from the compositors menu
+
+# Render types which can be captured from the passes of a single render and the names of their files
+# Lineart is rendered on its own, the strokes of the lineart rig would be drawn over the combined pass of the view
+PASS_FILENAMES = {
+    "render_depth_map": DEPTH_MAP_FILENAME,
+    "render_view": VIEW_FILENAME
+}
+PASS_RENDER_TYPES = tuple(PASS_FILENAMES)
+
+
+def build_passes_compositor(tree, render_types):
+    """Build the nodes of the compositor group writing a file per render type from the passes of a single render."""
+
+    rlayers_node = tree.nodes.new(type="CompositorNodeRLayers")
+
+    # Map depth between the closest and furthest vertices, the range is updated before each render
+    if "render_depth_map" in render_types:
+        map_range_node = tree.nodes.new(type="ShaderNodeMapRange")
+        map_range_node.name = "Map Range"
+        map_range_node.inputs[3].default_value = 1  # To Min
+        map_range_node.inputs[4].default_value = 0  # To Max
+        tree.links.new(rlayers_node.outputs["Depth"], map_range_node.inputs[0])  # From output socket Depth to input socket Value
+
+    # Create a file output node per pass, so each input is written to its own folder
+    for i, render_type in enumerate(render_types):
+        if render_type not in PASS_FILENAMES:
+            raise Exception(f"Render type {render_type} cannot be captured from a render pass.")
+        filename = PASS_FILENAMES[render_type]
+        output_file_node = tree.nodes.new(type="CompositorNodeOutputFile")
+        output_file_node.name = f"File Output {i}"
+        output_file_node.file_name = ""  # Filename will be set by the file output item
+        output_file_node.format.media_type = "IMAGE"
+        output_file_node.format.file_format = "PNG"
+        output_file_node.format.compression = 0
+
+        # Depth map is written without view transform, the render view follows the scene
+        if render_type != "render_view":
+            output_file_node.format.color_management = "OVERRIDE"
+            output_file_node.format.display_settings.display_device = "Display P3"
+            output_file_node.format.view_settings.view_transform = "Raw"
+
+        if render_type == "render_depth_map":
+            output_file_node.format.color_mode = "RGB"
+            output_file_node.file_output_items.new("FLOAT", filename)
+            tree.links.new(map_range_node.outputs[0], output_file_node.inputs[filename])
+        elif render_type == "render_view":
+            output_file_node.format.color_mode = "RGBA"
+            output_file_node.file_output_items.new("RGBA", filename)
+            tree.links.new(rlayers_node.outputs["Image"], output_file_node.inputs[filename])
+
+
+def render_passes(context, passes):
+    """Render the scene once and write the file of each pass to its folder.
+    Passes is a list of tuples (render type, folder), return the list of file paths in the same order."""
+
+    scene = context.scene
+    if not scene.camera:
+        raise Exception("No camera found")
+    render_types = {render_type for render_type, _ in passes}
+
+    temp_filepaths = []
+
+    # Save original render settings
+    view_layer = scene.view_layers["ViewLayer"]
+    original_compositing_node_group = scene.compositing_node_group
+    original_use_pass_z = view_layer.use_pass_z
+
+    # Set up the scene for rendering and enable the passes needed
+    if "render_depth_map" in render_types:
+        view_layer.use_pass_z = True
+
+    # Get the compositor group, it is only rebuilt when the list of passes changes
+    render_types_list = [render_type for render_type, _ in passes]
+    tree = get_compositor_group(
+        COMPOSITOR_NAME,
+        lambda tree: build_passes_compositor(tree, render_types_list),
+        ",".join(render_types_list)
+    )
+
+    try:
+        # Map depth between the closest and furthest vertices in the camera frustum
+        if "render_depth_map" in render_types:
+            min_distance, max_distance = get_depth_range(context)
+            map_range_node = tree.nodes["Map Range"]
+            map_range_node.inputs[1].default_value = min_distance  # From Min
+            map_range_node.inputs[2].default_value = max_distance  # From Max
+
+        # Each input is written to its own folder
+        for i, (render_type, folder) in enumerate(passes):
+            tree.nodes[f"File Output {i}"].directory = folder
+            temp_filepaths.append(os.path.join(folder, f"{PASS_FILENAMES[render_type]}.png"))
+
+        # Render the scene once for all passes
+        log.info(f"Rendering {len(passes)} pass(es) in a single render...")
+        scene.compositing_node_group = tree
+        bpy.ops.render.render(write_still=False)  # Only the file output nodes write files
+
+    finally:
+        # Reset the scene to initial state
+        scene.compositing_node_group = original_compositing_node_group
+        view_layer.use_pass_z = original_use_pass_z
+
+    return temp_filepaths
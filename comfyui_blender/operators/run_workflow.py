@@ -2,224 +2,381 @@
 import json
 import logging
 import os
-import random
-import requests
+import uuid
 
 import bpy
 
 from .. import workflow as w
-from ..utils import add_custom_headers, get_inputs_folder, get_server_url, get_workflows_folder
+from ..animation import get_animation_frames, start_animation
+from ..cameras import get_collection_cameras, start_cameras
+from ..capture import render_inputs
+from ..crop import get_workflow_crop
+from ..fingerprint import get_render_fingerprint
+from ..prompts import add_prompt_record
+from ..results import load_results
+from ..submission import enqueue_submission
+from ..sweeps import apply_sweep_variant, get_sweep_variants
+from ..tiles import start_tiles
+from ..utils import (
+    add_custom_headers,
+    get_inputs_folder,
+    get_outputs_folder,
+    get_server_url,
+    get_temp_folder,
+    get_workflows_folder
+)
+from ..workers import is_rendering_in_workers, is_worker_render, start_worker_renders
+from .render_depth_map import render_depth_map
+from .render_lineart import render_lineart
+from .render_passes import PASS_RENDER_TYPES, render_passes
+from .render_preview import render_preview
+from .render_view import render_view
 
 log = logging.getLogger("comfyui_blender")
 
+# Functions rendering the inputs of each type of scheduled render
+RENDER_FUNCTIONS = {
+    "render_depth_map": render_depth_map,
+    "render_lineart": render_lineart,
+    "render_preview": render_preview,
+    "render_view": render_view
+}
+
+
+def get_scheduled_renders(context, scheduled_renders):
+    """Return the scheduled renders as a list of tuples (workflow properties, render function) for render_inputs.
+    Inputs captured from the passes of a camera render are grouped so the scene is rendered only once."""
+
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+
+    # The ray cast depth backend does not render the scene
+    pass_render_types = set(PASS_RENDER_TYPES)
+    if addon_prefs.depth_backend == "raycast":
+        pass_render_types.discard("render_depth_map")
+
+    renders = []
+    passes = [(s.workflow_property, s.render_type) for s in scheduled_renders if s.render_type in pass_render_types]
+    if len(passes) > 1:
+        render_types = [render_type for _, render_type in passes]
+        renders.append((
+            [workflow_property for workflow_property, _ in passes],
+            lambda context, folders: render_passes(context, list(zip(render_types, folders)))
+        ))
+    else:
+        passes = []
+
+    for scheduled in scheduled_renders:
+        if (scheduled.workflow_property, scheduled.render_type) not in passes:
+            render_function = RENDER_FUNCTIONS[scheduled.render_type]
+            renders.append((
+                [scheduled.workflow_property],
+                lambda context, folders, render_function=render_function: [render_function(context, folders[0])]
+            ))
+    return renders
+
+
+def queue_workflow(context, force_run=False, batch_id="", frame=None, render=True, camera="", lock_seed=False):
+    """Render the scheduled inputs, build the prompts of the current workflow and add them to the submission queue.
+    Seeds are kept for the next call if lock_seed is True, so all the prompts of a run can share the same seeds.
+    When renders are dispatched to background processes, the workflow is queued once they are done and 0 is returned.
+    Return the number of prompts queued, an exception is raised with an error message if anything fails."""
+
+    # Get add-on preferences and selected workflow
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+
+    # Execute scheduled renders if any, the workflow is queued once the renders running in the background are done
+    if render and addon_prefs.render_on_run and addon_prefs.scheduled_renders:
+        def on_done():
+            nb_prompts = queue_workflow(bpy.context, force_run, batch_id, frame, render=False, camera=camera, lock_seed=lock_seed)
+            log.info(f"{nb_prompts} workflow(s) queued for ComfyUI server.")
+
+        if not render_scheduled_inputs(context, frame, on_done):
+            return 0
+
+    workflows_folder = get_workflows_folder()
+    workflow_filename = str(addon_prefs.workflow)
+    workflow_path = os.path.join(workflows_folder, workflow_filename)
+
+    # Verify workflow JSON file exists
+    if not os.path.exists(workflow_path):
+        raise Exception(f"Workflow file does not exist: {workflow_path}")
+
+    # Load the workflow JSON file
+    with open(workflow_path, "r",  encoding="utf-8") as file:
+        workflow = json.load(file)
+
+    # Get inputs and outputs from the workflow
+    inputs = w.parse_workflow_for_inputs(workflow)
+    outputs = w.parse_workflow_for_outputs(workflow)
+
+    # Update workflow content with user inputs
+    workflow = w.set_workflow_input_values(context, workflow, inputs, lock_seed)
+
+    # Expand sweeps into variants of the workflow in batch mode
+    # Variants are shallow copies of the workflow, only the swept nodes are duplicated
+    # Only the sweeps added to the current workflow apply, other workflows may use the same node ids
+    variants = [{}]
+    sweeps = [sweep for sweep in addon_prefs.sweeps if sweep.workflow == addon_prefs.workflow]
+    if addon_prefs.batch_mode and sweeps:
+        variants = get_sweep_variants(sweeps, inputs, context.scene.current_workflow)
+    prompts = [apply_sweep_variant(workflow, variant) for variant in variants]
+
+    # Add the prompts to the prompt collection before they are sent
+    # Prompt ids are generated by the client so messages from the ComfyUI server are never missed
+    # And all prompts of a batch can be tracked together
+    if not batch_id and len(prompts) > 1:
+        batch_id = str(uuid.uuid4())
+
+    # Outputs are composited back into the full image when the inputs are crops of a masked region
+    # Outputs of tiles are blended as they arrive, they are not reused from the result cache
+    crop = get_workflow_crop(context, inputs)
+    use_result_cache = addon_prefs.use_result_cache and "tiles" not in json.loads(crop or "{}")
+    submission_prompts = []
+    for prompt in prompts:
+        prompt_id = str(uuid.uuid4())
+        record = add_prompt_record(addon_prefs.prompts_collection, prompt_id, prompt, outputs, batch_id, frame or 0, crop, camera)
+        record.status = "submitting"
+        submission_prompts.append({
+            "prompt_id": prompt_id,
+            "data": {
+                "client_id": addon_prefs.client_id,
+                "extra_data": {"api_key_comfy_org": addon_prefs.api_key},
+                "prompt": prompt,
+                "prompt_id": prompt_id
+            }
+        })
+
+    # Load the result cache on the main thread, it is used by the submission thread
+    if use_result_cache:
+        load_results(get_temp_folder())
+
+    # Send workflows to ComfyUI server from the submission queue
+    # Everything the submission thread needs is captured here, it must not access Blender data
+    headers = {"Content-Type": "application/json"}
+    headers = add_custom_headers(headers)
+    enqueue_submission({
+        "url": get_server_url("/prompt"),
+        "headers": headers,
+        "prompts": submission_prompts,
+        "outputs": outputs,
+        "batch_id": batch_id,
+        "camera": camera,
+        "inputs_folder": get_inputs_folder(),
+        "outputs_folder": get_outputs_folder(),
+        "server_address": addon_prefs.server_address,
+        "use_result_cache": use_result_cache,
+        "force_run": force_run
+    })
+    return len(prompts)
+
+
+def render_scheduled_inputs(context, frame=None, on_done=None):
+    """Render the scheduled inputs, each render is uploaded in a worker thread while the next one is rendered.
+    Return True when all inputs are rendered, or False when some of them are rendered in background processes,
+    on_done() is then called once they are uploaded. An exception is raised with an error message if anything fails."""
+
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+    if is_rendering_in_workers():
+        raise Exception("Scheduled renders are already running in the background, wait for them to finish.")
+
+    # Reuse the inputs uploaded by the last renders if the scene did not change since then
+    current_workflow = context.scene.current_workflow
+    fingerprints = {}
+    scheduled_renders = []
+    worker_renders = []
+    for scheduled in addon_prefs.scheduled_renders:
+        fingerprint = get_render_fingerprint(context, scheduled.render_type)
+        image = getattr(current_workflow, scheduled.workflow_property, None)
+        if fingerprint and fingerprint == scheduled.fingerprint and image and image.get("comfyui_fingerprint") == fingerprint:
+            log.info(f"Scene unchanged, reusing the input of {scheduled.workflow_property}.")
+            continue
+        fingerprints[scheduled.workflow_property] = fingerprint
+
+        # Frames of an animation are rendered in the session, the scene is set to the frame being queued
+        # Views of EEVEE scenes are also rendered in the session, background processes do not use the GPU
+        if addon_prefs.render_in_background and frame is None and on_done and is_worker_render(context.scene, scheduled.render_type):
+            worker_renders.append((scheduled.workflow_property, scheduled.render_type))
+        else:
+            scheduled_renders.append(scheduled)
+
+    if scheduled_renders:
+        log.info(f"Executing {len(scheduled_renders)} scheduled render(s)...")
+        renders = get_scheduled_renders(context, scheduled_renders)
+        try:
+            render_inputs(context, renders, get_temp_folder(), frame)
+        except Exception as e:
+            log.exception(f"Failed to execute scheduled renders: {e}")
+            raise Exception(f"Failed to execute scheduled renders: {e}")
+        set_render_fingerprints(context, fingerprints)
+
+    # Render the other inputs in background processes
+    if worker_renders:
+        def on_workers_done(filepaths):
+            renders = [
+                ([workflow_property], lambda context, folders, filepath=filepath: [filepath])
+                for workflow_property, filepath in filepaths.items()
+            ]
+            render_inputs(bpy.context, renders, get_temp_folder())
+            set_render_fingerprints(bpy.context, fingerprints)
+            log.info("All scheduled renders completed successfully.")
+            on_done()
+
+        try:
+            start_worker_renders(context, worker_renders, get_temp_folder(), on_workers_done)
+        except Exception as e:
+            log.exception(f"Failed to start background renders: {e}")
+            raise Exception(f"Failed to start background renders: {e}")
+        return False
+
+    # Don't clear scheduled renders, they remain sticky until render on run is disabled
+    if scheduled_renders:
+        log.info("All scheduled renders completed successfully.")
+    return True
+
+
+def set_render_fingerprints(context, fingerprints):
+    """Store the fingerprints of the scene in the scheduled renders and in the uploaded images."""
+
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+    current_workflow = context.scene.current_workflow
+    for scheduled in addon_prefs.scheduled_renders:
+        if scheduled.workflow_property not in fingerprints:
+            continue
+        fingerprint = fingerprints[scheduled.workflow_property]
+        scheduled.fingerprint = fingerprint
+        image = getattr(current_workflow, scheduled.workflow_property, None)
+        if image:
+            image["comfyui_fingerprint"] = fingerprint
+
 
 class ComfyBlenderOperatorRunWorkflow(bpy.types.Operator):
     """Operator to send and execute a workflow on ComfyUI server."""
 
     bl_idname = "comfy.run_workflow"
     bl_label = "Run Workflow"
-    bl_description = "Send the workflow to the ComfyUI server."
+    bl_description = "Send the workflow to the ComfyUI server. Shift+Click to run it even if its outputs are in the result cache."
+
+    force_run: bpy.props.BoolProperty(name="Force Run", default=False, options={'SKIP_SAVE'})
 
     def execute(self, context):
         """Execute the operator."""
 
-        # Get add-on preferences and selected workflow
         addon_prefs = context.preferences.addons["comfyui_blender"].preferences
 
-        # Execute scheduled renders if any
-        if addon_prefs.render_on_run and addon_prefs.scheduled_renders:
-            log.info(f"Executing {len(addon_prefs.scheduled_renders)} scheduled render(s)...")
-
-            # Create a list of scheduled renders to process (copy to avoid modification during iteration)
-            scheduled_list = [(s.workflow_property, s.render_type) for s in addon_prefs.scheduled_renders]
-
-            # Set flag to prevent callback from clearing scheduled renders
-            addon_prefs.scheduled_renders_executing = True
-
-            # Temporarily disable render on run to force immediate execution
-            original_render_on_run = addon_prefs.render_on_run
-            addon_prefs.render_on_run = False
-
-            try:
-                # Execute each scheduled render
-                for workflow_property, render_type in scheduled_list:
-                    log.info(f"Executing {render_type} for {workflow_property}")
-
-                    # Call the appropriate render operator
-                    if render_type == "render_view":
-                        result = bpy.ops.comfy.render_view("EXEC_DEFAULT", workflow_property=workflow_property)
-                    elif render_type == "render_preview":
-                        result = bpy.ops.comfy.render_preview("EXEC_DEFAULT", workflow_property=workflow_property)
-                    elif render_type == "render_depth_map":
-                        result = bpy.ops.comfy.render_depth_map("EXEC_DEFAULT", workflow_property=workflow_property)
-                    elif render_type == "render_lineart":
-                        result = bpy.ops.comfy.render_lineart("EXEC_DEFAULT", workflow_property=workflow_property)
-
-                    # Check if render succeeded
-                    if result != {'FINISHED'}:
-                        error_message = f"Failed to execute scheduled render: {render_type} for {workflow_property}"
-                        log.error(error_message)
-                        bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                        return {'CANCELLED'}
-
-                # Don't clear scheduled renders, they remain sticky until render on run is disabled
-                log.info("All scheduled renders completed successfully.")
-
-            finally:
-                # Restore original render on run setting and clear execution flag
-                addon_prefs.render_on_run = original_render_on_run
-                addon_prefs.scheduled_renders_executing = False
-
-        workflows_folder = get_workflows_folder()
-        workflow_filename = str(addon_prefs.workflow)
-        workflow_path = os.path.join(workflows_folder, workflow_filename)
-
-        # Verify workflow JSON file exists
-        if not os.path.exists(workflow_path):
-            error_message = f"Workflow file does not exist: {workflow_path}"
+        # Animation, camera and tiled modes cannot be combined
+        run_modes = [name for name, enabled in (
+            ("Animation", addon_prefs.animation_mode),
+            ("Camera", addon_prefs.camera_mode),
+            ("Tiled", addon_prefs.tile_mode)
+        ) if enabled]
+        if len(run_modes) > 1:
+            error_message = f"{' and '.join(run_modes)} modes cannot be combined, disable all of them but one."
             log.error(error_message)
             bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
             return {'CANCELLED'}
 
-        # Load the workflow JSON file
-        with open(workflow_path, "r",  encoding="utf-8") as file:
-            workflow = json.load(file)
-
-        # Get inputs and outputs from the workflow
-        inputs = w.parse_workflow_for_inputs(workflow)
-        outputs = w.parse_workflow_for_outputs(workflow)
-
-        # Update workflow content with user inputs
-        current_workflow = context.scene.current_workflow
-        for key, node in inputs.items():
-            property_name = f"node_{key}"
-
-            # Custom handling for group of inputs
-            if node["class_type"] == "BlenderInputGroup":
-                # Do nothing, groups are just containers
-                continue
-
-            # Custom handling for sampler input
-            elif node["class_type"] == "BlenderInputSampler":
-                workflow[key]["inputs"]["sampler_name"] = getattr(current_workflow, property_name)
-
-            # Custom handling for 3D model input
-            elif node["class_type"] == "BlenderInputLoad3D":
-                property_value = getattr(current_workflow, property_name)
-                if property_value:
-                    workflow[key]["inputs"]["model_file"] = property_value
-                else:
-                    property_name = current_workflow.bl_rna.properties[property_name].name  # Node title
-                    error_message = f"Input {property_name} is empty."
-                    log.error(error_message)
-                    bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    return {'CANCELLED'}
-
-            # Custom handling for load checkpoint input
-            elif node["class_type"] == "BlenderInputLoadCheckpoint":
-                workflow[key]["inputs"]["ckpt_name"] = getattr(current_workflow, property_name)
-
-            # Custom handling for load diffusion model input
-            elif node["class_type"] == "BlenderInputLoadDiffusionModel":
-                workflow[key]["inputs"]["unet_name"] = getattr(current_workflow, property_name)
-
-            # Custom handling for load image input
-            elif node["class_type"] in ("BlenderInputLoadImage", "BlenderInputLoadMask"):
-                inputs_folder = get_inputs_folder()
-
-                # Get image relative path in the inputs folder
-                image = getattr(current_workflow, property_name)
-                if not image:
-                    property_name = current_workflow.bl_rna.properties[property_name].name  # Node title
-                    error_message = f"Input {property_name} is empty."
-                    log.error(error_message)
-                    bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    return {'CANCELLED'}
-
-                # Update the workflow with the relative path
-                # Get image absolute path in case it was converted to relative path like //..\AppData\Roaming\...
-                image_absolute_path = bpy.path.abspath(image.filepath)
-                image_path = os.path.relpath(image_absolute_path, inputs_folder)
-                if image_path:
-                    workflow[key]["inputs"]["image"] = image_path
-                else:
-                    property_name = current_workflow.bl_rna.properties[property_name].name  # Node title
-                    error_message = f"Input {property_name} is empty."
-                    log.error(error_message)
-                    bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    return {'CANCELLED'}
-
-            # Custom handling for load LoRA input
-            elif node["class_type"] == "BlenderInputLoadLora":
-                workflow[key]["inputs"]["lora_name"] = getattr(current_workflow, property_name)
-
-            # Custom handling for seed inputs
-            elif node["class_type"] == "BlenderInputSeed":
-                seed = getattr(current_workflow, property_name)
-                workflow[key]["inputs"]["value"] = seed
-
-                # If lock seed is not enabled, generate a new random seed
-                if not addon_prefs.lock_seed:
-                    min = current_workflow.bl_rna.properties[property_name].hard_min
-                    max = current_workflow.bl_rna.properties[property_name].hard_max
-                    seed = random.randint(min, max)
-                    setattr(current_workflow, property_name, seed)
-
-            # Custom handling for string multiline inputs
-            elif node["class_type"] == "BlenderInputStringMultiline":
-                text = getattr(current_workflow, property_name)
-                if not text:
-                    property_name = current_workflow.bl_rna.properties[property_name].name  # Node title
-                    error_message = f"Input {property_name} is empty."
-                    log.error(error_message)
-                    bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    return {'CANCELLED'}
-
-                # Update the workflow with the text content
-                workflow[key]["inputs"]["value"] = text.as_string()
-
-            else:
-                # Default handling for other input types
-                workflow[key]["inputs"]["value"] = getattr(current_workflow, property_name)
-
-        # Remove custom data from the workflow to avoid error from ComfyUI server
-        workflow.pop("comfyui_blender", None)
-
-        # Send workflow to ComfyUI server
-        data = {
-            "client_id": addon_prefs.client_id,
-            "extra_data": {"api_key_comfy_org": addon_prefs.api_key},
-            "prompt": workflow
-        }
-        url = get_server_url("/prompt")
-        headers = {"Content-Type": "application/json"}
-        headers = add_custom_headers(headers)
+        # Run the workflow for every frame in animation mode
+        # Frames are rendered and queued from a timer so Blender stays responsive
+        if addon_prefs.animation_mode:
+            try:
+                frames = get_animation_frames(context.scene, addon_prefs.animation_frames)
+            except Exception as e:
+                error_message = str(e)
+                log.error(error_message)
+                bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+                return {'CANCELLED'}
+
+            force_run = self.force_run
+            start_animation(
+                frames,
+                lambda frame, batch_id: queue_workflow(bpy.context, force_run, batch_id, frame),
+                addon_prefs.animation_max_prompts
+            )
+            self.report({'INFO'}, f"Animation of {len(frames)} frame(s) started.")
+            return {'FINISHED'}
+
+        # Run the workflow for every camera of the collection in camera mode
+        # The scheduled inputs are captured for each camera, then the prompts of the camera are queued
+        # With background renders, the next camera waits until the renders of the previous one are done
+        if addon_prefs.camera_mode:
+            try:
+                cameras = get_collection_cameras(context.scene.comfyui_project_settings.camera_collection)
+            except Exception as e:
+                error_message = str(e)
+                log.error(error_message)
+                bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+                return {'CANCELLED'}
+
+            force_run = self.force_run
+            start_cameras(
+                cameras,
+                lambda camera, batch_id: queue_workflow(bpy.context, force_run, batch_id, camera=camera),
+                addon_prefs.camera_max_prompts
+            )
+            self.report({'INFO'}, f"Workflow started for {len(cameras)} camera(s).")
+            return {'FINISHED'}
+
+        # Run the workflow on the tiles of the first image input in tiled mode
+        # Scheduled renders are executed once, then tiles are uploaded and queued from a timer
+        if addon_prefs.tile_mode:
+            image_inputs = w.get_current_workflow_inputs(self, context, ("BlenderInputLoadImage",))
+            if not image_inputs:
+                error_message = "Tiled mode requires an image input in the workflow. Make sure to add a node 'Blender Input Load Image' in the workflow."
+                log.error(error_message)
+                bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+                return {'CANCELLED'}
+
+            force_run = self.force_run
+            workflow_property = image_inputs[0][0]
+
+            def run_tiles():
+                addon_prefs = bpy.context.preferences.addons["comfyui_blender"].preferences
+                return start_tiles(
+                    bpy.context,
+                    workflow_property,
+                    lambda batch_id, lock_seed: queue_workflow(bpy.context, force_run, batch_id, render=False, lock_seed=lock_seed),
+                    addon_prefs.tile_size,
+                    addon_prefs.tile_overlap,
+                    addon_prefs.tile_concurrency
+                )
+
+            try:
+                if addon_prefs.render_on_run and addon_prefs.scheduled_renders and not render_scheduled_inputs(context, on_done=run_tiles):
+                    self.report({'INFO'}, "Inputs are rendered in the background, the tiles will be queued when they are done.")
+                    return {'FINISHED'}
+                nb_tiles = run_tiles()
+            except Exception as e:
+                error_message = str(e)
+                log.error(error_message)
+                bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+                return {'CANCELLED'}
+
+            self.report({'INFO'}, f"Workflow started on {nb_tiles} tile(s).")
+            return {'FINISHED'}
+
         try:
-            response = requests.post(url, json=data, headers=headers)
+            nb_prompts = queue_workflow(context, self.force_run)
         except Exception as e:
-            error_message = f"Failed to send run workflow request to ComfyUI server: {addon_prefs.server_address}. {e}"
-            log.exception(error_message)
-            bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-            return {'CANCELLED'}
-
-        if response.status_code != 200:
-            error_message = response.text
+            error_message = str(e)
             log.error(error_message)
             bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
             return {'CANCELLED'}
 
-        response_data = response.text
-        prompt_id = json.loads(response_data).get("prompt_id", "")
-        self.report({'INFO'}, "Workflow sent to ComfyUI server.")
-
-        # Add the prompt to the prompt collection
-        prompt = addon_prefs.prompts_collection.add()
-        prompt.name = prompt_id
-        prompt.workflow = str(workflow)
-        prompt.outputs = str(outputs)
-        prompt.status = "pending"
+        if nb_prompts == 0:
+            self.report({'INFO'}, "Inputs are rendered in the background, the workflow will be queued when they are done.")
+        elif nb_prompts > 1:
+            self.report({'INFO'}, f"Batch of {nb_prompts} workflows queued for ComfyUI server.")
+        else:
+            self.report({'INFO'}, "Workflow queued for ComfyUI server.")
         return {'FINISHED'}
 
+    def invoke(self, context, event):
+        """Run the workflow, ignoring the result cache when Shift is held."""
+
+        if event.shift:
+            self.force_run = True
+        return self.execute(context)
+
 
 def register():
     """Register the operator."""
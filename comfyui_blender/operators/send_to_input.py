@@ -5,12 +5,17 @@ import shutil
 
 import bpy
 
+from ..capture import upload_input
+from ..crop import get_crop_metadata, get_mask_bounds
 from ..workflow import get_current_workflow_inputs
 from ..utils import (
     get_filepath,
+    get_image_filepath,
+    get_image_pixels,
     get_inputs_folder,
     get_temp_folder,
-    upload_file
+    save_image_pixels,
+    save_mask_pixels
 )
 
 log = logging.getLogger("comfyui_blender")
@@ -26,6 +31,8 @@ class ComfyBlenderOperatorSendToInput(bpy.types.Operator):
     name: bpy.props.StringProperty(name="Name")
     type: bpy.props.StringProperty(name="Type")
     workflow_property: bpy.props.StringProperty(name="Workflow Property")
+    crop_to_mask: bpy.props.BoolProperty(name="Crop to Mask", default=False)
+    crop_padding: bpy.props.IntProperty(name="Crop Padding", default=32, min=0)
 
     def execute(self, context):
         """Execute the operator."""
@@ -51,77 +58,73 @@ class ComfyBlenderOperatorSendToInput(bpy.types.Operator):
             temp_folder = get_temp_folder()
             temp_filename = "blender_input.png"
             temp_filepath = os.path.join(temp_folder, temp_filename)
+            os.makedirs(temp_folder, exist_ok=True)
 
-            # Duplicate the image to ensure it has an alpha channel
-            new_image = bpy.data.images.new(name=temp_filename, width=image.size[0], height=image.size[1], alpha=True)
-            new_image.pixels = image.pixels[:]
-            new_image.file_format = "PNG"
-            new_image.filepath_raw = temp_filepath
-            new_image.save()
-            bpy.data.images.remove(new_image)
+            # Masks only use the alpha channel of the image
+            input_types = {input[0]: input[2] for input in get_current_workflow_inputs(self, context, ("BlenderInputLoadImage", "BlenderInputLoadMask"))}
+            is_mask = input_types.get(self.workflow_property) == "BlenderInputLoadMask"
 
-            # Upload file on ComfyUI server
             try:
-                response = upload_file(temp_filepath, type="image")
+                # Only send the region around the mask painted on the image
+                crop = None
+                pixels = get_image_pixels(image) if self.crop_to_mask or is_mask else None
+                if self.crop_to_mask:
+                    bounds = get_mask_bounds(pixels, self.crop_padding)
+                    if bounds:
+                        crop = get_crop_metadata(image, pixels, bounds, temp_folder)
+                        x, y, width, height = bounds
+                        pixels = pixels[y:y + height, x:x + width]
+                        log.info(f"Sending crop {width}x{height} at offset {x},{y} of image {image.name}.")
+
+                # Send masks as 8-bit grayscale images, 4 times smaller than RGBA images
+                if is_mask:
+                    save_mask_pixels(pixels, temp_filepath)
+                elif crop:
+                    save_image_pixels(pixels, temp_filepath)
+
+                # Send the file of the image as is when it is a PNG matching the pixels in memory
+                # Otherwise copy the pixels through a float32 buffer, reading image.pixels as a list creates millions of Python floats
+                else:
+                    source_filepath = get_image_filepath(image)
+                    if source_filepath:
+                        shutil.copyfile(source_filepath, temp_filepath)
+                    else:
+                        save_image_pixels(get_image_pixels(image), temp_filepath)
+
+                # Upload file on ComfyUI server and move it to the inputs folder
+                input_filepath = upload_input(temp_filepath, get_inputs_folder())
             except Exception as e:
-                addon_prefs = context.preferences.addons["comfyui_blender"].preferences
-                error_message = f"Failed to upload file to ComfyUI server: {addon_prefs.server_address}. {e}"
+                error_message = str(e)
                 log.exception(error_message)
                 bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
                 return {'CANCELLED'}
 
-            if response.status_code != 200:
-                error_message = f"Failed to upload file: {response.status_code} - {response.text}"
-                log.error(error_message)
-                bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                return {'CANCELLED'}
-
             # Delete the previous input image from Blender's data
             # Only if the image is not used in any of the workflow inputs
             current_workflow = context.scene.current_workflow
             previous_image = getattr(current_workflow, self.workflow_property)
             if previous_image:
-                possible_inputs = get_current_workflow_inputs(self, context, ("BlenderInputLoadImage", "BlenderInputLoadMask"))
                 is_used = False  # Flag to check if the image is used in any other input
-                for input in possible_inputs:
-                    if input[0] != self.workflow_property:
-                        if getattr(current_workflow, input[0]) == previous_image:
+                for input in input_types:
+                    if input != self.workflow_property:
+                        if getattr(current_workflow, input) == previous_image:
                             is_used = True
                             break
                 if not is_used and isinstance(previous_image, bpy.types.Image):
                         bpy.data.images.remove(previous_image)
 
-            # Build input file paths
-            inputs_folder = get_inputs_folder()
-            input_subfolder = response.json()["subfolder"]
-            input_filename = response.json()["name"]
-            input_filepath = os.path.join(inputs_folder, input_subfolder, input_filename)
-
-            # Create the input subfolder if it doesn't exist
-            os.makedirs(os.path.join(inputs_folder, input_subfolder), exist_ok=True)
-
-            try:
-                # Copy the file to the inputs folder
-                shutil.copy(temp_filepath, input_filepath)
-                self.report({'INFO'}, f"Input file copied to: {input_filepath}")
-            except shutil.SameFileError as e:
-                self.report({'INFO'}, f"Input file is already in the inputs folder: {input_filepath}")
-            except Exception as e:
-                error_message = f"Failed to copy input file: {e}"
-                log.exception(error_message)
-                bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                return {'CANCELLED'}
-
             # Load image in the data block
             image = bpy.data.images.load(input_filepath, check_existing=True)
 
+            # Store the offset of the crop so the outputs are composited back into the full image
+            if crop:
+                image["comfyui_crop"] = crop
+            elif "comfyui_crop" in image:
+                del image["comfyui_crop"]
+
             # Update the workflow property with the image from the data block
             setattr(current_workflow, self.workflow_property, image)
 
-            # Remove temporary files
-            if os.path.exists(temp_filepath):
-                os.remove(temp_filepath)
-
         # Manage text input
         elif self.type == "text":
             # Get text object
@@ -185,6 +188,18 @@ def register():
         description="Target input to send to",
         items=lambda self, context: get_current_workflow_inputs(self, context, ("BlenderInputLoadImage", "BlenderInputLoadMask"))
     )
+    bpy.types.Scene.comfyui_crop_to_mask = bpy.props.BoolProperty(
+        name="Crop to Mask",
+        description="Only send the region around the painted mask, the outputs are composited back into the full image.",
+        default=False
+    )
+    bpy.types.Scene.comfyui_crop_padding = bpy.props.IntProperty(
+        name="Crop Padding",
+        description="Number of pixels of context kept around the painted mask.",
+        default=32,
+        min=0,
+        subtype="PIXEL"
+    )
 
     bpy.utils.register_class(ComfyBlenderOperatorSendToInput)
 
@@ -197,3 +212,7 @@ def unregister():
     # Check if attributes exist before deleting them
     if hasattr(bpy.types.Scene, "comfyui_target_input"):
         del bpy.types.Scene.comfyui_target_input
+    if hasattr(bpy.types.Scene, "comfyui_crop_to_mask"):
+        del bpy.types.Scene.comfyui_crop_to_mask
+    if hasattr(bpy.types.Scene, "comfyui_crop_padding"):
+        del bpy.types.Scene.comfyui_crop_padding
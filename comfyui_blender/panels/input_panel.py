@@ -6,6 +6,7 @@ import bpy
 
 from .. import workflow as w
 from ..settings import toggle_render_on_run
+from ..sweeps import SWEEP_INPUT_TYPES
 from ..utils import get_inputs_folder, get_workflows_folder
 
 
@@ -72,7 +73,9 @@ class ComfyBlenderPanelInput(bpy.types.Panel):
                                 # Skip the dummy key
                                 if int(input_key) > 0:
                                     group_property_name = f"node_{input_key}"
-                                    self.display_input(context, current_workflow, group_col, group_property_name, inputs[str(input_key)], is_root=False)
+                                    class_type = self.display_input(context, current_workflow, group_col, group_property_name, inputs[str(input_key)], is_root=False)
+                                    if addon_prefs.batch_mode and class_type in SWEEP_INPUT_TYPES:
+                                        self.display_sweep(context, group_col, group_property_name)
 
                         else:
                             # Skip input if it belongs to a group
@@ -80,12 +83,48 @@ class ComfyBlenderPanelInput(bpy.types.Panel):
                                 class_type = self.display_input(context, current_workflow, layout, property_name, node)
                                 if class_type == "BlenderInputLoadImage":
                                     has_input_image = True
+                                if addon_prefs.batch_mode and class_type in SWEEP_INPUT_TYPES:
+                                    self.display_sweep(context, layout, property_name)
+
+                    # Add animation options, the frame range of the scene is used when the frame list is empty
+                    if addon_prefs.animation_mode:
+                        row = layout.row(align=True)
+                        row.prop(addon_prefs, "animation_frames", text="", placeholder=f"{context.scene.frame_start}-{context.scene.frame_end}")
+                        row.prop(addon_prefs, "animation_max_prompts", text="In Flight")
+
+                    # Add camera mode options
+                    if addon_prefs.camera_mode:
+                        row = layout.row(align=True)
+                        row.prop(context.scene.comfyui_project_settings, "camera_collection", text="")
+                        row.prop(addon_prefs, "camera_max_prompts", text="In Flight")
+
+                    # Add tiled mode options
+                    if addon_prefs.tile_mode:
+                        row = layout.row(align=True)
+                        row.prop(addon_prefs, "tile_size", text="Size")
+                        row.prop(addon_prefs, "tile_overlap", text="Overlap")
+                        row.prop(addon_prefs, "tile_concurrency", text="In Flight")
 
                     # Add run workflow button
                     col = layout.column()
                     row = layout.row(align=True)
                     row.scale_y = 1.5
-                    row.operator("comfy.run_workflow", text="Run Workflow", icon="PLAY")
+                    if addon_prefs.animation_mode:
+                        row.operator("comfy.run_workflow", text="Run Animation", icon="PLAY")
+                    elif addon_prefs.camera_mode:
+                        row.operator("comfy.run_workflow", text="Run Cameras", icon="PLAY")
+                    elif addon_prefs.tile_mode:
+                        row.operator("comfy.run_workflow", text="Run Tiles", icon="PLAY")
+                    elif addon_prefs.batch_mode:
+                        row.operator("comfy.run_workflow", text="Run Batch", icon="PLAY")
+                    else:
+                        row.operator("comfy.run_workflow", text="Run Workflow", icon="PLAY")
+
+                    # Add batch mode, animation mode, camera mode and tiled mode toggles as options to run the workflow button
+                    row.prop(addon_prefs, "batch_mode", text="", icon="MOD_ARRAY")
+                    row.prop(addon_prefs, "animation_mode", text="", icon="RENDER_ANIMATION")
+                    row.prop(addon_prefs, "camera_mode", text="", icon="OUTLINER_OB_CAMERA")
+                    row.prop(addon_prefs, "tile_mode", text="", icon="MESH_GRID")
 
                     # Add render on run toggle as an option to run the workflow button
                     sub_row = row.row(align=True)
@@ -370,6 +409,23 @@ class ComfyBlenderPanelInput(bpy.types.Panel):
             return node["class_type"]
 
 
+    def display_sweep(self, context, layout, property_name):
+        """Display the sweep of an input in batch mode."""
+
+        addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+        for sweep in addon_prefs.sweeps:
+            if sweep.workflow == addon_prefs.workflow and sweep.workflow_property == property_name:
+                row = layout.row(align=True)
+                row.prop(sweep, "values", text="", icon="MOD_ARRAY", placeholder="a,b,c or start:stop:step")
+                remove_sweep = row.operator("comfy.remove_sweep", text="", icon="TRASH")
+                remove_sweep.workflow_property = property_name
+                return
+
+        # Button to add a sweep
+        add_sweep = layout.operator("comfy.add_sweep", text="Add Sweep", icon="ADD", emboss=False)
+        add_sweep.workflow_property = property_name
+
+
 class ComfyBlenderPanelInput3DViewer(ComfyBlenderPanelInput, bpy.types.Panel):
     """Class to display the panel in the 3D viewer."""
 
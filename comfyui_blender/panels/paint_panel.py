@@ -57,6 +57,15 @@ class ComfyBlenderPanelPaintMask(bpy.types.Panel):
             send_input.name = context.edit_image.name if context.edit_image else ""
             send_input.type = "image"
             send_input.workflow_property = context.scene.comfyui_target_input
+            send_input.crop_to_mask = context.scene.comfyui_crop_to_mask
+            send_input.crop_padding = context.scene.comfyui_crop_padding
+
+            # Option to only send the region around the mask
+            row = self.layout.row(align=True)
+            row.prop(context.scene, "comfyui_crop_to_mask")
+            sub = row.row(align=True)
+            sub.enabled = context.scene.comfyui_crop_to_mask
+            sub.prop(context.scene, "comfyui_crop_padding", text="Padding")
 
             # Button to reload the image from disk
             self.layout.operator("image.reload", text="Reset Image", icon="FILE_REFRESH")
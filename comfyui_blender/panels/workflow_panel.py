@@ -3,6 +3,10 @@ import os
 
 import bpy
 
+from ..animation import get_animation_progress
+from ..cameras import get_cameras_progress
+from ..submission import get_pending_submissions
+from ..tiles import get_tiles_progress
 from ..utils import get_workflows_folder
 
 
@@ -77,11 +81,30 @@ class ComfyBlenderPanelWorkflow(bpy.types.Panel):
         # Queue
         row = self.layout.row(align=True)
         split = row.split(factor=0.21)
-        split.label(text=f"Queue: {addon_prefs.queue}")
+        # Prompts waiting to be sent are displayed next to the queue of the ComfyUI server
+        pending_submissions = get_pending_submissions()
+        if pending_submissions:
+            split.label(text=f"Queue: {addon_prefs.queue} +{pending_submissions}")
+        else:
+            split.label(text=f"Queue: {addon_prefs.queue}")
 
         # Progress bar and buttons to stop workflow or clear queue
+        # The progress of the animation is displayed while its frames are queued, and the progress of the tiles until they are blended
         sub_row = split.row(align=True)
-        sub_row.progress(factor=addon_prefs.progress_value, text=f"{int(addon_prefs.progress_value * 100)}%", type="BAR")
+        animation_progress = get_animation_progress()
+        cameras_progress = get_cameras_progress()
+        tiles_progress = get_tiles_progress()
+        if animation_progress:
+            nb_frames, total = animation_progress
+            sub_row.progress(factor=nb_frames / total, text=f"Frame {nb_frames}/{total}", type="BAR")
+        elif cameras_progress:
+            nb_cameras, total = cameras_progress
+            sub_row.progress(factor=nb_cameras / total, text=f"Camera {nb_cameras}/{total}", type="BAR")
+        elif tiles_progress:
+            nb_tiles, total = tiles_progress
+            sub_row.progress(factor=nb_tiles / total, text=f"Tile {nb_tiles}/{total}", type="BAR")
+        else:
+            sub_row.progress(factor=addon_prefs.progress_value, text=f"{int(addon_prefs.progress_value * 100)}%", type="BAR")
         sub_row.operator("comfy.stop_workflow", text="", icon="CANCEL")
         sub_row.operator("comfy.clear_queue", text="", icon="SEQ_SEQUENCER")
 
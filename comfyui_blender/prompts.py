@@ -0,0 +1,125 @@
+"""Functions to manage the workflows of the prompts sent to the ComfyUI server."""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Global variables to manage the store of prompts
+# The full workflows are only kept in memory, the prompts collection in the preferences only keeps compact records
+# Each entry of the store is a dictionary with the keys: workflow, hash, outputs, batch_id, cache_key, results
+PROMPTS = OrderedDict()
+PROMPTS_LOCK = threading.Lock()
+PROMPTS_MAX_SIZE = 1024  # Maximum number of prompts kept in memory, the oldest ones are discarded first
+PROMPTS_MAX_AGE = 86400  # Records older than this number of seconds are pruned from the prompts collection
+
+
+def add_prompt(prompt_id, workflow, workflow_hash, outputs, batch_id="", cache_key=None):
+    """Store the workflow of a prompt in memory and discard the oldest prompts if the store is full."""
+
+    with PROMPTS_LOCK:
+        PROMPTS[prompt_id] = {
+            "workflow": workflow,
+            "hash": workflow_hash,
+            "outputs": outputs,
+            "batch_id": batch_id,
+            "cache_key": cache_key,
+            "results": []
+        }
+        PROMPTS.move_to_end(prompt_id)
+        while len(PROMPTS) > PROMPTS_MAX_SIZE:
+            discarded_id, _ = PROMPTS.popitem(last=False)
+            log.debug(f"Discarded prompt from memory: {discarded_id}")
+
+
+def add_prompt_output(prompt_id, filepath, type):
+    """Record an output downloaded for a prompt, this is called from the listener thread."""
+
+    with PROMPTS_LOCK:
+        if prompt_id in PROMPTS:
+            PROMPTS[prompt_id]["results"].append({"filepath": filepath, "type": type})
+
+
+def add_prompt_record(prompts_collection, prompt_id, workflow, outputs, batch_id="", frame=0, crop="", camera=""):
+    """Add a compact record of a prompt to the prompts collection."""
+
+    # Prune records which never received a final message, for instance after a lost connection
+    prune_prompt_records(prompts_collection)
+
+    # Only keep the class type and title of output nodes, this is all the listener needs to process outputs
+    output_classes = {
+        key: {"class_type": node["class_type"], "title": node.get("_meta", {}).get("title", "")}
+        for key, node in outputs.items()
+    }
+
+    prompt = prompts_collection.add()
+    prompt.name = prompt_id
+    prompt.batch_id = batch_id
+    prompt.frame = frame
+    prompt.crop = crop
+    prompt.camera = camera
+    prompt.output_classes = json.dumps(output_classes)
+    prompt.total_nb_nodes = len(workflow)
+    prompt.timestamp = time.time()
+    prompt.status = "pending"
+    return prompt
+
+
+def clear_prompts():
+    """Remove all the prompts from memory."""
+
+    with PROMPTS_LOCK:
+        PROMPTS.clear()
+
+
+def get_prompt(prompt_id):
+    """Return the stored data of a prompt or None if it is not in memory."""
+
+    with PROMPTS_LOCK:
+        return PROMPTS.get(prompt_id)
+
+
+def get_prompt_output_classes(prompts_collection, prompt_id):
+    """Return the class types and titles of the output nodes of a prompt."""
+
+    try:
+        return json.loads(prompts_collection[prompt_id].output_classes or "{}")
+    except (KeyError, ValueError):
+        return {}
+
+
+def prune_prompt_records(prompts_collection):
+    """Remove records older than the maximum age from the prompts collection."""
+
+    now = time.time()
+    prompt_indices = [i for i, prompt in enumerate(prompts_collection) if now - prompt.timestamp > PROMPTS_MAX_AGE]
+    for i in reversed(prompt_indices):
+        remove_prompt(prompts_collection[i].name)
+        prompts_collection.remove(i)
+
+
+def rename_prompt(prompt_id, new_prompt_id):
+    """Move a prompt stored in memory to a new prompt id."""
+
+    with PROMPTS_LOCK:
+        if prompt_id in PROMPTS:
+            PROMPTS[new_prompt_id] = PROMPTS.pop(prompt_id)
+
+
+def remove_prompt(prompt_id):
+    """Remove a finished prompt from memory."""
+
+    with PROMPTS_LOCK:
+        PROMPTS.pop(prompt_id, None)
+
+
+def remove_prompt_record(prompts_collection, prompt_id):
+    """Remove a finished prompt from the prompts collection and from memory."""
+
+    remove_prompt(prompt_id)
+    index = prompts_collection.find(prompt_id)
+    if index != -1:
+        prompts_collection.remove(index)
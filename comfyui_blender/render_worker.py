@@ -0,0 +1,57 @@
+"""Script run by background Blender processes to render a scheduled input of the add-on.
+
+Usage: blender --background snapshot.blend --python render_worker.py -- '<json arguments>'
+The path of the rendered file or the error message is written to a JSON file of the render folder.
+"""
+import importlib
+import json
+import os
+import sys
+import traceback
+
+import addon_utils
+import bpy
+
+
+def main():
+    """Render the input described by the arguments passed after --."""
+
+    arguments = json.loads(sys.argv[sys.argv.index("--") + 1])
+    os.makedirs(arguments["folder"], exist_ok=True)
+    result_path = os.path.join(arguments["folder"], "worker_result.json")
+
+    try:
+        # Enable the add-on if it is not enabled in the user preferences
+        package = arguments["package"]
+        if package not in bpy.context.preferences.addons:
+            addon_utils.enable(package, default_set=True)
+        addon_prefs = bpy.context.preferences.addons[package].preferences
+        addon_prefs.depth_backend = arguments["depth_backend"]
+        addon_prefs.depth_max_vertices = arguments["depth_max_vertices"]
+
+        # Render on CPU so processes run concurrently on machines without GPU
+        # EEVEE requires a GPU, depth maps and lineart of EEVEE scenes are rendered with Cycles
+        # They do not depend on the shading of the engine, views of EEVEE scenes are rendered in the session
+        scene = bpy.context.scene
+        if scene.render.engine.startswith("BLENDER_EEVEE"):
+            if arguments["render_type"] == "render_view":
+                raise Exception("Views of EEVEE scenes cannot be rendered in background processes.")
+            scene.render.engine = "CYCLES"
+        if scene.render.engine == "CYCLES":
+            scene.cycles.device = "CPU"
+        scene.render.threads_mode = "FIXED"
+        scene.render.threads = arguments["threads"]
+
+        run_workflow = importlib.import_module(f"{package}.operators.run_workflow")
+        render_function = run_workflow.RENDER_FUNCTIONS[arguments["render_type"]]
+        result = {"filepath": render_function(bpy.context, arguments["folder"])}
+    except Exception as e:
+        traceback.print_exc()
+        result = {"error": str(e)}
+
+    with open(result_path, "w", encoding="utf-8") as file:
+        json.dump(result, file)
+
+
+if __name__ == "__main__":
+    main()
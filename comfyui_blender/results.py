@@ -0,0 +1,149 @@
+"""Functions to cache the outputs of prompts and reuse them when the same prompt is run again."""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import bpy
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Global variables to manage the cache of results
+# The key is a hash of the prompt and the value is the list of outputs {filepath, type} relative to the outputs folder
+RESULTS = None
+RESULTS_PATH = None
+RESULTS_LOCK = threading.Lock()
+RESULTS_MAX_SIZE = 1000  # Maximum number of prompts in the cache, the oldest ones are discarded first
+RESULTS_FILENAME = "result_cache.json"
+
+# Hashes of input files, the key is a tuple (file path, modification time, size)
+FILE_HASHES = {}
+
+# Input nodes referencing files in the inputs folder and the name of the input holding the file path
+INPUT_FILE_TYPES = {
+    "BlenderInputLoad3D": "model_file",
+    "BlenderInputLoadImage": "image",
+    "BlenderInputLoadMask": "image"
+}
+
+
+def get_file_hash(filepath):
+    """Return the hash of the content of a file, hashes are reused while the file is not modified."""
+
+    stat = os.stat(filepath)
+    file_key = (filepath, stat.st_mtime_ns, stat.st_size)
+    if file_key not in FILE_HASHES:
+        sha256 = hashlib.sha256()
+        with open(filepath, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        FILE_HASHES[file_key] = sha256.hexdigest()
+    return FILE_HASHES[file_key]
+
+
+def get_result(cache_key, outputs_folder):
+    """Return the cached outputs of a prompt or None if they are missing or deleted from the outputs folder."""
+
+    with RESULTS_LOCK:
+        result = RESULTS.get(cache_key) if RESULTS else None
+    if not result:
+        return None
+    for output in result:
+        if not os.path.isfile(os.path.join(outputs_folder, output["filepath"])):
+            return None
+    return result
+
+
+def get_result_key(prompt, inputs_folder, server_address):
+    """Return the canonical hash of a prompt including the content of the input files it references."""
+
+    sha256 = hashlib.sha256()
+    sha256.update(server_address.encode("utf-8"))
+    sha256.update(json.dumps(prompt, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+
+    # Files may be overwritten with the same name, so their content is part of the key
+    for key in sorted(prompt):
+        node = prompt[key]
+        input_name = INPUT_FILE_TYPES.get(node.get("class_type"))
+        if input_name and node["inputs"].get(input_name):
+            filepath = os.path.join(inputs_folder, node["inputs"][input_name])
+            if os.path.isfile(filepath):
+                sha256.update(get_file_hash(filepath).encode("utf-8"))
+    return sha256.hexdigest()
+
+
+def link_result(context, result, outputs_folder, batch_id="", camera=""):
+    """Add cached outputs to the outputs collection without sending the prompt to the ComfyUI server."""
+
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+    outputs_collection = context.scene.comfyui_project_settings.outputs_collection
+    existing_filepaths = {output.filepath for output in outputs_collection}
+    for output in result:
+        filepath = os.path.join(outputs_folder, output["filepath"])
+
+        # Load image or text into Blender file to get the name
+        if output["type"] == "image":
+            data_object = bpy.data.images.load(filepath, check_existing=True)
+            data_object.preview_ensure()
+        elif output["type"] == "text":
+            data_object = bpy.data.texts.get(os.path.basename(filepath)) or bpy.data.texts.load(filepath)
+        else:
+            data_object = None
+
+        # Add output to the collection if it is not already there
+        if output["filepath"] not in existing_filepaths:
+            item = outputs_collection.add()
+            item.name = data_object.name if data_object else os.path.basename(filepath)
+            item.filepath = output["filepath"]
+            item.type = output["type"]
+            item.batch_id = batch_id
+            item.camera = camera
+
+        # Open the last image automatically if the option is enabled
+        if output["type"] == "image" and addon_prefs.open_last_image_automatically:
+            bpy.ops.comfy.open_image_editor("EXEC_DEFAULT", name=data_object.name)
+
+    # Force redraw of the UI
+    for screen in bpy.data.screens:
+        for area in screen.areas:
+            if area.type in ("VIEW_3D", "IMAGE_EDITOR"):
+                area.tag_redraw()
+
+
+def load_results(temp_folder):
+    """Load the cache of results from the temporary folder."""
+
+    global RESULTS, RESULTS_PATH
+    results_path = os.path.join(temp_folder, RESULTS_FILENAME)
+    with RESULTS_LOCK:
+        if RESULTS is not None and RESULTS_PATH == results_path:
+            return
+        RESULTS_PATH = results_path
+        RESULTS = {}
+        if os.path.isfile(results_path):
+            try:
+                with open(results_path, "r", encoding="utf-8") as file:
+                    RESULTS = json.load(file)
+            except Exception as e:
+                log.error(f"Failed to load result cache {results_path}: {e}")
+
+
+def save_result(cache_key, result):
+    """Store the outputs of a prompt in the cache of results, this can be called from the listener thread."""
+
+    with RESULTS_LOCK:
+        if RESULTS is None or not RESULTS_PATH:
+            return
+        RESULTS.pop(cache_key, None)
+        RESULTS[cache_key] = result
+        while len(RESULTS) > RESULTS_MAX_SIZE:
+            RESULTS.pop(next(iter(RESULTS)))
+
+        try:
+            os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+            with open(RESULTS_PATH, "w", encoding="utf-8") as file:
+                json.dump(RESULTS, file)
+        except Exception as e:
+            log.error(f"Failed to save result cache {RESULTS_PATH}: {e}")
@@ -0,0 +1,112 @@
+"""Functions to queue the items of a run one after the other while limiting the number of prompts in flight.
+Animations, cameras and tiles are queued with a scheduler, each item queues the prompts of a frame, a camera or a tile."""
+import logging
+import uuid
+from collections import deque
+
+import bpy
+
+from .workers import is_rendering_in_workers
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Global variable to manage the schedulers running
+# Dictionary of scheduler names to dictionaries with the keys: items, batch_id, run_item, max_prompts, total,
+# describe_item, on_stop
+SCHEDULERS = {}
+SCHEDULERS_INTERVAL = 0.2  # Delay in seconds between two checks of the prompts in flight
+
+
+def get_scheduler_progress(name):
+    """Return the number of items queued and the total number of items of a scheduler, or None if it is not running."""
+
+    scheduler = SCHEDULERS.get(name)
+    if scheduler is None:
+        return None
+    return scheduler["total"] - len(scheduler["items"]), scheduler["total"]
+
+
+def process_scheduler(name, scheduler, addon_prefs):
+    """Queue the next item of a scheduler if the number of its prompts in flight is below the limit."""
+
+    # Stop if the connection is lost, prompts in flight would never complete
+    if not addon_prefs.connection_status:
+        stop_scheduler(name)
+        bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=f"{name} stopped, the connection to the ComfyUI server is lost.")
+        return
+
+    # Prompts of the items stay in the prompts collection until they are finished
+    # Wait for the background renders of the previous item, its prompts are queued once they are done
+    nb_prompts = sum(1 for prompt in addon_prefs.prompts_collection if prompt.batch_id == scheduler["batch_id"])
+    if scheduler["items"] and nb_prompts < scheduler["max_prompts"] and not is_rendering_in_workers():
+        item = scheduler["items"].popleft()
+        log.info(f"Queueing {scheduler['describe_item'](item)}...")
+        try:
+            scheduler["run_item"](item, scheduler["batch_id"])
+        except Exception as e:
+            error_message = f"{name} stopped at {scheduler['describe_item'](item)}. {e}"
+            log.error(error_message)
+            stop_scheduler(name)
+            bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+            return
+
+    # All items are queued, the outputs are collected by the listener
+    if not scheduler["items"] and SCHEDULERS.get(name) is scheduler:
+        log.info(f"{name}: all {scheduler['total']} items are queued.")
+        stop_scheduler(name, cancelled=False)
+
+
+def process_schedulers():
+    """Queue the next items of the schedulers running, this runs on the main thread."""
+
+    if not SCHEDULERS:
+        return None
+
+    addon_prefs = bpy.context.preferences.addons["comfyui_blender"].preferences
+    for name, scheduler in list(SCHEDULERS.items()):
+        if SCHEDULERS.get(name) is scheduler:
+            process_scheduler(name, scheduler, addon_prefs)
+
+    # Force redraw of the UI
+    for screen in bpy.data.screens:
+        for area in screen.areas:
+            if area.type in ("VIEW_3D", "IMAGE_EDITOR"):
+                area.tag_redraw()
+    return SCHEDULERS_INTERVAL if SCHEDULERS else None
+
+
+def start_scheduler(name, items, run_item, max_prompts, describe_item=str, on_stop=None):
+    """Start queueing items, run_item(item, batch_id) queues the prompts of an item and describe_item(item) names it.
+    on_stop(cancelled) is called once all items are queued or when the scheduler is stopped. Return the batch id of the run."""
+
+    stop_scheduler(name)
+    items = deque(items)
+    batch_id = str(uuid.uuid4())
+    SCHEDULERS[name] = {
+        "items": items,
+        "batch_id": batch_id,
+        "run_item": run_item,
+        "max_prompts": max(1, max_prompts),
+        "total": len(items),
+        "describe_item": describe_item,
+        "on_stop": on_stop
+    }
+    if not bpy.app.timers.is_registered(process_schedulers):
+        bpy.app.timers.register(process_schedulers, first_interval=0.0)
+    return batch_id
+
+
+def stop_scheduler(name, cancelled=True):
+    """Stop queueing the items of a scheduler, the prompts already queued are not cancelled."""
+
+    scheduler = SCHEDULERS.pop(name, None)  # The timer stops once no scheduler is running
+    if scheduler and scheduler["on_stop"]:
+        scheduler["on_stop"](cancelled)
+
+
+def stop_schedulers():
+    """Stop all the schedulers running, for instance before a blend file is loaded."""
+
+    for name in list(SCHEDULERS):
+        stop_scheduler(name)
@@ -9,7 +9,9 @@ from bpy.props import (
     BoolProperty,
     CollectionProperty,
     EnumProperty,
+    FloatProperty,
     IntProperty,
+    PointerProperty,
     StringProperty
 )
 
@@ -23,6 +25,10 @@ if not log.handlers:
     log.addHandler(logging.StreamHandler())
 
 
+# Run modes of the workflow, only one of them can be enabled at a time
+RUN_MODES = ("animation_mode", "camera_mode", "tile_mode")
+
+
 # Callback methods
 def toggle_debug_mode(self, context):
     if self.debug_mode:
@@ -32,6 +38,17 @@ def toggle_debug_mode(self, context):
         log.setLevel(logging.INFO)
 
 
+def update_run_mode(mode):
+    """Return a callback disabling the other run modes when a run mode is enabled, they cannot be combined."""
+
+    def update(self, context):
+        if getattr(self, mode):
+            for other_mode in RUN_MODES:
+                if other_mode != mode and getattr(self, other_mode):
+                    setattr(self, other_mode, False)
+    return update
+
+
 def update_progress(self, context):
     """Callback to force UI redraw when progress changes."""
 
@@ -97,10 +114,6 @@ def update_server_address(self, context):
 def toggle_render_on_run(self, context):
     """Clear scheduled renders when render on run is disabled."""
 
-    # Do not clear scheduled renders if they are executing
-    if hasattr(self, "scheduled_renders_executing") and self.scheduled_renders_executing:
-        return
-
     # Clear all scheduled renders when toggling off
     if not self.render_on_run:
         self.scheduled_renders.clear()
@@ -155,6 +168,38 @@ class RemoveHttpHeader(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class AddSweep(bpy.types.Operator):
+    bl_idname = "comfy.add_sweep"
+    bl_label = "Add Sweep"
+    bl_description = "Sweep the values of this input in batch mode"
+
+    workflow_property: StringProperty(name="Workflow Property")
+
+    def execute(self, context):
+        addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+        item = addon_prefs.sweeps.add()
+        item.workflow = addon_prefs.workflow
+        item.workflow_property = self.workflow_property
+        item.values = ""
+        return {'FINISHED'}
+
+
+class RemoveSweep(bpy.types.Operator):
+    bl_idname = "comfy.remove_sweep"
+    bl_label = "Remove Sweep"
+    bl_description = "Stop sweeping the values of this input"
+
+    workflow_property: StringProperty(name="Workflow Property")
+
+    def execute(self, context):
+        addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+        for index, sweep in enumerate(addon_prefs.sweeps):
+            if sweep.workflow == addon_prefs.workflow and sweep.workflow_property == self.workflow_property:
+                addon_prefs.sweeps.remove(index)
+                break
+        return {'FINISHED'}
+
+
 # Property Groups
 class HttpHeaderPropertyGroup(bpy.types.PropertyGroup):
     """Property group for custom http headers."""
@@ -190,6 +235,19 @@ class OutputPropertyGroup(bpy.types.PropertyGroup):
             ("text", "Text", "Text output")
         ]
     )
+    batch_id: StringProperty(
+        name="Batch Id",
+        description="Identifier shared by the outputs of the prompts sent in the same batch, for instance an animation, a sweep, tiles or cameras."
+    )
+    frame: IntProperty(
+        name="Frame",
+        description="Frame of the animation the output was generated for.",
+        default=0
+    )
+    camera: StringProperty(
+        name="Camera",
+        description="Name of the camera the output was generated for."
+    )
 
 
 class ProjectSettingsPropertyGroup(bpy.types.PropertyGroup):
@@ -202,6 +260,13 @@ class ProjectSettingsPropertyGroup(bpy.types.PropertyGroup):
         type=OutputPropertyGroup
     )
 
+    # Collection of cameras used in camera mode
+    camera_collection: PointerProperty(
+        name="Cameras",
+        description="Collection of cameras the workflow is run for in camera mode.",
+        type=bpy.types.Collection
+    )
+
     use_blend_file_location: BoolProperty(
         name="Use .blend File Location",
         description="Save workflows, inputs and outputs in the same folder as the current .blend file instead of the add-on data folder.",
@@ -249,19 +314,33 @@ class PromptPropertyGroup(bpy.types.PropertyGroup):
         name="Prompt Id",
         description="Identifier of the prompt returned by the ComfyUI server."
     )
-    workflow: StringProperty(
-        name="Workflow",
-        description="Workflow sent to the ComfyUI server."
+    batch_id: StringProperty(
+        name="Batch Id",
+        description="Identifier shared by the prompts sent in the same batch."
     )
-    outputs: StringProperty(
-        name="Outputs",
-        description="Output nodes of the workflow."
+    camera: StringProperty(
+        name="Camera",
+        description="Name of the camera the prompt was generated for."
+    )
+    crop: StringProperty(
+        name="Crop",
+        description="Offset, size and base image of the crop sent to the image inputs, stored as JSON."
+    )
+    frame: IntProperty(
+        name="Frame",
+        description="Frame of the animation the prompt was generated for.",
+        default=0
+    )
+    output_classes: StringProperty(
+        name="Output Classes",
+        description="Class types and titles of the output nodes of the workflow, stored as JSON."
     )
     status: EnumProperty(
         name="Status",
         description="Status of the prompt.",
         default="pending",
         items=[
+            ("submitting", "Submitting", ""),
             ("pending", "Pending", ""),
             ("execution_start", "Execution Start", ""),
             ("execution_cached", "Execution Cached", ""),
@@ -282,6 +361,12 @@ class PromptPropertyGroup(bpy.types.PropertyGroup):
         default=0
     )
 
+    timestamp: FloatProperty(
+        name="Timestamp",
+        description="Time when the prompt was sent to the ComfyUI server.",
+        default=0.0
+    )
+
 
 class ScheduledRenderPropertyGroup(bpy.types.PropertyGroup):
     """Property group for scheduled render operations."""
@@ -300,6 +385,29 @@ class ScheduledRenderPropertyGroup(bpy.types.PropertyGroup):
             ("render_view", "Render View", "Render from camera")
         ]
     )
+    fingerprint: StringProperty(
+        name="Fingerprint",
+        description="Fingerprint of the scene when the input was last rendered and uploaded.",
+        default=""
+    )
+
+
+class SweepPropertyGroup(bpy.types.PropertyGroup):
+    """Property group for the sweeps of inputs in batch mode.
+    Node ids are only unique within a workflow, so each sweep belongs to the workflow it was added to."""
+
+    workflow: StringProperty(
+        name="Workflow",
+        description="The workflow file that this sweep belongs to."
+    )
+    workflow_property: StringProperty(
+        name="Workflow Property",
+        description="The workflow property that this sweep targets."
+    )
+    values: StringProperty(
+        name="Values",
+        description="Values of the sweep, either a list a,b,c or an inclusive range start:stop:step. Use * to sweep all items of a list."
+    )
 
 
 class AddonPreferences(bpy.types.AddonPreferences):
@@ -339,6 +447,15 @@ class AddonPreferences(bpy.types.AddonPreferences):
         type=HttpHeaderPropertyGroup
     )
 
+    # Duration in seconds during which the lists of models queried from the ComfyUI server are cached
+    model_cache_ttl: IntProperty(
+        name="Model Cache Duration",
+        description="Duration in seconds during which the lists of models queried from the ComfyUI server are reused.",
+        default=300,
+        min=0,
+        subtype="TIME_ABSOLUTE"
+    )
+
     # Debug mode
     debug_mode: BoolProperty(
         name="Debug Mode",
@@ -421,13 +538,92 @@ class AddonPreferences(bpy.types.AddonPreferences):
         type=ScheduledRenderPropertyGroup
     )
 
-    # Flag to prevent clearing scheduled renders during execution
-    scheduled_renders_executing: BoolProperty(
-        name="Scheduled Renders Executing",
-        description="Internal flag indicating scheduled renders are being executed.",
+    # Batch mode
+    batch_mode: BoolProperty(
+        name="Batch Mode",
+        description="When enabled, a batch of prompts is sent for every combination of the swept input values.",
         default=False
     )
 
+    # Animation mode
+    animation_mode: BoolProperty(
+        name="Animation Mode",
+        description="When enabled, the workflow is run for every frame of the animation.",
+        default=False,
+        update=update_run_mode("animation_mode")
+    )
+
+    animation_frames: StringProperty(
+        name="Frames",
+        description="Frames to run the workflow for, for instance 1-10,15. The frame range of the scene is used when empty.",
+        default=""
+    )
+
+    animation_max_prompts: IntProperty(
+        name="Frames in Flight",
+        description="Maximum number of frames sent to the ComfyUI server and not finished yet.",
+        default=2,
+        min=1,
+        max=64
+    )
+
+    # Camera mode
+    camera_mode: BoolProperty(
+        name="Camera Mode",
+        description="When enabled, the scheduled inputs are captured and the workflow is run for every camera of a collection.",
+        default=False,
+        update=update_run_mode("camera_mode")
+    )
+
+    camera_max_prompts: IntProperty(
+        name="Cameras in Flight",
+        description="Maximum number of cameras sent to the ComfyUI server and not finished yet.",
+        default=2,
+        min=1,
+        max=64
+    )
+
+    # Tiled mode
+    tile_mode: BoolProperty(
+        name="Tiled Mode",
+        description="When enabled, the first image input is split into overlapping tiles, the workflow is run for every tile and the outputs are blended into one image.",
+        default=False,
+        update=update_run_mode("tile_mode")
+    )
+
+    tile_size: IntProperty(
+        name="Tile Size",
+        description="Width and height of the tiles in pixels.",
+        default=1024,
+        min=64,
+        max=8192,
+        subtype="PIXEL"
+    )
+
+    tile_overlap: IntProperty(
+        name="Tile Overlap",
+        description="Number of pixels shared by neighboring tiles, the outputs are faded into each other over this distance.",
+        default=128,
+        min=0,
+        max=4096,
+        subtype="PIXEL"
+    )
+
+    tile_concurrency: IntProperty(
+        name="Tiles in Flight",
+        description="Maximum number of tiles sent to the ComfyUI server and not finished yet. Increase it for servers with several GPUs.",
+        default=2,
+        min=1,
+        max=64
+    )
+
+    # Sweeps collection
+    sweeps: CollectionProperty(
+        name="Sweeps",
+        description="Collection of inputs swept in batch mode.",
+        type=SweepPropertyGroup
+    )
+
     # Prompts collection
     prompts_collection: CollectionProperty(
         name="Prompts Collection",
@@ -455,6 +651,41 @@ class AddonPreferences(bpy.types.AddonPreferences):
     )
 
 
+    # Backend used to capture depth maps
+    depth_backend: EnumProperty(
+        name="Depth Map Backend",
+        description="Method used to capture depth maps.",
+        default="render",
+        items=[
+            ("render", "Render", "Render the depth pass of the scene with the render engine"),
+            ("raycast", "Ray Cast", "Cast camera rays against the evaluated meshes, faster on machines without GPU")
+        ]
+    )
+
+    # Maximum number of vertices sampled to compute the depth range
+    depth_max_vertices: IntProperty(
+        name="Depth Map Vertex Samples",
+        description="Maximum number of vertices sampled to compute the range of depth maps, 0 to sample all vertices. Lower values are faster on large scenes but the range is approximate.",
+        default=1000000,
+        min=0
+    )
+
+    # Render scheduled inputs in background Blender processes
+    render_in_background: BoolProperty(
+        name="Render in Background",
+        description="Render scheduled depth maps, lineart and views in background Blender processes working on a copy of the blend file, the workflow is queued once they are done. The processes render on CPU, views of EEVEE scenes are rendered in the session and their depth maps and lineart with Cycles.",
+        default=False
+    )
+
+    # Number of background Blender processes
+    render_workers: IntProperty(
+        name="Render Processes",
+        description="Maximum number of background Blender processes rendering inputs at the same time, the CPU cores are shared between them.",
+        default=2,
+        min=1,
+        max=16
+    )
+
     # Feature flags
     # Open last image automatically
     open_last_image_automatically: BoolProperty(
@@ -463,6 +694,13 @@ class AddonPreferences(bpy.types.AddonPreferences):
         default=False
     )
 
+    # Use result cache
+    use_result_cache: BoolProperty(
+        name="Use Result Cache",
+        description="Reuse the outputs of a workflow run with exactly the same inputs instead of sending it again to the ComfyUI server.",
+        default=True
+    )
+
     # Confirm delete input
     confirm_delete_input: BoolProperty(
         name="Confirm Delete Input",
@@ -490,6 +728,7 @@ class AddonPreferences(bpy.types.AddonPreferences):
             layout.prop(self, "client_id")
             layout.prop(self, "server_address")
             layout.prop(self, "api_key")
+            layout.prop(self, "model_cache_ttl")
 
             # Custom HTTP headers
             row = layout.row()
@@ -582,12 +821,24 @@ class AddonPreferences(bpy.types.AddonPreferences):
                 reset_workflows_folder = row.operator("comfy.reset_folder", text="", icon="FILE_REFRESH")
                 reset_workflows_folder.target_property = "workflows_folder"
 
+            # Render settings
+            layout.label(text="Renders:")
+            layout.prop(self, "depth_backend")
+            layout.prop(self, "depth_max_vertices")
+            layout.prop(self, "render_in_background")
+            row = layout.row()
+            row.enabled = self.render_in_background
+            row.prop(self, "render_workers")
+
             # Feature flags
             layout.label(text="Feature Flags:")
 
             # Open last image automatically
             layout.prop(self, "open_last_image_automatically")
 
+            # Use result cache
+            layout.prop(self, "use_result_cache")
+
             # Confirm delete input
             layout.prop(self, "confirm_delete_input")
 
@@ -609,12 +860,15 @@ def register():
 
     # Register operators
     bpy.utils.register_class(AddHttpHeader)
+    bpy.utils.register_class(AddSweep)
     bpy.utils.register_class(RemoveHttpHeader)
+    bpy.utils.register_class(RemoveSweep)
 
     # Register add-on settings
     bpy.utils.register_class(HttpHeaderPropertyGroup)
     bpy.utils.register_class(PromptPropertyGroup)
     bpy.utils.register_class(ScheduledRenderPropertyGroup)
+    bpy.utils.register_class(SweepPropertyGroup)
     bpy.utils.register_class(AddonPreferences)
 
     # Register project settings
@@ -675,12 +929,15 @@ def unregister():
 
     # Unregister add-on settings
     bpy.utils.unregister_class(AddonPreferences)
+    bpy.utils.unregister_class(SweepPropertyGroup)
     bpy.utils.unregister_class(ScheduledRenderPropertyGroup)
     bpy.utils.unregister_class(PromptPropertyGroup)
     bpy.utils.unregister_class(HttpHeaderPropertyGroup)
 
     # Unregister operators
+    bpy.utils.unregister_class(RemoveSweep)
     bpy.utils.unregister_class(RemoveHttpHeader)
+    bpy.utils.unregister_class(AddSweep)
     bpy.utils.unregister_class(AddHttpHeader)
     
     
@@ -0,0 +1,245 @@
+"""Functions to send prompts to the ComfyUI server from a background queue."""
+import json
+import logging
+import queue
+import threading
+import time
+
+import bpy
+import requests
+from requests.adapters import HTTPAdapter
+
+from .prompts import add_prompt, remove_prompt, remove_prompt_record, rename_prompt
+from .results import get_result, get_result_key, link_result
+from .tiles import fail_tile
+from .workflow import get_workflow_hash
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Global variables to manage the HTTP session used to send prompts
+# The session keeps connections to the ComfyUI server alive between requests
+SESSION = None
+SESSION_LOCK = threading.Lock()
+SUBMIT_RETRIES = 3  # Number of retries after a transient failure
+SUBMIT_RETRY_DELAY = 1.0  # Delay in seconds before the first retry, doubled after each retry
+
+# Global variables to manage the queue of submissions
+# Each submission is a dictionary with the keys: url, headers, prompts, inputs_folder, outputs_folder, server_address...
+SUBMISSION_QUEUE = queue.Queue()
+SUBMISSION_THREAD = None
+SUBMISSION_LOCK = threading.Lock()
+PENDING_SUBMISSIONS = 0  # Number of prompts waiting to be sent
+
+
+def clear_submissions():
+    """Remove the submissions waiting in the queue and return the ids of their prompts."""
+
+    global PENDING_SUBMISSIONS
+    prompt_ids = []
+    while True:
+        try:
+            submission = SUBMISSION_QUEUE.get_nowait()
+        except queue.Empty:
+            break
+        prompt_ids.extend(prompt["prompt_id"] for prompt in submission["prompts"])
+        SUBMISSION_QUEUE.task_done()
+    with SUBMISSION_LOCK:
+        PENDING_SUBMISSIONS -= len(prompt_ids)
+    return prompt_ids
+
+
+def close_session():
+    """Close the HTTP session and its pooled connections."""
+
+    global SESSION
+    with SESSION_LOCK:
+        if SESSION:
+            SESSION.close()
+            SESSION = None
+
+
+def enqueue_submission(submission):
+    """Add a submission to the queue and start the submission thread if needed."""
+
+    global PENDING_SUBMISSIONS, SUBMISSION_THREAD
+    with SUBMISSION_LOCK:
+        PENDING_SUBMISSIONS += len(submission["prompts"])
+        SUBMISSION_QUEUE.put(submission)
+        if SUBMISSION_THREAD is None or not SUBMISSION_THREAD.is_alive():
+            SUBMISSION_THREAD = threading.Thread(target=process_submissions, daemon=True)
+            SUBMISSION_THREAD.start()
+
+
+def finalize_submission(submission, linked_results, submit_results):
+    """Update the prompts collection once the prompts of a submission are sent, this runs on the main thread."""
+
+    addon_prefs = bpy.context.preferences.addons["comfyui_blender"].preferences
+    prompts_collection = addon_prefs.prompts_collection
+
+    # Link outputs reused from the result cache
+    for prompt_id, result in linked_results:
+        remove_prompt_record(prompts_collection, prompt_id)
+        link_result(bpy.context, result, submission["outputs_folder"], submission["batch_id"], submission["camera"])
+
+    # Update status of the prompts sent to the ComfyUI server
+    error_messages = []
+    for prompt_id, (server_prompt_id, error_message) in submit_results:
+        if error_message:
+            error_messages.append(error_message)
+
+            # Stop the tiles of the prompt, the tile would never be received
+            index = prompts_collection.find(prompt_id)
+            crop = prompts_collection[index].crop if index != -1 else ""
+            if crop and "tiles" in json.loads(crop):
+                fail_tile(json.loads(crop))
+            remove_prompt_record(prompts_collection, prompt_id)
+            continue
+
+        index = prompts_collection.find(prompt_id)
+        if index == -1:
+            continue
+
+        # Older ComfyUI servers ignore the prompt id sent by the client
+        if server_prompt_id and server_prompt_id != prompt_id:
+            rename_prompt(prompt_id, server_prompt_id)
+            prompts_collection[index].name = server_prompt_id
+        if prompts_collection[index].status == "submitting":
+            prompts_collection[index].status = "pending"
+
+    # Raise the first error, the other ones are in the log
+    if error_messages:
+        error_message = error_messages[0]
+        if len(submission["prompts"]) > 1:
+            error_message = f"{len(error_messages)} of {len(submission['prompts'])} prompts failed to be sent to the ComfyUI server. {error_message}"
+        bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+
+    # Force redraw of the UI
+    for screen in bpy.data.screens:
+        for area in screen.areas:
+            if area.type in ("VIEW_3D", "IMAGE_EDITOR"):
+                area.tag_redraw()
+    return None
+
+
+def get_pending_submissions():
+    """Return the number of prompts waiting to be sent to the ComfyUI server."""
+
+    with SUBMISSION_LOCK:
+        return PENDING_SUBMISSIONS
+
+
+def get_session():
+    """Return the HTTP session with a pool of connections to the ComfyUI server."""
+
+    global SESSION
+    with SESSION_LOCK:
+        if SESSION is None:
+            SESSION = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            SESSION.mount("http://", adapter)
+            SESSION.mount("https://", adapter)
+        return SESSION
+
+
+def process_submission(submission):
+    """Reuse cached outputs and send the other prompts of a submission to the ComfyUI server."""
+
+    global PENDING_SUBMISSIONS
+
+    # Hash prompts and input files in the background, this can be slow with large input files
+    linked_results = []
+    prompts_to_submit = []
+    for prompt in submission["prompts"]:
+        cache_key = None
+        if submission["use_result_cache"]:
+            cache_key = get_result_key(prompt["data"]["prompt"], submission["inputs_folder"], submission["server_address"])
+            if not submission["force_run"]:
+                result = get_result(cache_key, submission["outputs_folder"])
+                if result:
+                    linked_results.append((prompt["prompt_id"], result))
+                    continue
+
+        # Keep the full workflow in memory until the prompt is finished
+        workflow = prompt["data"]["prompt"]
+        add_prompt(prompt["prompt_id"], workflow, get_workflow_hash(workflow), submission["outputs"], submission["batch_id"], cache_key)
+        prompts_to_submit.append(prompt)
+
+    # Send prompts in order so the server queues them in the order of the batch
+    prompts_data = [prompt["data"] for prompt in prompts_to_submit]
+    results = submit_prompts(submission["url"], submission["headers"], prompts_data) if prompts_data else []
+    submit_results = []
+    for prompt, (server_prompt_id, error_message) in zip(prompts_to_submit, results):
+        if error_message:
+            remove_prompt(prompt["prompt_id"])
+        submit_results.append((prompt["prompt_id"], (server_prompt_id, error_message)))
+
+    with SUBMISSION_LOCK:
+        PENDING_SUBMISSIONS -= len(submission["prompts"])
+
+    if linked_results:
+        log.info(f"Outputs of {len(linked_results)} workflow(s) reused from the result cache.")
+
+    # Schedule update of the prompts collection on main thread
+    bpy.app.timers.register(lambda: finalize_submission(submission, linked_results, submit_results), first_interval=0.0)
+
+
+def process_submissions():
+    """Process the submissions of the queue one after the other, this runs in the submission thread."""
+
+    while True:
+        submission = SUBMISSION_QUEUE.get()
+        try:
+            process_submission(submission)
+        except Exception as e:
+            # Remove the prompts of the submission from the prompts collection
+            global PENDING_SUBMISSIONS
+            error_message = f"Failed to send workflow to ComfyUI server. {e}"
+            log.exception(error_message)
+            with SUBMISSION_LOCK:
+                PENDING_SUBMISSIONS -= len(submission["prompts"])
+            submit_results = [(prompt["prompt_id"], (None, error_message)) for prompt in submission["prompts"]]
+            bpy.app.timers.register(lambda: finalize_submission(submission, [], submit_results), first_interval=0.0)
+        finally:
+            SUBMISSION_QUEUE.task_done()
+
+
+def submit_prompt(url, headers, data):
+    """Send a prompt to the ComfyUI server and return the prompt id and an error message if any.
+    Connection errors, timeouts and server errors are retried with an exponential backoff."""
+
+    delay = SUBMIT_RETRY_DELAY
+    for attempt in range(SUBMIT_RETRIES + 1):
+        try:
+            response = get_session().post(url, json=data, headers=headers, timeout=30)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error_message = f"Failed to send run workflow request to ComfyUI server: {url}. {e}"
+        except Exception as e:
+            error_message = f"Failed to send run workflow request to ComfyUI server: {url}. {e}"
+            log.exception(error_message)
+            return None, error_message
+        else:
+            if response.status_code == 200:
+                prompt_id = response.json().get("prompt_id", data.get("prompt_id", ""))
+                return prompt_id, None
+
+            # Errors in the workflow are not transient and are returned as is
+            error_message = response.text
+            if response.status_code < 500 and response.status_code != 429:
+                log.error(error_message)
+                return None, error_message
+
+        if attempt < SUBMIT_RETRIES:
+            log.warning(f"{error_message} Retrying in {delay} seconds...")
+            time.sleep(delay)
+            delay *= 2
+
+    log.error(error_message)
+    return None, error_message
+
+
+def submit_prompts(url, headers, prompts_data):
+    """Send prompts one after the other to the ComfyUI server and return their prompt ids and error messages in order.
+    Prompts are sent sequentially so the ComfyUI server queues them in the order of the batch."""
+
+    return [submit_prompt(url, headers, data) for data in prompts_data]
@@ -0,0 +1,103 @@
+"""Functions to expand parameter sweeps into batches of prompts."""
+import itertools
+import logging
+import math
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Input nodes which can be swept in batch mode
+# All of them store their value in the "value" input of the node
+SWEEP_INPUT_TYPES = ("BlenderInputCombo", "BlenderInputFloat", "BlenderInputInt", "BlenderInputSeed")
+
+# Maximum number of prompts in a batch to avoid flooding the ComfyUI server by mistake
+BATCH_MAX_SIZE = 1000
+
+
+def apply_sweep_variant(workflow, variant):
+    """Return a copy of the workflow with the values of a sweep variant.
+    Only the swept nodes are copied, the other nodes are shared with the base workflow."""
+
+    prompt = dict(workflow)
+    for key, value in variant.items():
+        node = dict(workflow[key])
+        node["inputs"] = dict(node["inputs"])
+        node["inputs"]["value"] = value
+        prompt[key] = node
+    return prompt
+
+
+def get_sweep_variants(sweeps, inputs, current_workflow):
+    """Return the list of variants of a grid of sweeps, each variant maps node keys to values."""
+
+    keys = []
+    values = []
+    for sweep in sweeps:
+        # Ignore sweeps which do not target a sweepable input of the current workflow
+        key = sweep.workflow_property.removeprefix("node_")
+        if key not in inputs or inputs[key]["class_type"] not in SWEEP_INPUT_TYPES:
+            log.debug(f"Ignoring sweep on unknown input: {sweep.workflow_property}")
+            continue
+
+        property = current_workflow.bl_rna.properties[sweep.workflow_property]
+        try:
+            sweep_values = parse_sweep_values(sweep.values, inputs[key]["class_type"], property)
+        except Exception as e:
+            raise Exception(f"Invalid sweep for input {property.name}: {e}")
+        keys.append(key)
+        values.append(sweep_values)
+
+    # Combine all sweeps in a grid
+    nb_variants = math.prod(len(v) for v in values)
+    if nb_variants > BATCH_MAX_SIZE:
+        raise Exception(f"Batch of {nb_variants} prompts exceeds the maximum of {BATCH_MAX_SIZE} prompts.")
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+
+def parse_sweep_values(values, class_type, property):
+    """Parse a sweep specification, either a list "a,b,c" or an inclusive range "start:stop[:step]"."""
+
+    values = values.strip()
+    if not values:
+        raise Exception("Sweep values are empty.")
+
+    # Combo boxes only support lists of items, "*" selects all items
+    if class_type == "BlenderInputCombo":
+        items = [item.identifier for item in property.enum_items]
+        if values == "*":
+            return items
+        sweep_values = [v.strip() for v in values.split(",")]
+        for value in sweep_values:
+            if value not in items:
+                raise Exception(f"Item {value} is not in the list.")
+        return sweep_values
+
+    # Numeric inputs support lists and ranges
+    cast = float if class_type == "BlenderInputFloat" else int
+    try:
+        if ":" in values:
+            bounds = [cast(v.strip()) for v in values.split(":")]
+            if len(bounds) not in (2, 3):
+                raise ValueError("range must be start:stop or start:stop:step")
+            start, stop = bounds[0], bounds[1]
+            step = bounds[2] if len(bounds) == 3 else (1 if stop >= start else -1)
+            if step == 0:
+                raise ValueError("step cannot be 0")
+            count = math.floor((stop - start) / step + 1e-9) + 1
+            if count <= 0:
+                raise ValueError("range is empty")
+            if count > BATCH_MAX_SIZE:
+                raise ValueError(f"range has more than {BATCH_MAX_SIZE} values")
+            sweep_values = [start + i * step for i in range(count)]
+            if cast is float:
+                sweep_values = [round(v, 6) for v in sweep_values]
+        else:
+            sweep_values = [cast(v.strip()) for v in values.split(",")]
+    except ValueError as e:
+        raise Exception(f"Could not parse {values}: {e}")
+
+    # Check values are within the limits of the input
+    for value in sweep_values:
+        if value < property.hard_min or value > property.hard_max:
+            raise Exception(f"Value {value} is out of range [{property.hard_min}, {property.hard_max}].")
+    return sweep_values
@@ -0,0 +1,304 @@
+"""Functions to run a workflow on the overlapping tiles of a large image and blend the outputs back into one image."""
+import logging
+import os
+
+import bpy
+import numpy as np
+
+from .capture import upload_input
+from .scheduler import start_scheduler, stop_scheduler
+from .utils import get_filepath, get_image_pixels, get_inputs_folder, get_outputs_folder, get_temp_folder, save_image_pixels
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Global variable to manage the tiles being queued and blended, the tiles are queued by a scheduler
+# Dictionary with the keys: batch_id, run_tile, total, workflow_property, source_name, pixels, image_size, overlap,
+# finished, outputs
+# Each output image of the workflow is blended separately, outputs is a dictionary of output keys to dictionaries
+# with the keys: received, image, accumulator, weights, result, scale
+TILES = None
+TILES_SCHEDULER = "Tiles"  # Name of the scheduler queueing the tiles, it is also used in error messages
+
+
+def add_tile_output(filepath, crop, output_key):
+    """Blend an output of a tile into the image of its batch with feathered edges, this runs on the main thread.
+    Output key identifies the output among the outputs of the workflow, each output is blended into its own image.
+    The image is updated after every tile and saved in the outputs folder once all tiles are finished."""
+
+    if TILES is None or TILES["batch_id"] != crop["tiles"]:
+        return
+    if output_key not in TILES["outputs"]:
+        TILES["outputs"][output_key] = {
+            "received": set(),
+            "image": None,
+            "accumulator": None,
+            "weights": None,
+            "result": None,
+            "scale": None
+        }
+    tile_output = TILES["outputs"][output_key]
+    if crop["tile"] in tile_output["received"]:
+        return
+    tile_output["received"].add(crop["tile"])
+    x, y = crop["offset"]
+    width, height = crop["size"]
+    image_width, image_height = TILES["image_size"]
+
+    try:
+        output = bpy.data.images.load(filepath, check_existing=False)
+        try:
+            # The image is allocated with the scale of the first output, for instance 2 with an upscaling workflow
+            if tile_output["accumulator"] is None:
+                tile_output["scale"] = max(1, round(output.size[0] / width))
+                scale = tile_output["scale"]
+                tile_output["accumulator"] = np.zeros((image_height * scale, image_width * scale, 3), dtype=np.float32)
+                tile_output["weights"] = np.zeros((image_height * scale, image_width * scale), dtype=np.float32)
+                tile_output["result"] = np.zeros((image_height * scale, image_width * scale, 4), dtype=np.float32)
+            scale = tile_output["scale"]
+            if tuple(output.size) != (width * scale, height * scale):
+                output.scale(width * scale, height * scale)
+            tile_pixels = get_image_pixels(output)[:, :, :3]
+        finally:
+            bpy.data.images.remove(output)
+
+        # Accumulate the weighted pixels, overlapping tiles fade into each other
+        weights = get_tile_weights(crop["offset"], crop["size"], (image_width, image_height), TILES["overlap"], scale)
+        rows = slice(y * scale, (y + height) * scale)
+        columns = slice(x * scale, (x + width) * scale)
+        tile_output["accumulator"][rows, columns] += tile_pixels * weights[:, :, np.newaxis]
+        tile_output["weights"][rows, columns] += weights
+
+        # Update the image with the tiles received so far, only the region of the tile changes and missing tiles are transparent
+        region_weights = tile_output["weights"][rows, columns]
+        covered = region_weights > 0
+        result = tile_output["result"][rows, columns]
+        result[covered, :3] = tile_output["accumulator"][rows, columns][covered] / region_weights[covered, np.newaxis]
+        result[covered, 3] = 1.0
+        image = get_tiles_image(tile_output)
+        image.pixels.foreach_set(tile_output["result"].ravel())
+        image.update()
+        log.info(f"Tile {len(tile_output['received'])}/{TILES['total']} blended into {image.name}.")
+    except Exception as e:
+        error_message = f"Failed to blend tile output: {e}"
+        log.exception(error_message)
+        stop_tiles()
+        bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+        return
+
+    # Force redraw of the UI
+    for screen in bpy.data.screens:
+        for area in screen.areas:
+            if area.type in ("VIEW_3D", "IMAGE_EDITOR"):
+                area.tag_redraw()
+
+
+def fail_tile(crop):
+    """Stop the tiles of a batch when the prompt of one of its tiles fails or is interrupted, this runs on the main thread.
+    The error is reported by the caller, the tiles received so far are discarded."""
+
+    if TILES is None or TILES["batch_id"] != crop["tiles"]:
+        return
+    log.error(f"Tiles stopped, tile {crop['tile'] + 1}/{TILES['total']} did not complete.")
+    stop_tiles()
+
+    # Force redraw of the UI
+    for screen in bpy.data.screens:
+        for area in screen.areas:
+            if area.type in ("VIEW_3D", "IMAGE_EDITOR"):
+                area.tag_redraw()
+
+
+def finish_tile(crop):
+    """Count the tile of a prompt which completed and save the images once all tiles are finished, this runs on the main thread."""
+
+    if TILES is None or TILES["batch_id"] != crop["tiles"]:
+        return
+    TILES["finished"].add(crop["tile"])
+    if len(TILES["finished"]) == TILES["total"]:
+        finish_tiles()
+
+
+def finish_tiles():
+    """Save the blended images in the outputs folder and add them to the outputs collection."""
+
+    global TILES
+    tiles = TILES
+    TILES = None
+    outputs_folder = get_outputs_folder()
+    outputs_collection = bpy.context.scene.comfyui_project_settings.outputs_collection
+    image = None
+    for tile_output in tiles["outputs"].values():
+        image = bpy.data.images.get(tile_output["image"]) if tile_output["image"] else None
+        if image is None:
+            continue
+        filename, filepath = get_filepath(f"blender_tiles_{tiles['batch_id'][:8]}.png", outputs_folder)
+        image.file_format = "PNG"
+        image.filepath_raw = filepath
+        image.save()
+
+        # Reload the image from its file so it is listed as any other output
+        bpy.data.images.remove(image)
+        image = bpy.data.images.load(filepath, check_existing=True)
+        image.preview_ensure()
+        output = outputs_collection.add()
+        output.name = image.name
+        output.filepath = filename
+        output.type = "image"
+        output.batch_id = tiles["batch_id"]
+        log.info(f"All {tiles['total']} tiles blended into {filepath}.")
+
+    addon_prefs = bpy.context.preferences.addons["comfyui_blender"].preferences
+    if image and addon_prefs.open_last_image_automatically:
+        bpy.ops.comfy.open_image_editor("EXEC_DEFAULT", name=image.name)
+
+
+def get_tile_bounds(size, tile_size, overlap):
+    """Return the start of the tiles covering a length, consecutive tiles overlap by at least the given number of pixels."""
+
+    if size <= tile_size:
+        return [0]
+    nb_tiles = -(-(size - overlap) // (tile_size - overlap))
+    return [int(start) for start in np.round(np.linspace(0, size - tile_size, nb_tiles))]
+
+
+def get_tile_weights(offset, size, image_size, overlap, scale=1):
+    """Return the blending weights (height, width) of a tile, they ramp up from the edges shared with other tiles."""
+
+    weights = []
+    ramp = max(1, overlap * scale)
+    for start, length, image_length in zip(offset, size, image_size):
+        positions = np.arange(length * scale, dtype=np.float32) + 0.5
+        weight = np.ones(length * scale, dtype=np.float32)
+        if start > 0:
+            weight = np.minimum(weight, positions / ramp)
+        if start + length < image_length:
+            weight = np.minimum(weight, positions[::-1] / ramp)
+        weights.append(weight)
+    return np.outer(weights[1], weights[0])
+
+
+def get_tiles(width, height, tile_size, overlap):
+    """Return the bounds (x, y, width, height) of the overlapping tiles covering an image, from the bottom left."""
+
+    overlap = min(overlap, tile_size // 2)
+    tile_width = min(tile_size, width)
+    tile_height = min(tile_size, height)
+    return [
+        (x, y, tile_width, tile_height)
+        for y in get_tile_bounds(height, tile_size, overlap)
+        for x in get_tile_bounds(width, tile_size, overlap)
+    ]
+
+
+def get_tiles_image(tile_output):
+    """Return the image receiving the blended tiles of an output, it is created when the first tile is received."""
+
+    height, width = tile_output["result"].shape[:2]
+    image = bpy.data.images.get(tile_output["image"]) if tile_output["image"] else None
+    if image is None or tuple(image.size) != (width, height):
+        image = bpy.data.images.new(name=f"{TILES['source_name']} Tiles", width=width, height=height, alpha=True)
+        tile_output["image"] = image.name
+    return image
+
+
+def get_tiles_progress():
+    """Return the number of tiles finished and the total number of tiles, or None if no tiled workflow is running."""
+
+    if TILES is None:
+        return None
+    return len(TILES["finished"]), TILES["total"]
+
+
+def queue_tile(tile, batch_id):
+    """Upload the image of a tile, set it as the input of the workflow and queue its prompts."""
+
+    index, (x, y, width, height) = tile
+    temp_filepath = os.path.join(get_temp_folder(), "blender_tile.png")
+    save_image_pixels(TILES["pixels"][y:y + height, x:x + width], temp_filepath)
+    input_filepath = upload_input(temp_filepath, get_inputs_folder())
+    crop = {"offset": [x, y], "size": [width, height], "tiles": batch_id, "tile": index}
+    set_tile_input(bpy.context, input_filepath, crop)
+
+    # All tiles use the same seeds, they are only randomized for the next run after the last tile
+    TILES["run_tile"](batch_id, index < TILES["total"] - 1)
+
+
+def restore_tiles_input(context, tiles):
+    """Set the source image back as the input of the workflow and remove the image of the last tile."""
+
+    current_workflow = context.scene.current_workflow
+    tile_image = getattr(current_workflow, tiles["workflow_property"], None)
+    source_image = bpy.data.images.get(tiles["source_name"])
+    if source_image:
+        setattr(current_workflow, tiles["workflow_property"], source_image)
+    if tile_image and tile_image != source_image and "comfyui_crop" in tile_image:
+        bpy.data.images.remove(tile_image)
+
+
+def set_tile_input(context, input_filepath, crop):
+    """Replace the image of the tiled input with the image of a tile, the source image is kept in Blender's data."""
+
+    current_workflow = context.scene.current_workflow
+    previous_image = getattr(current_workflow, TILES["workflow_property"], None)
+    if previous_image and previous_image.name != TILES["source_name"] and "comfyui_crop" in previous_image:
+        bpy.data.images.remove(previous_image)
+    image = bpy.data.images.load(input_filepath, check_existing=True)
+    image["comfyui_crop"] = crop
+    setattr(current_workflow, TILES["workflow_property"], image)
+
+
+def start_tiles(context, workflow_property, run_tile, tile_size, overlap, max_prompts):
+    """Start queueing the tiles of the image of a workflow input, run_tile(batch_id, lock_seed) queues the prompts of a tile."""
+
+    global TILES
+    stop_tiles()
+    source_image = getattr(context.scene.current_workflow, workflow_property, None)
+    if not source_image:
+        raise Exception("Tiled mode requires an image in the first image input of the workflow.")
+    pixels = get_image_pixels(source_image)
+    height, width = pixels.shape[:2]
+    tiles = get_tiles(width, height, tile_size, overlap)
+
+    tiles_state = {
+        "batch_id": "",
+        "run_tile": run_tile,
+        "total": len(tiles),
+        "workflow_property": workflow_property,
+        "source_name": source_image.name,
+        "pixels": pixels,
+        "image_size": (width, height),
+        "overlap": min(overlap, tile_size // 2),
+        "finished": set(),
+        "outputs": {}
+    }
+
+    # Once all tiles are queued, the source image is set back as the input of the workflow
+    # Only the outputs are needed from then on, the tiles are blended as they are received
+    def restore_input(cancelled):
+        restore_tiles_input(bpy.context, tiles_state)
+        tiles_state["pixels"] = None
+        if cancelled:
+            stop_tiles()
+
+    TILES = tiles_state
+    log.info(f"Splitting {source_image.name} ({width}x{height}) into {len(tiles)} tiles...")
+    TILES["batch_id"] = start_scheduler(
+        TILES_SCHEDULER,
+        list(enumerate(tiles)),
+        queue_tile,
+        max_prompts,
+        lambda tile: f"tile {tile[0] + 1}/{len(tiles)}",
+        restore_input
+    )
+    return len(tiles)
+
+
+def stop_tiles():
+    """Stop queueing tiles and discard the tiles received so far."""
+
+    global TILES
+    if TILES is None:
+        return
+    TILES = None
+    stop_scheduler(TILES_SCHEDULER)  # The source image is set back as the input if tiles were still being queued
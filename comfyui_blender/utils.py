@@ -2,10 +2,13 @@ import logging
 import os
 import random
 import requests
+import struct
 import textwrap
+import zlib
 from urllib.parse import quote, urljoin, urlencode
 
 import bpy
+import numpy as np
 
 
 log = logging.getLogger("comfyui_blender")
@@ -92,6 +95,40 @@ def download_file(filename, subfolder, type="output"):
     return filename, filepath
 
 
+def encode_png(pixels):
+    """Encode an array of pixels (height, width[, channels]) of type uint8 or uint16 to PNG bytes.
+    The first row of the array is the top of the image."""
+
+    pixels = np.asarray(pixels)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, np.newaxis]
+    height, width, channels = pixels.shape
+    color_types = {1: 0, 2: 4, 3: 2, 4: 6}  # Grayscale, grayscale with alpha, RGB, RGBA
+    if channels not in color_types:
+        raise ValueError(f"Unsupported number of channels: {channels}")
+    if pixels.dtype == np.uint16:
+        bit_depth = 16
+        pixels = pixels.astype(">u2")  # PNG stores 16-bit samples in big-endian order
+    elif pixels.dtype == np.uint8:
+        bit_depth = 8
+    else:
+        raise ValueError(f"Unsupported pixel type: {pixels.dtype}")
+
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    # Prefix each row with filter type 0 (none)
+    rows = pixels.reshape(height, width * channels).view(np.uint8).reshape(height, -1)
+    raw_data = np.hstack((np.zeros((height, 1), dtype=np.uint8), rows)).tobytes()
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, color_types[channels], 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw_data, 6))
+        + chunk(b"IEND", b"")
+    )
+
+
 def get_filepath(filename, folder):
     """Handle file names conflicts when importing files, by appending an incremental number"""
 
@@ -108,6 +145,63 @@ def get_filepath(filename, folder):
     return filename, filepath
 
 
+def get_image_filepath(image):
+    """Return the path of the PNG file of an image with an alpha channel if it matches the pixels in memory, None otherwise."""
+
+    if image.source != "FILE" or image.packed_file or image.is_dirty:
+        return None
+    if image.file_format != "PNG" or image.depth not in (32, 64):  # RGBA with 8 or 16 bits per channel
+        return None
+    filepath = bpy.path.abspath(image.filepath, library=image.library)
+    if not os.path.isfile(filepath):
+        return None
+    return filepath
+
+
+def get_image_pixels(image):
+    """Return the pixels of an image as an array (height, width, 4) of type float32.
+    The pixels are copied with foreach_get into a preallocated buffer, the first row is the bottom of the image."""
+
+    width, height = image.size
+    channels = image.channels
+    pixels = np.empty(width * height * channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    pixels = pixels.reshape(height, width, channels)
+
+    # Expand grayscale and RGB images to RGBA with an opaque alpha channel
+    if channels == 4:
+        return pixels
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    rgba[:, :, :3] = pixels[:, :, :3] if channels >= 3 else pixels[:, :, :1]
+    return rgba
+
+
+def save_image_pixels(pixels, filepath):
+    """Save an array of pixels (height, width, 4) of type float32 to a PNG file with Blender's image writer.
+    The first row of the array is the bottom of the image."""
+
+    height, width = pixels.shape[:2]
+    image = bpy.data.images.new(name=os.path.basename(filepath), width=width, height=height, alpha=True)
+    try:
+        image.pixels.foreach_set(np.ascontiguousarray(pixels, dtype=np.float32).ravel())
+        image.file_format = "PNG"
+        image.filepath_raw = filepath
+        image.save()
+    finally:
+        bpy.data.images.remove(image)
+    return filepath
+
+
+def save_mask_pixels(pixels, filepath):
+    """Save the alpha channel of an array of pixels (height, width, 4) to an 8-bit grayscale PNG file.
+    Pixels with a lower alpha are brighter, white is fully masked. The first row of the array is the bottom of the image."""
+
+    mask = np.round((1.0 - np.clip(pixels[::-1, :, 3], 0.0, 1.0)) * 255).astype(np.uint8)
+    with open(filepath, "wb") as file:
+        file.write(encode_png(mask))
+    return filepath
+
+
 def get_inputs_folder():
     """Get the inputs folder from the preferences."""
 
@@ -198,8 +292,9 @@ def show_error_popup(message):
     bpy.context.window_manager.popup_menu(draw, title="Execution Error", icon="ERROR")
 
 
-def upload_file(filepath, type, subfolder=None, overwrite=False):
-    """Upload a file to the ComfyUI server."""
+def upload_file(filepath, type, subfolder=None, overwrite=False, url=None, headers=None):
+    """Upload a file to the ComfyUI server.
+    The url and headers can be provided to upload from a worker thread."""
 
     # Prepare form data
     data = {}
@@ -224,7 +319,9 @@ def upload_file(filepath, type, subfolder=None, overwrite=False):
             data["subfolder"] = subfolder
 
     files = {"image": (filename, file_data)}
-    url = get_server_url("/upload/image")
-    headers = add_custom_headers()
+    if url is None:
+        url = get_server_url("/upload/image")
+    if headers is None:
+        headers = add_custom_headers()
     response = requests.post(url, files=files, data=data, headers=headers)
     return response
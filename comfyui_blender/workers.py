@@ -0,0 +1,160 @@
+"""Functions to render scheduled inputs in background Blender processes."""
+import json
+import logging
+import os
+import subprocess
+import uuid
+from collections import deque
+
+import bpy
+
+log = logging.getLogger("comfyui_blender")
+
+
+# Global variable to manage the background renders
+# Dictionary with the keys: jobs, running, results, errors, snapshot, max_workers, on_done
+WORKERS = None
+WORKERS_INTERVAL = 0.2  # Delay in seconds between two checks of the background processes
+
+# Render types which only depend on the scene seen from the camera and can be rendered from a snapshot of the blend file
+WORKER_RENDER_TYPES = ("render_depth_map", "render_lineart", "render_view")
+WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "render_worker.py")
+WORKER_RESULT_FILENAME = "worker_result.json"
+WORKER_LOG_FILENAME = "worker.log"
+
+
+def is_rendering_in_workers():
+    """Return True if background renders are running."""
+
+    return WORKERS is not None
+
+
+def is_worker_render(scene, render_type):
+    """Return True if a render type can be rendered in a background process for a scene.
+    Background processes render on CPU, views of EEVEE scenes are rendered in the session to keep the look of the engine."""
+
+    if render_type not in WORKER_RENDER_TYPES:
+        return False
+    return not (render_type == "render_view" and scene.render.engine.startswith("BLENDER_EEVEE"))
+
+
+def process_worker_renders():
+    """Start the next background renders and collect the finished ones, this runs on the main thread."""
+
+    global WORKERS
+    if WORKERS is None:
+        return None
+
+    # Collect the results of finished processes
+    for job in list(WORKERS["running"]):
+        if job["process"].poll() is None:
+            continue
+        WORKERS["running"].remove(job)
+        job["log_file"].close()
+        result_path = os.path.join(job["folder"], WORKER_RESULT_FILENAME)
+        try:
+            with open(result_path, "r", encoding="utf-8") as file:
+                result = json.load(file)
+            os.remove(result_path)
+        except Exception as e:
+            result = {"error": f"No result from the background render, see {job['log_path']}. {e}"}
+        if result.get("error"):
+            log.error(f"Background render of {job['workflow_property']} failed: {result['error']}")
+            WORKERS["errors"].append(result["error"])
+        else:
+            log.info(f"Background render of {job['workflow_property']} completed: {result['filepath']}")
+            WORKERS["results"][job["workflow_property"]] = result["filepath"]
+
+    # Start the next processes, the remaining jobs are cancelled after an error
+    while WORKERS["jobs"] and not WORKERS["errors"] and len(WORKERS["running"]) < WORKERS["max_workers"]:
+        job = WORKERS["jobs"].popleft()
+        os.makedirs(job["folder"], exist_ok=True)
+        job["log_path"] = os.path.join(job["folder"], WORKER_LOG_FILENAME)
+        job["log_file"] = open(job["log_path"], "w", encoding="utf-8")
+        job["process"] = subprocess.Popen(job["command"], stdout=job["log_file"], stderr=subprocess.STDOUT)
+        WORKERS["running"].append(job)
+
+    if WORKERS["running"] or (WORKERS["jobs"] and not WORKERS["errors"]):
+        return WORKERS_INTERVAL
+
+    # All background renders are finished
+    workers = WORKERS
+    WORKERS = None
+    if os.path.exists(workers["snapshot"]):
+        os.remove(workers["snapshot"])
+    try:
+        if workers["errors"]:
+            raise Exception(f"Failed to execute scheduled renders in the background: {workers['errors'][0]}")
+        workers["on_done"](workers["results"])
+    except Exception as e:
+        error_message = str(e)
+        log.error(error_message)
+        bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+    return None
+
+
+def start_worker_renders(context, renders, temp_folder, on_done):
+    """Render inputs in background Blender processes working on a snapshot of the current blend file.
+    Renders is a list of tuples (workflow property, render type), on_done is called on the main thread with a dictionary
+    mapping each workflow property to its rendered file once all renders are finished."""
+
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+    stop_worker_renders()
+
+    # Save a copy of the current state of the blend file, the session keeps working on the original file
+    os.makedirs(temp_folder, exist_ok=True)
+    snapshot = os.path.join(temp_folder, f"render_snapshot_{uuid.uuid4().hex}.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=snapshot, copy=True, check_existing=False)
+
+    # Share the cores of the machine between the processes
+    max_workers = min(addon_prefs.render_workers, len(renders))
+    threads = max(1, (os.cpu_count() or 1) // max_workers)
+
+    jobs = deque()
+    for workflow_property, render_type in renders:
+        folder = os.path.join(temp_folder, workflow_property)
+        arguments = {
+            "package": __package__,
+            "render_type": render_type,
+            "folder": folder,
+            "threads": threads,
+            "depth_backend": addon_prefs.depth_backend,
+            "depth_max_vertices": addon_prefs.depth_max_vertices
+        }
+        command = [
+            bpy.app.binary_path, "--background", snapshot, "--python-exit-code", "1",
+            "--python", WORKER_SCRIPT, "--", json.dumps(arguments)
+        ]
+        jobs.append({"workflow_property": workflow_property, "folder": folder, "command": command})
+
+    global WORKERS
+    WORKERS = {
+        "jobs": jobs,
+        "running": [],
+        "results": {},
+        "errors": [],
+        "snapshot": snapshot,
+        "max_workers": max_workers,
+        "on_done": on_done
+    }
+    log.info(f"Rendering {len(jobs)} input(s) in {max_workers} background process(es)...")
+    bpy.app.timers.register(process_worker_renders, first_interval=0.0)
+
+
+def stop_worker_renders():
+    """Terminate the background renders and remove the snapshot of the blend file."""
+
+    global WORKERS
+    if WORKERS is None:
+        return
+    workers = WORKERS
+    WORKERS = None  # The timer stops on its next call
+    for job in workers["running"]:
+        job["process"].terminate()
+        try:
+            job["process"].wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            job["process"].kill()
+        job["log_file"].close()
+    if os.path.exists(workers["snapshot"]):
+        os.remove(workers["snapshot"])
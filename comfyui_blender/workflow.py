@@ -3,11 +3,13 @@ import hashlib
 import json
 import logging
 import os
+import random
 import re
 import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import bpy
-import requests
 from bpy.props import (
     BoolProperty,
     EnumProperty,
@@ -18,23 +20,34 @@ from bpy.props import (
     StringProperty
 )
 
+from . import catalog
+from .catalog import (
+    INPUT_MODEL_TYPES,
+    MODEL_TYPES,
+    fetch_catalog,
+    get_model_list,
+    get_workflow_model_types
+)
 from .utils import (
-    add_custom_headers,
     contains_non_latin,
     get_inputs_folder,
-    get_server_url,
     get_workflows_folder
 )
 
 log = logging.getLogger("comfyui_blender")
 
 
+# Global variables to reuse workflow classes across registrations
+# The key is the workflow class name and the value is a tuple (cache key, workflow class)
+WORKFLOW_CLASSES = {}
+CURRENT_WORKFLOW_CLASS = None
+
+
 def check_workflow_file_exists(new_workflow_data, workflows_folder):
     """Check if a workflow already exists and return the name of the existing file."""
 
     # Create normalized content and hash for new workflow
-    new_content = json.dumps(new_workflow_data, sort_keys=True, separators=(",", ":")).encode("utf-8")
-    new_hash = hashlib.sha256(new_content).hexdigest()
+    new_hash = get_workflow_hash(new_workflow_data)
 
     # Loop over existing files
     for filename in os.listdir(workflows_folder):
@@ -45,8 +58,7 @@ def check_workflow_file_exists(new_workflow_data, workflows_folder):
                 existing_workflow_data = json.load(file)
 
             # Create normalized content and hash for existing workflow
-            existing_content = json.dumps(existing_workflow_data, sort_keys=True, separators=(",", ":")).encode("utf-8")
-            existing_hash = hashlib.sha256(existing_content).hexdigest()
+            existing_hash = get_workflow_hash(existing_workflow_data)
  
             # Compare hashes
             if new_hash == existing_hash:
@@ -74,10 +86,6 @@ def create_class_properties(inputs):
     for group_key in input_groups:
         input_groups[group_key].sort(key=lambda k: inputs[k]["inputs"]["order"])
 
-    # Dictionary to hold default objects for the properties
-    # Some properties such as PointerProperty need to have their default value set after registration
-    default_objects = {}
-
     # Create properties
     properties = {}
     for key, node in inputs.items():
@@ -145,176 +153,38 @@ def create_class_properties(inputs):
         elif node["class_type"] == "BlenderInputLoad3D":
             properties[property_name] = StringProperty(name=name)
 
-        # Load checkpoint
-        elif node["class_type"] == "BlenderInputLoadCheckpoint":
-            if addon_prefs.connection_status:
-                # Get list of checkpoints from the ComfyUI server
-                url = get_server_url("/models/checkpoints")
-                headers = {"Content-Type": "application/json"}
-                headers = add_custom_headers(headers)
-                try:
-                    response = requests.get(url, headers=headers, stream=True)
-                except Exception as e:
-                    error_message = f"Failed to get list of checkpoints from ComfyUI server: {url}. {e}"
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.exception(error_message)
-                    # This crashes Blender upon starting if the ComfyUI server is not reachable
-                    # bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    continue
-
-                if response.status_code != 200:
-                    error_message = error_message = f"Failed to get list of checkpoints from ComfyUI server: {url}."
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.error(error_message)
-                    # This crashes Blender upon starting if the ComfyUI server is not reachable
-                    # bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    continue
-
-                items = response.json()
-                if not items:
-                    error_message = error_message = f"There is no checkpoint on the ComfyUI server: {url}."
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.error(error_message)
-                    continue
-
-                # If default value not in list, set to first item in the list
-                default = node["inputs"].get("default", "")
-                if default not in items:
-                    default = items[0]
-
-                properties[property_name] = EnumProperty(
-                    name=name,
-                    default=default,
-                    items=[(i, i, "") for i in items]
-                )
-            else:
-                message = "Add-on not connected to the ComfyUI server."
-                properties[property_name] = StringProperty(name=name, default=message)
-
-        # Load diffusion model
-        elif node["class_type"] == "BlenderInputLoadDiffusionModel":
-            if addon_prefs.connection_status:
-                # Get list of diffusion models from the ComfyUI server
-                url = get_server_url("/models/diffusion_models")
-                headers = {"Content-Type": "application/json"}
-                headers = add_custom_headers(headers)
-                try:
-                    response = requests.get(url, headers=headers, stream=True)
-                except Exception as e:
-                    error_message = f"Failed to get list of diffusion models from ComfyUI server: {url}. {e}"
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.exception(error_message)
-                    # This crashes Blender upon starting if the ComfyUI server is not reachable
-                    # bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    continue
-
-                if response.status_code != 200:
-                    error_message = error_message = f"Failed to get list of diffusion models from ComfyUI server: {url}."
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.error(error_message)
-                    # This crashes Blender upon starting if the ComfyUI server is not reachable
-                    # bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    continue
-
-                items = response.json()
-                if not items:
-                    error_message = error_message = f"There is no diffusion model on the ComfyUI server: {url}."
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.error(error_message)
-                    continue
-
-                # If default value not in list, set to first item in the list
-                default = node["inputs"].get("default", "")
-                if default not in items:
-                    default = items[0]
-
-                properties[property_name] = EnumProperty(
-                    name=name,
-                    default=default,
-                    items=[(i, i, "") for i in items]
-                )
-            else:
-                message = "Add-on not connected to the ComfyUI server."
-                properties[property_name] = StringProperty(name=name, default=message)
-
         # Load image and load mask
         elif node["class_type"] in ("BlenderInputLoadImage", "BlenderInputLoadMask"):
             properties[property_name] = PointerProperty(name=name, type=bpy.types.Image)
 
-        # Load LoRA
-        elif node["class_type"] == "BlenderInputLoadLora":
+        # Load checkpoint, load diffusion model, load LoRA and sampler
+        # The lists of items are served from the catalog of models
+        elif node["class_type"] in INPUT_MODEL_TYPES:
             if addon_prefs.connection_status:
-                # Get list of loras from the ComfyUI server
-                url = get_server_url("/models/loras")
-                headers = {"Content-Type": "application/json"}
-                headers = add_custom_headers(headers)
-                try:
-                    response = requests.get(url, headers=headers, stream=True)
-                except Exception as e:
-                    error_message = f"Failed to get list of LoRAs from ComfyUI server: {url}. {e}"
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.exception(error_message)
-                    # This crashes Blender upon starting if the ComfyUI server is not reachable
-                    # bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    continue
-
-                if response.status_code != 200:
-                    error_message = error_message = f"Failed to get list of LoRAs from ComfyUI server: {url}."
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.error(error_message)
-                    # This crashes Blender upon starting if the ComfyUI server is not reachable
-                    # bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
-                    continue
-
-                items = response.json()
-                if not items:
-                    error_message = error_message = f"There is no LoRA on the ComfyUI server: {url}."
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.error(error_message)
-                    continue
-
-                # If default value not in list, set to first item in the list
-                default = node["inputs"].get("default", "")
-                if default not in items:
-                    default = items[0]
-
-                properties[property_name] = EnumProperty(
-                    name=name,
-                    default=default,
-                    items=[(i, i, "") for i in items]
-                )
-            else:
-                message = "Add-on not connected to the ComfyUI server."
-                properties[property_name] = StringProperty(name=name, default=message)
-
-        # Sampler
-        elif node["class_type"] == "BlenderInputSampler":
-            if addon_prefs.connection_status:
-                # Get list of samplers from the ComfyUI server
-                url = get_server_url("/blender/samplers")
-                headers = {"Content-Type": "application/json"}
-                headers = add_custom_headers(headers)
-                try:
-                    response = requests.get(url, headers=headers, stream=True)
-                except Exception as e:
-                    error_message = f"Failed to get list of samplers from ComfyUI server: {url}. {e}"
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.exception(error_message)
-                    # This crashes Blender upon starting if the ComfyUI server is not reachable
-                    # bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+                model_type = INPUT_MODEL_TYPES[node["class_type"]]
+                entry = get_model_list(model_type)
+
+                # Create placeholder property while the list of models is being fetched
+                if entry is None:
+                    default = node["inputs"].get("default", "")
+                    if default:
+                        properties[property_name] = EnumProperty(
+                            name=name,
+                            default=default,
+                            items=[(default, default, "")]
+                        )
+                    else:
+                        message = f"Loading list of {MODEL_TYPES[model_type]['label']} from the ComfyUI server..."
+                        properties[property_name] = StringProperty(name=name, default=message)
                     continue
 
-                if response.status_code != 200:
-                    error_message = error_message = f"Failed to get list of samplers from ComfyUI server: {url}."
-                    properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
-                    log.error(error_message)
-                    # This crashes Blender upon starting if the ComfyUI server is not reachable
-                    # bpy.ops.comfy.show_error_popup("INVOKE_DEFAULT", error_message=error_message)
+                if entry["error"]:
+                    properties[property_name] = StringProperty(name=name, default=entry["error"])  # Create dummy property with error message
                     continue
 
-                items = response.json()
+                items = entry["items"]
                 if not items:
-                    error_message = error_message = f"There is no sampler on the ComfyUI server: {url}."
+                    error_message = f"There is no {MODEL_TYPES[model_type]['label_singular']} on the ComfyUI server: {entry['url']}."
                     properties[property_name] = StringProperty(name=name, default=error_message)  # Create dummy property with error message
                     log.error(error_message)
                     continue
@@ -353,7 +223,21 @@ def create_class_properties(inputs):
         # String multiline
         elif node["class_type"] == "BlenderInputStringMultiline":
             properties[property_name] = PointerProperty(name=name, type=bpy.types.Text)
+    return properties
+
+
+def create_default_objects(inputs):
+    """Create default objects for the properties which need to have their default value set after registration."""
+
+    # Some properties such as PointerProperty need to have their default value set after registration
+    default_objects = {}
+    for key, node in inputs.items():
+        property_name = f"node_{key}"
+        metadata = node.get("_meta", {})
+        name = metadata.get("title", f"Node {key}")
 
+        # String multiline
+        if node["class_type"] == "BlenderInputStringMultiline":
             # Create a new text block with the default value
             # Check if bpy.data.texts is available to avoid error message
             default = node["inputs"].get("default", "")
@@ -368,7 +252,7 @@ def create_class_properties(inputs):
 
                 # Add text block to default objects
                 default_objects[property_name] = text_block
-    return properties, default_objects
+    return default_objects
 
 
 def create_workflow_class(class_name, properties):
@@ -390,49 +274,84 @@ def extract_workflow_from_metadata(filepath):
     """Extract workflow from the metadata of a file."""
     
     def _read_glb_metadata(filepath):
-        """Read .glb file metadata to extract JSON chunk"""
+        """Read .glb file metadata to extract JSON chunk without loading binary chunks."""
 
         with open(filepath, "rb") as file:
             header = file.read(12)
+            if len(header) < 12:
+                return None
             magic, version, length = struct.unpack("<4sII", header)
+            if magic != b"glTF":
+                return None
+
+            # Loop over chunks, binary chunks are skipped without being read
             offset = 12
             while offset < length:
                 chunk_header = file.read(8)
                 if len(chunk_header) < 8:
                     break
                 chunk_len, chunk_type = struct.unpack("<I4s", chunk_header)
-                chunk_data = file.read(chunk_len)
                 if chunk_type == b"JSON":
+                    chunk_data = file.read(chunk_len)
                     return json.loads(chunk_data.decode("utf-8"))
+                file.seek(chunk_len, os.SEEK_CUR)
                 offset += 8 + chunk_len
         return None
 
     def _read_png_metadata(filepath):
-        """Read .png file metadata to extract JSON chunk"""
+        """Read .png file metadata to extract the prompt from text chunks without loading image data.
+        Supported text chunks are tEXt, zTXt (compressed) and iTXt (international, optionally compressed)."""
 
-        def _chunk_iter(data):
-            """Iterate over PNG data chunks to extract metadata. This function was borrowed from:
-            https://blender.stackexchange.com/questions/35504/read-image-metadata-from-python"""
+        with open(filepath, "rb") as file:
+            if file.read(8) != b"\x89PNG\r\n\x1a\n":
+                return None
 
-            total_length = len(data)
-            end = 4
+            # Loop over chunks, each chunk is made of length, type, data and CRC
+            while True:
+                chunk_header = file.read(8)
+                if len(chunk_header) < 8:
+                    return None
+                length, chunk_type = struct.unpack(">I4s", chunk_header)
 
-            while(end + 8 < total_length):     
-                length = int.from_bytes(data[end + 4: end + 8], 'big')
-                begin_chunk_type = end + 8
-                begin_chunk_data = begin_chunk_type + 4
-                end = begin_chunk_data + length
-                yield (data[begin_chunk_type: begin_chunk_data], data[begin_chunk_data: end])
+                # Stop at the end of the file
+                if chunk_type == b"IEND":
+                    return None
 
-        with open(filepath, "rb") as file:
-            data = file.read()
-            for chunk_type, chunk_data in _chunk_iter(data):
-                if chunk_type == b'tEXt':
-                    key, value = chunk_data.decode("iso-8859-1").split("\0")
-                    try:
-                        return {key: json.loads(value)}
-                    except Exception as e:
-                        return None
+                # Skip chunk data and CRC of non text chunks, for instance IDAT
+                if chunk_type not in (b"tEXt", b"zTXt", b"iTXt"):
+                    file.seek(length + 4, os.SEEK_CUR)
+                    continue
+
+                # Read only the keyword to decide whether the chunk is relevant
+                # The keyword is 1 to 79 bytes long followed by a null separator
+                head = file.read(min(length, 80))
+                separator = head.find(b"\0")
+                key = head[:separator].decode("iso-8859-1") if separator != -1 else ""
+                if key != "prompt":
+                    file.seek(length - len(head) + 4, os.SEEK_CUR)
+                    continue
+
+                # Read the rest of the chunk and decode the text
+                data = head[separator + 1:] + file.read(length - len(head))
+                try:
+                    if chunk_type == b"tEXt":
+                        value = data.decode("iso-8859-1")
+                    elif chunk_type == b"zTXt":
+                        # Compression method byte followed by zlib data
+                        value = zlib.decompress(data[1:]).decode("iso-8859-1")
+                    else:
+                        # Compression flag and method bytes, language tag and translated keyword, then UTF-8 text
+                        compression_flag = data[0]
+                        language_end = data.index(b"\0", 2)
+                        translated_end = data.index(b"\0", language_end + 1)
+                        text = data[translated_end + 1:]
+                        if compression_flag:
+                            text = zlib.decompress(text)
+                        value = text.decode("utf-8")
+                    return {key: json.loads(value)}
+                except Exception as e:
+                    log.error(f"Failed to read metadata from file {filepath}: {e}")
+                    return None
 
     # GLB metadata extraction
     if filepath.lower().endswith(".glb"):
@@ -504,6 +423,16 @@ def get_current_workflow_inputs(self, context, input_types=[]):
     return target_inputs
 
 
+def get_workflow_class_key(workflow, inputs, connection_status):
+    """Generate the key identifying the properties of a workflow class."""
+
+    # Properties of inputs querying the ComfyUI server depend on the catalog of models and the connection status
+    cache_key = get_workflow_hash(workflow)
+    if get_workflow_model_types(inputs):
+        cache_key = f"{cache_key}:{catalog.CATALOG_VERSION}:{connection_status}"
+    return cache_key
+
+
 def get_workflow_class_name(workflow_filename):
     """Generate a class name from the workflow file name."""
 
@@ -513,6 +442,13 @@ def get_workflow_class_name(workflow_filename):
     return class_name
 
 
+def get_workflow_hash(workflow):
+    """Generate a hash from the normalized content of a workflow."""
+
+    content = json.dumps(workflow, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
 def get_workflow_list(self, context):
     """Return a list of workflow JSON files from the workflows folder."""
 
@@ -531,6 +467,33 @@ def get_workflow_list(self, context):
     return workflows
 
 
+def get_workflows_hashes(workflows_folder):
+    """Return a dictionary of the hashes of the workflows in the workflows folder and their file names."""
+
+    def _hash_file(filename):
+        """Load and hash a workflow file."""
+
+        filepath = os.path.join(workflows_folder, filename)
+        try:
+            with open(filepath, "r", encoding="utf-8") as file:
+                return get_workflow_hash(json.load(file))
+        except Exception as e:
+            log.error(f"Failed to read workflow file {filepath}: {e}")
+            return None
+
+    # Hash existing files concurrently
+    filenames = sorted(f for f in os.listdir(workflows_folder) if f.endswith(".json"))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        hashes = list(executor.map(_hash_file, filenames))
+
+    # Keep the first file name in case of duplicates
+    workflows_hashes = {}
+    for filename, workflow_hash in zip(filenames, hashes):
+        if workflow_hash and workflow_hash not in workflows_hashes:
+            workflows_hashes[workflow_hash] = filename
+    return workflows_hashes
+
+
 def parse_workflow_for_inputs(workflow):
     """Parse a workflow dictionary and extract nodes with 'class_type' starting with 'BlenderInput...'."""
 
@@ -570,19 +533,31 @@ def parse_workflow_for_outputs(workflow):
     return outputs
 
 
+def refresh_workflow_class():
+    """Force the registration of the current workflow class, this is used as a timer callback."""
+
+    addon_prefs = bpy.context.preferences.addons["comfyui_blender"].preferences
+    if addon_prefs.workflow:
+        addon_prefs.workflow = addon_prefs.workflow
+
+    # Force redraw of the UI
+    for screen in bpy.data.screens:
+        for area in screen.areas:
+            if area.type in ("VIEW_3D", "IMAGE_EDITOR"):
+                area.tag_redraw()
+    return None  # Stop the timer
+
+
 def register_workflow_class(self, context):
     """Wrapper function to register a workflow class."""
 
+    global CURRENT_WORKFLOW_CLASS
+    addon_prefs = bpy.context.preferences.addons["comfyui_blender"].preferences
     workflows_folder = get_workflows_folder()
     workflow_filename = str(self.workflow)
     workflow_path = os.path.join(workflows_folder, workflow_filename)
     workflow_class_name = get_workflow_class_name(workflow_filename)
 
-    # Unregister workflow class if it already exists
-    for subclass in bpy.types.PropertyGroup.__subclasses__():
-        if subclass.__name__==workflow_class_name and subclass.is_registered:
-            bpy.utils.unregister_class(subclass)
-
     # Load the workflow JSON file
     if os.path.exists(workflow_path) and os.path.isfile(workflow_path):
         with open(workflow_path, "r",  encoding="utf-8") as file:
@@ -590,81 +565,234 @@ def register_workflow_class(self, context):
 
         # Get inputs from the workflow
         inputs = parse_workflow_for_inputs(workflow)
-        properties, default_objects = create_class_properties(inputs)
-        workflow_class = create_workflow_class(workflow_class_name, properties)
 
-        # Register the workflow class
-        bpy.utils.register_class(workflow_class)
+        # Fetch the lists of models required by the inputs in the background, one request per model type
+        # The workflow class is registered immediately with the lists of models available in the catalog
+        # And registered again when the catalog is updated, so the registration never waits for the ComfyUI server
+        if addon_prefs.connection_status:
+            fetch_catalog(get_workflow_model_types(inputs), callback=refresh_workflow_class)
+
+        # Reuse the workflow class if the workflow and the lists of models did not change
+        cache_key = get_workflow_class_key(workflow, inputs, addon_prefs.connection_status)
+        cached_key, workflow_class = WORKFLOW_CLASSES.get(workflow_class_name, (None, None))
+        if cached_key == cache_key and workflow_class.is_registered:
+            # Skip registration entirely if the scene already uses the workflow class
+            # This preserves the values entered by the user
+            # Default objects are still assigned to empty pointers, for instance after loading a file or File > New
+            if CURRENT_WORKFLOW_CLASS is workflow_class:
+                current_workflow = context.scene.current_workflow
+                missing_inputs = {
+                    key: node for key, node in inputs.items()
+                    if node["class_type"] == "BlenderInputStringMultiline" and getattr(current_workflow, f"node_{key}", None) is None
+                }
+                for property_name, default_object in create_default_objects(missing_inputs).items():
+                    setattr(current_workflow, property_name, default_object)
+                restore_workflow_input_values(context, workflow, workflow_filename, inputs)
+                log.debug(f"Workflow class is up to date: {workflow_class_name}")
+                return
+        else:
+            # Unregister workflow class if it already exists
+            for subclass in bpy.types.PropertyGroup.__subclasses__():
+                if subclass.__name__==workflow_class_name and subclass.is_registered:
+                    bpy.utils.unregister_class(subclass)
+
+            # Create and register the workflow class
+            properties = create_class_properties(inputs)
+            workflow_class = create_workflow_class(workflow_class_name, properties)
+            bpy.utils.register_class(workflow_class)
+            WORKFLOW_CLASSES[workflow_class_name] = (cache_key, workflow_class)
+            log.debug(f"Workflow class registered: {workflow_class_name}")
+
+        # Point the scene to the workflow class
         bpy.types.Scene.current_workflow = bpy.props.PointerProperty(type=workflow_class)
+        CURRENT_WORKFLOW_CLASS = workflow_class
 
         # Assign default objects to the properties that need it
         current_workflow = context.scene.current_workflow
+        default_objects = create_default_objects(inputs)
         for property_name, default_object in default_objects.items():
             setattr(current_workflow, property_name, default_object)
 
-        # Get custom data from the workflow JSON file
-        keep_values = False
-        if workflow.get("comfyui_blender"):
-            keep_values = workflow["comfyui_blender"].get("keep_values", False)
-
         # Overwrite values after registration
-        # Note keep_values is set to True when reloading a workflow from outputs
-        if hasattr(context.scene, "current_workflow") and keep_values:
-            workflow_instance = context.scene.current_workflow
-            for key, node in inputs.items():
-                property_name = f"node_{key}"
-
-                if hasattr(workflow_instance, property_name):
-                    # Custom handling for group of inputs
-                    if node["class_type"] == "BlenderInputGroup":
-                        # Do nothing, groups are just containers
-                        continue
-
-                    # Custom handling for sampler input
-                    elif node["class_type"] == "BlenderInputSampler":
-                        setattr(workflow_instance, property_name, node["inputs"].get("sampler_name", ""))
-
-                    # Custom handling for 3D model input
-                    elif node["class_type"] == "BlenderInputLoad3D":
-                        setattr(workflow_instance, property_name, node["inputs"].get("model_file", ""))
-                    
-                    # Custom handling for load checkpoint input
-                    elif node["class_type"] == "BlenderInputLoadCheckpoint":
-                        setattr(workflow_instance, property_name, node["inputs"].get("ckpt_name", ""))
-
-                    # Custom handling for load diffusion model input
-                    elif node["class_type"] == "BlenderInputLoadDiffusionModel":
-                        setattr(workflow_instance, property_name, node["inputs"].get("unet_name", ""))
-
-                    # Custom handling for load image input
-                    elif node["class_type"] == "BlenderInputLoadImage":
-                        inputs_folder = get_inputs_folder()
-                        input_filename = node["inputs"].get("image", "")
-                        input_filepath = os.path.join(inputs_folder, input_filename)
-
-                        # Load image in the data block and update the workflow property
-                        if os.path.exists(input_filepath):
-                            image = bpy.data.images.load(input_filepath, check_existing=True)
-                            setattr(workflow_instance, property_name, image)
-                    
-                    # Custom handling for load LoRA input
-                    elif node["class_type"] == "BlenderInputLoadLora":
-                        setattr(workflow_instance, property_name, node["inputs"].get("lora_name", ""))
-
-                    # Custom handling for string multiline inputs
-                    elif node["class_type"] == "BlenderInputStringMultiline":
-                        # Create a new text block with the string value
-                        text_name = workflow_filename.split(".")[0]
-                        if text_name in bpy.data.texts:
-                            text_block = bpy.data.texts[text_name]
-                        else:
-                            text_block = bpy.data.texts.new(text_name)
-                        text_block.clear()
-                        text_block.write(node["inputs"].get("value", ""))
-
-                        # Assign text block to the property
-                        setattr(workflow_instance, property_name, text_block)
+        restore_workflow_input_values(context, workflow, workflow_filename, inputs)
+
+    else:
+        # Unregister workflow class if the workflow file does not exist anymore
+        WORKFLOW_CLASSES.pop(workflow_class_name, None)
+        for subclass in bpy.types.PropertyGroup.__subclasses__():
+            if subclass.__name__==workflow_class_name and subclass.is_registered:
+                bpy.utils.unregister_class(subclass)
+
+
+def restore_workflow_input_values(context, workflow, workflow_filename, inputs):
+    """Set the values saved in a workflow to the inputs of the current workflow if the workflow keeps its values."""
+
+    # Get custom data from the workflow JSON file
+    keep_values = False
+    if workflow.get("comfyui_blender"):
+        keep_values = workflow["comfyui_blender"].get("keep_values", False)
+
+    # Note keep_values is set to True when reloading a workflow from outputs
+    if hasattr(context.scene, "current_workflow") and keep_values:
+        workflow_instance = context.scene.current_workflow
+        for key, node in inputs.items():
+            property_name = f"node_{key}"
+
+            if hasattr(workflow_instance, property_name):
+                # Custom handling for group of inputs
+                if node["class_type"] == "BlenderInputGroup":
+                    # Do nothing, groups are just containers
+                    continue
 
+                # Custom handling for sampler input
+                elif node["class_type"] == "BlenderInputSampler":
+                    set_model_input_value(workflow_instance, property_name, node["inputs"].get("sampler_name", ""))
+
+                # Custom handling for 3D model input
+                elif node["class_type"] == "BlenderInputLoad3D":
+                    setattr(workflow_instance, property_name, node["inputs"].get("model_file", ""))
+                
+                # Custom handling for load checkpoint input
+                elif node["class_type"] == "BlenderInputLoadCheckpoint":
+                    set_model_input_value(workflow_instance, property_name, node["inputs"].get("ckpt_name", ""))
+
+                # Custom handling for load diffusion model input
+                elif node["class_type"] == "BlenderInputLoadDiffusionModel":
+                    set_model_input_value(workflow_instance, property_name, node["inputs"].get("unet_name", ""))
+
+                # Custom handling for load image input
+                elif node["class_type"] == "BlenderInputLoadImage":
+                    inputs_folder = get_inputs_folder()
+                    input_filename = node["inputs"].get("image", "")
+                    input_filepath = os.path.join(inputs_folder, input_filename)
+
+                    # Load image in the data block and update the workflow property
+                    if os.path.exists(input_filepath):
+                        image = bpy.data.images.load(input_filepath, check_existing=True)
+                        setattr(workflow_instance, property_name, image)
+                
+                # Custom handling for load LoRA input
+                elif node["class_type"] == "BlenderInputLoadLora":
+                    set_model_input_value(workflow_instance, property_name, node["inputs"].get("lora_name", ""))
+
+                # Custom handling for string multiline inputs
+                elif node["class_type"] == "BlenderInputStringMultiline":
+                    # Create a new text block with the string value
+                    text_name = workflow_filename.split(".")[0]
+                    if text_name in bpy.data.texts:
+                        text_block = bpy.data.texts[text_name]
                     else:
-                        # Default handling for other input types
-                        setattr(workflow_instance, property_name, node["inputs"].get("value", ""))
+                        text_block = bpy.data.texts.new(text_name)
+                    text_block.clear()
+                    text_block.write(node["inputs"].get("value", ""))
+
+                    # Assign text block to the property
+                    setattr(workflow_instance, property_name, text_block)
+
+                else:
+                    # Default handling for other input types
+                    setattr(workflow_instance, property_name, node["inputs"].get("value", ""))
+
+
+def set_model_input_value(workflow_instance, property_name, value):
+    """Set the value of a model or sampler input if it is in the list of items of the input.
+    Values missing from the list are skipped, for instance while the list of models is being fetched.
+    They are set once the catalog is updated, the workflow class is then registered again."""
+
+    # Placeholder and error inputs are string properties, placeholder lists only contain the default value
+    prop = workflow_instance.bl_rna.properties[property_name]
+    if prop.type == "ENUM" and value in prop.enum_items:
+        setattr(workflow_instance, property_name, value)
+    else:
+        log.debug(f"Value {value} is not available for {property_name}, it is set once the list of models is updated.")
+
+
+def set_workflow_input_values(context, workflow, inputs, lock_seed=False):
+    """Update the workflow content with the values of the current workflow inputs.
+    Seeds are not randomized for the next run if lock_seed is True, for instance between the tiles of a run.
+    Raise an exception with an error message if an input is empty."""
+
+    addon_prefs = context.preferences.addons["comfyui_blender"].preferences
+    current_workflow = context.scene.current_workflow
+    for key, node in inputs.items():
+        property_name = f"node_{key}"
+
+        # Custom handling for group of inputs
+        if node["class_type"] == "BlenderInputGroup":
+            # Do nothing, groups are just containers
+            continue
+
+        # Custom handling for sampler input
+        elif node["class_type"] == "BlenderInputSampler":
+            workflow[key]["inputs"]["sampler_name"] = getattr(current_workflow, property_name)
+
+        # Custom handling for 3D model input
+        elif node["class_type"] == "BlenderInputLoad3D":
+            property_value = getattr(current_workflow, property_name)
+            if property_value:
+                workflow[key]["inputs"]["model_file"] = property_value
+            else:
+                property_name = current_workflow.bl_rna.properties[property_name].name  # Node title
+                raise Exception(f"Input {property_name} is empty.")
+
+        # Custom handling for load checkpoint input
+        elif node["class_type"] == "BlenderInputLoadCheckpoint":
+            workflow[key]["inputs"]["ckpt_name"] = getattr(current_workflow, property_name)
+
+        # Custom handling for load diffusion model input
+        elif node["class_type"] == "BlenderInputLoadDiffusionModel":
+            workflow[key]["inputs"]["unet_name"] = getattr(current_workflow, property_name)
+
+        # Custom handling for load image input
+        elif node["class_type"] in ("BlenderInputLoadImage", "BlenderInputLoadMask"):
+            inputs_folder = get_inputs_folder()
+
+            # Get image relative path in the inputs folder
+            image = getattr(current_workflow, property_name)
+            if not image:
+                property_name = current_workflow.bl_rna.properties[property_name].name  # Node title
+                raise Exception(f"Input {property_name} is empty.")
+
+            # Update the workflow with the relative path
+            # Get image absolute path in case it was converted to relative path like //..\AppData\Roaming\...
+            image_absolute_path = bpy.path.abspath(image.filepath)
+            image_path = os.path.relpath(image_absolute_path, inputs_folder)
+            if image_path:
+                workflow[key]["inputs"]["image"] = image_path
+            else:
+                property_name = current_workflow.bl_rna.properties[property_name].name  # Node title
+                raise Exception(f"Input {property_name} is empty.")
+
+        # Custom handling for load LoRA input
+        elif node["class_type"] == "BlenderInputLoadLora":
+            workflow[key]["inputs"]["lora_name"] = getattr(current_workflow, property_name)
+
+        # Custom handling for seed inputs
+        elif node["class_type"] == "BlenderInputSeed":
+            seed = getattr(current_workflow, property_name)
+            workflow[key]["inputs"]["value"] = seed
+
+            # If lock seed is not enabled, generate a new random seed
+            if not (addon_prefs.lock_seed or lock_seed):
+                min = current_workflow.bl_rna.properties[property_name].hard_min
+                max = current_workflow.bl_rna.properties[property_name].hard_max
+                seed = random.randint(min, max)
+                setattr(current_workflow, property_name, seed)
+
+        # Custom handling for string multiline inputs
+        elif node["class_type"] == "BlenderInputStringMultiline":
+            text = getattr(current_workflow, property_name)
+            if not text:
+                property_name = current_workflow.bl_rna.properties[property_name].name  # Node title
+                raise Exception(f"Input {property_name} is empty.")
+
+            # Update the workflow with the text content
+            workflow[key]["inputs"]["value"] = text.as_string()
+
+        else:
+            # Default handling for other input types
+            workflow[key]["inputs"]["value"] = getattr(current_workflow, property_name)
+
+    # Remove custom data from the workflow to avoid error from ComfyUI server
+    workflow.pop("comfyui_blender", None)
+    return workflow
@@ -1,3 +1,9 @@
+import numpy as np
+import torch
+from PIL import Image, ImageOps
+
+import folder_paths
+import node_helpers
 from comfy.comfy_types.node_typing import IO
 from nodes import LoadImageMask
 from .utils import (
@@ -6,6 +12,9 @@ from .utils import (
     TOOLTIP_ORDER
 )
 
+# Image modes of single channel masks sent by the Blender add-on, the value of the pixel is the mask
+GRAYSCALE_MODES = ("1", "L", "I", "I;16")
+
 
 class BlenderInputLoadMask(LoadImageMask):
     """Node used by ComfyUI Blender add-on to input a mask in a workflow."""
@@ -23,12 +32,24 @@ class BlenderInputLoadMask(LoadImageMask):
             INPUT_TYPES["optional"] = {}
         INPUT_TYPES["optional"]["group"] = ("GROUP", {"forceInput":True})
         return INPUT_TYPES
-    
+
     def execute(self, image, order, **kwargs):
+        # Grayscale masks are used as is, white is masked
+        image_path = folder_paths.get_annotated_filepath(image)
+        i = node_helpers.pillow(Image.open, image_path)
+        if i.mode in GRAYSCALE_MODES:
+            i = node_helpers.pillow(ImageOps.exif_transpose, i)
+            if i.mode == "1":
+                i = i.convert("L")
+            max_value = 255.0 if i.mode == "L" else 65535.0
+            mask = np.array(i).astype(np.float32) / max_value
+            mask = torch.from_numpy(np.clip(mask, 0.0, 1.0))
+            return (mask.unsqueeze(0),)
+
         result = super().load_image(image, "alpha")  # Enforce use of alpha channel for mask
         result = result[1:]  # Remove the image output from the tuple
         return result
 
     @classmethod
     def IS_CHANGED(s, image, order, **kwargs):
-        return super().IS_CHANGED(image)
\ No newline at end of file
+        return super().IS_CHANGED(image)